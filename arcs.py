@@ -0,0 +1,147 @@
+import math
+from array import array
+
+
+def compute_arc_params(cx, cy, sx, sy, ex, ey, direction):
+    """
+    Oblicza (xc, yc, r, angle_start, angle_end) w stopniach,
+    tak by łuk w DXF R12 narysować CCW od angle_start do angle_end.
+    """
+    vx_s = sx - cx
+    vy_s = sy - cy
+    vx_e = ex - cx
+    vy_e = ey - cy
+
+    r = math.hypot(vx_s, vy_s)
+    a_s = math.degrees(math.atan2(vy_s, vx_s)) % 360
+    a_e = math.degrees(math.atan2(vy_e, vx_e)) % 360
+
+    if direction == 1:
+        # CCW – gdy kąt końcowy jest mniejszy, dodajemy pełen obrót
+        if a_e < a_s:
+            a_e += 360
+    else:
+        # CW – zamieniamy kąty
+        a_s, a_e = a_e, a_s
+        if a_e < a_s:
+            a_e += 360
+
+    return (cx, cy, r, a_s, a_e)
+
+
+class ArcParams:
+    """
+    Wynik obliczeń dla wielu łuków naraz – kolumny array.array:
+      - radius: promień
+      - angle_start, angle_end: kąty w stopniach (łuk rysowany CCW od start do end, jak w DXF)
+      - sweep: rozpiętość łuku w stopniach (angle_end - angle_start)
+      - large_arc: flaga SVG large-arc (1 gdy rozpiętość > 180°)
+      - sweep_flag: flaga SVG sweep (1 dla CCW, 0 dla CW)
+    """
+
+    __slots__ = ("radius", "angle_start", "angle_end", "sweep", "large_arc", "sweep_flag")
+
+    def __init__(self, radius, angle_start, angle_end, sweep, large_arc, sweep_flag):
+        self.radius = radius
+        self.angle_start = angle_start
+        self.angle_end = angle_end
+        self.sweep = sweep
+        self.large_arc = large_arc
+        self.sweep_flag = sweep_flag
+
+    def __len__(self):
+        return len(self.radius)
+
+
+def compute_arc_params_batch(cxs, cys, sxs, sys_, exs, eys, directions):
+    """
+    Wsadowa wersja compute_arc_params – przyjmuje kolumny współrzędnych środka,
+    punktu startowego i końcowego oraz kierunków, zwraca ArcParams.
+
+    Kolejność operacji jest taka sama jak w compute_arc_params,
+    więc wyniki są identyczne bit w bit.
+    """
+    hypot = math.hypot
+    atan2 = math.atan2
+    degrees = math.degrees
+
+    radius = array('d')
+    angle_start = array('d')
+    angle_end = array('d')
+    sweep = array('d')
+    large_arc = array('b')
+    sweep_flag = array('b')
+
+    for cx, cy, sx, sy, ex, ey, direction in zip(cxs, cys, sxs, sys_, exs, eys, directions):
+        vx_s = sx - cx
+        vy_s = sy - cy
+        a_s = degrees(atan2(vy_s, vx_s)) % 360
+        a_e = degrees(atan2(ey - cy, ex - cx)) % 360
+        if direction == 1:
+            ccw = 1
+        else:
+            ccw = 0
+            a_s, a_e = a_e, a_s
+        if a_e < a_s:
+            a_e += 360
+        radius.append(hypot(vx_s, vy_s))
+        angle_start.append(a_s)
+        angle_end.append(a_e)
+        span = a_e - a_s
+        sweep.append(span)
+        large_arc.append(1 if span > 180 else 0)
+        sweep_flag.append(ccw)
+
+    return ArcParams(radius, angle_start, angle_end, sweep, large_arc, sweep_flag)
+
+
+def geometry_arc_params(geometry, xs=None, ys=None, directions=None):
+    """
+    Oblicza parametry wszystkich łuków modelu Geometry jednym wywołaniem.
+    Opcjonalnie można podać własne kolumny xs/ys i kierunków łuków
+    (np. po przekształceniu punktów, patrz transform.transformed_columns).
+    """
+    if xs is None:
+        xs = geometry.xs
+    if ys is None:
+        ys = geometry.ys
+    centers = geometry.arc_center
+    starts = geometry.arc_start
+    ends = geometry.arc_end
+    return compute_arc_params_batch(
+        [xs[r] for r in centers], [ys[r] for r in centers],
+        [xs[r] for r in starts], [ys[r] for r in starts],
+        [xs[r] for r in ends], [ys[r] for r in ends],
+        geometry.arc_direction if directions is None else directions)
+
+
+def bulge_arc(x0, y0, x1, y1, bulge):
+    """
+    Łuk zapisany jako bulge (tan(kąt / 4), dodatni dla CCW) między punktami (x0, y0)
+    i (x1, y1): zwraca (xc, yc, r, kąt początkowy, rozpiętość ze znakiem) – kąty w radianach.
+    Dla bulge 0 lub punktów pokrywających się zwraca None.
+    """
+    chord = math.hypot(x1 - x0, y1 - y0)
+    if not bulge or chord == 0:
+        return None
+    theta = 4 * math.atan(bulge)
+    r = chord / (2 * abs(math.sin(theta / 2)))
+    # Odległość środka od środka cięciwy (ze znakiem) – środek po lewej dla łuku CCW < 180°
+    h = chord * (1 - bulge * bulge) / (4 * bulge)
+    xc = (x0 + x1) / 2 - h * (y1 - y0) / chord
+    yc = (y0 + y1) / 2 + h * (x1 - x0) / chord
+    return (xc, yc, r, math.atan2(y0 - yc, x0 - xc), theta)
+
+
+def arc_axis_points(xc, yc, r, start, theta):
+    """
+    Punkty ekstremalne na osiach (kąty 0°, 90°, 180°, 270°) leżące na łuku od kąta start
+    (radiany) o rozpiętości theta (ze znakiem) – potrzebne do prostokąta otaczającego łuku.
+    """
+    lo, hi = (start, start + theta) if theta >= 0 else (start + theta, start)
+    points = []
+    quarter = math.ceil(lo / (math.pi / 2))
+    while quarter * (math.pi / 2) <= hi:
+        points.append(((xc + r, yc), (xc, yc + r), (xc - r, yc), (xc, yc - r))[quarter % 4])
+        quarter += 1
+    return points
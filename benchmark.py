@@ -0,0 +1,447 @@
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from geometry import Geometry
+from write_dxf import write_dxf
+from arcs import compute_arc_params
+
+# Domyślne rozmiary dla pakietu benchmarków (liczba encji GEO / liczba bloków LST)
+DEFAULT_SIZES = (1000, 10000, 100000)
+
+# Budżet czasu importów (python -X importtime) dla krótkiej konwersji z wiersza poleceń, w ms
+DEFAULT_IMPORT_BUDGET_MS = 75.0
+
+
+# --- Generatory danych testowych ---
+
+def generate_geo(geo_filename, n_lines=1000, n_arcs=500, n_circles=250, n_points=0, seed=0):
+    """
+    Zapisuje powtarzalny (dla danego seed) plik GEO:
+      - linie tworzą zamknięte ośmioboki (ostatni może być otwarty),
+      - każdy łuk ma własny środek, punkt początkowy i końcowy na wspólnym okręgu,
+      - okręgi mają losowy środek i promień,
+      - n_points dodatkowych punktów, do których nic się nie odwołuje.
+    Zwraca liczbę zapisanych punktów.
+    """
+    rnd = random.Random(seed)
+    points = []
+    lines = []
+    arcs = []
+    circles = []
+
+    def add_point(x, y):
+        points.append((x, y))
+        return len(points)
+
+    remaining = n_lines
+    while remaining > 0:
+        sides = min(8, remaining)
+        cx, cy, r = rnd.uniform(0, 3000), rnd.uniform(0, 1500), rnd.uniform(5, 200)
+        ids = [add_point(cx + r * math.cos(k * math.pi / 4), cy + r * math.sin(k * math.pi / 4))
+               for k in range(sides + (sides < 8))]
+        if sides == 8:
+            ids.append(ids[0])
+        color = rnd.choice(("1 0", "3 0"))
+        lines.extend((ids[k], ids[k + 1], color) for k in range(sides))
+        remaining -= sides
+
+    for _ in range(n_arcs):
+        cx, cy, r = rnd.uniform(0, 3000), rnd.uniform(0, 1500), rnd.uniform(1, 100)
+        a1, a2 = rnd.uniform(0, 2 * math.pi), rnd.uniform(0, 2 * math.pi)
+        center = add_point(cx, cy)
+        start = add_point(cx + r * math.cos(a1), cy + r * math.sin(a1))
+        end = add_point(cx + r * math.cos(a2), cy + r * math.sin(a2))
+        arcs.append((center, start, end, rnd.choice((1, -1)), rnd.choice(("1 0", "3 0"))))
+
+    for _ in range(n_circles):
+        center = add_point(rnd.uniform(0, 3000), rnd.uniform(0, 1500))
+        circles.append((center, rnd.uniform(1, 50), rnd.choice(("1 0", "3 0"))))
+
+    for _ in range(n_points):
+        add_point(rnd.uniform(0, 3000), rnd.uniform(0, 1500))
+
+    with open(geo_filename, 'w', encoding='utf-8') as f:
+        f.write("#~1\n1.03\n1\nbenchmark\n##~~\n#~3\n\n#~31\n")
+        for pid, (x, y) in enumerate(points, 1):
+            f.write(f"P\n{pid:>5}\n{x:.9f} {y:.9f} 0.000000000\n|~\n")
+        f.write("##~~\n#~331\n")
+        for (start, end, color) in lines:
+            f.write(f"LIN\n{color}\n{start:>5} {end:>5}\n|~\n")
+        for (center, start, end, direction, color) in arcs:
+            f.write(f"ARC\n{color}\n{center:>5} {start:>5} {end:>5}\n{direction:>4}\n|~\n")
+        for (center, radius, color) in circles:
+            f.write(f"CIR\n{color}\n{center:>5}\n{radius:.9f}\n|~\n")
+        f.write("##~~\n#~EOF\n")
+    return len(points)
+
+
+def generate_lst(lst_filename, n_blocks=1000, incremental_ratio=0.3, laser_blocks=50,
+                 arc_ratio=0.3, seed=0):
+    """
+    Zapisuje powtarzalny plik LST (cp1250) z sekcją START_TEXT/STOP_TEXT:
+      - n_blocks bloków ruchu (G00/G01/G02/G03, część bez kodu G – modalnie),
+      - incremental_ratio: udział bloków wykonywanych w trybie G91,
+      - laser_blocks: liczba par TC_LASER_ON/TC_LASER_OFF rozłożonych w programie,
+      - arc_ratio: udział ruchów łukowych.
+    Zawiera też wymiary arkusza (DA,'SHT-1') i sekcję BEGIN_PARTS_IN_PROGRAM_POS.
+    """
+    rnd = random.Random(seed)
+    out = [
+        "BEGIN_PROGRAMM",
+        "DA,'SHT-1',3000.00,1500.00,2.00",
+        "BEGIN_PARTS_IN_PROGRAM_POS",
+        "DA,1,'part_a_1','NOID_1',10.00,20.00,0",
+        "DA,2,'part_b_1','NOID_2',500.00,30.00,0",
+        "ENDE_PARTS_IN_PROGRAM_POS",
+        "START_TEXT",
+        "N1 G90",
+    ]
+    laser_every = max(1, n_blocks // max(1, laser_blocks))
+    incremental = False
+    laser_on = False
+    for k in range(n_blocks):
+        if k % laser_every == 0:
+            if laser_on:
+                out.append("TC_LASER_OFF(1)")
+            else:
+                out.append(f"N{k} TC_LASER_ON({rnd.choice((1, 2, 3))},1,0)")
+            laser_on = not laser_on
+        want_incremental = rnd.random() < incremental_ratio
+        if want_incremental != incremental:
+            incremental = want_incremental
+            out.append("G91" if incremental else "G90")
+        span = 20.0 if incremental else 1500.0
+        x, y = rnd.uniform(-span, span), rnd.uniform(-span, span)
+        if rnd.random() < arc_ratio:
+            code = rnd.choice(("G02", "G03"))
+            out.append(f"N{k} {code} X{x:.3f} Y{y:.3f} I{rnd.uniform(-5, 5):.3f} J{rnd.uniform(-5, 5):.3f}")
+        elif rnd.random() < 0.3:
+            out.append(f"X{x:.3f} Y{y:.3f}")
+        else:
+            out.append(f"N{k} {rnd.choice(('G00', 'G01'))} X{x:.3f} Y{y:.3f}")
+    if laser_on:
+        out.append("TC_LASER_OFF(1)")
+    out += ["M30", "STOP_TEXT", "ENDE_PROGRAMM"]
+    with open(lst_filename, 'w', encoding='cp1250') as f:
+        f.write("\n".join(out) + "\n")
+
+
+def synthetic_geometry(n_entities, seed=0):
+    """
+    Buduje losową (ale powtarzalną) geometrię z około n_entities encjami:
+    połowa to linie, jedna czwarta łuki, reszta okręgi.
+    """
+    rnd = random.Random(seed)
+    geometry = Geometry()
+    n_points = max(n_entities, 3)
+    for pid in range(1, n_points + 1):
+        geometry.add_point(pid, rnd.uniform(0, 3000), rnd.uniform(0, 1500), 0.0)
+    for _ in range(n_entities // 2):
+        geometry.add_line(rnd.randint(1, n_points), rnd.randint(1, n_points), rnd.choice((2, 7)))
+    for _ in range(n_entities // 4):
+        geometry.add_arc(rnd.randint(1, n_points), rnd.randint(1, n_points),
+                         rnd.randint(1, n_points), rnd.choice((1, -1)), rnd.choice((2, 7)))
+    for _ in range(n_entities - n_entities // 2 - n_entities // 4):
+        geometry.add_circle(rnd.randint(1, n_points), rnd.uniform(1, 50), rnd.choice((2, 7)))
+    return geometry
+
+
+# --- Pomiary ---
+
+def best_time(func, repeat):
+    """
+    Zwraca najkrótszy czas (s) z repeat wywołań func.
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def peak_memory(func):
+    """
+    Zwraca szczytowe zużycie pamięci (bajty) podczas wywołania func (tracemalloc).
+    Pomiar wykonywany jest osobno od pomiaru czasu, bo tracemalloc spowalnia kod.
+    """
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def measure(stage, size, func, repeat=3, memory=True):
+    """
+    Mierzy jeden etap: zwraca słownik {stage, size, seconds, peak_bytes}.
+    Komunikaty wypisywane przez mierzony kod są pomijane.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        seconds = best_time(func, repeat)
+        peak = peak_memory(func) if memory else None
+    return {"stage": stage, "size": size, "seconds": seconds, "peak_bytes": peak}
+
+
+def geo_stages(geo_file, tmp):
+    """
+    Zwraca listę (nazwa etapu, funkcja) dla pliku GEO.
+    """
+    from parse_geo import parse_geo
+    geometry = parse_geo(geo_file)
+    stages = [
+        ("parse_geo[stream]", lambda: parse_geo(geo_file)),
+        ("parse_geo[mmap]", lambda: parse_geo(geo_file, backend="mmap")),
+        ("write_dxf", lambda: write_dxf(os.path.join(tmp, "out.dxf"), *geometry)),
+    ]
+    try:
+        from geo_to_svg import geo_to_svg
+    except ImportError:
+        # Brak opcjonalnej zależności generatora SVG – pomijamy etap
+        pass
+    else:
+        stages.append(("geo_to_svg", lambda: geo_to_svg(*geometry, os.path.join(tmp, "out.svg"))))
+    return stages
+
+
+def lst_stages(lst_file):
+    """
+    Zwraca listę (nazwa etapu, funkcja) dla pliku LST.
+    """
+    from parse_lst import parse_lst
+    from new_lst_parse import parse_gcode_block
+    return [
+        ("parse_lst", lambda: parse_lst(lst_file)),
+        ("parse_gcode_block", lambda: parse_gcode_block(lst_file)),
+    ]
+
+
+def run_suite(sizes=DEFAULT_SIZES, repeat=3, memory=True, seed=0):
+    """
+    Generuje dane dla każdego rozmiaru i mierzy wszystkie etapy.
+    Rozmiar to liczba encji GEO (połowa linie, jedna czwarta łuki, reszta okręgi)
+    oraz liczba bloków ruchu w programie LST.
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            geo_file = os.path.join(tmp, f"bench_{size}.geo")
+            lst_file = os.path.join(tmp, f"bench_{size}.lst")
+            n_arcs = size // 4
+            generate_geo(geo_file, n_lines=size // 2, n_arcs=n_arcs,
+                         n_circles=size - size // 2 - n_arcs, seed=seed)
+            generate_lst(lst_file, n_blocks=size, laser_blocks=max(1, size // 20), seed=seed)
+            for stage, func in geo_stages(geo_file, tmp) + lst_stages(lst_file):
+                result = measure(stage, size, func, repeat, memory)
+                results.append(result)
+                print(format_result(result), file=sys.stderr)
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def format_result(result):
+    peak = result["peak_bytes"]
+    peak_text = f"{peak / 1e6:9.2f} MB" if peak is not None else "        -"
+    return f"{result['stage']:<20} {result['size']:>9}  {result['seconds']:9.4f} s  {peak_text}"
+
+
+# --- Porównanie zapisu DXF ---
+
+def write_dxf_legacy(dxf_filename, points, lines, arcs, circles):
+    """
+    Dawny zapis DXF (kilka f.write z f-stringami na encję) – punkt odniesienia dla benchmarku.
+    """
+    with open(dxf_filename, 'w', encoding='utf-8') as f:
+        f.write("0\nSECTION\n  2\nENTITIES\n")
+        for (p1, p2, color_idx) in lines:
+            x1, y1, _ = points[p1]
+            x2, y2, _ = points[p2]
+            f.write("  0\nLINE\n")
+            f.write("  8\n0\n")
+            f.write(f" 62\n{color_idx}\n")
+            f.write(f" 10\n{x1}\n 20\n{y1}\n")
+            f.write(f" 11\n{x2}\n 21\n{y2}\n")
+        for (center_id, start_id, end_id, direction, color_idx) in arcs:
+            cx, cy, _ = points[center_id]
+            sx, sy, _ = points[start_id]
+            ex, ey, _ = points[end_id]
+            (xc, yc, r, ang_s, ang_e) = compute_arc_params(cx, cy, sx, sy, ex, ey, direction)
+            f.write("  0\nARC\n")
+            f.write("  8\n0\n")
+            f.write(f" 62\n{color_idx}\n")
+            f.write(f" 10\n{xc}\n 20\n{yc}\n")
+            f.write(f" 40\n{r}\n")
+            f.write(f" 50\n{ang_s}\n")
+            f.write(f" 51\n{ang_e}\n")
+        for (center_id, radius, color_idx) in circles:
+            cx, cy, _ = points[center_id]
+            f.write("  0\nCIRCLE\n")
+            f.write("  8\n0\n")
+            f.write(f" 62\n{color_idx}\n")
+            f.write(f" 10\n{cx}\n 20\n{cy}\n")
+            f.write(f" 40\n{radius}\n")
+        f.write("  0\nENDSEC\n  0\nEOF\n")
+
+
+def bench_dxf_writers(n_entities, repeat=3, seed=0):
+    """
+    Porównuje dawny zapis DXF z zapisem blokowym (domyślny format i "%.6f").
+    Zwraca listę słowników {writer, seconds, bytes}.
+    """
+    geometry = synthetic_geometry(n_entities, seed)
+    # Dawny zapis dostaje zwykły słownik i listy krotek, tak jak przed modelem kolumnowym
+    points = dict(geometry.points)
+    lines, arcs, circles = list(geometry.lines), list(geometry.arcs), list(geometry.circles)
+
+    writers = [
+        ("legacy", lambda path: write_dxf_legacy(path, points, lines, arcs, circles)),
+        ("chunked", lambda path: write_dxf(path, *geometry)),
+        ("chunked %.6f", lambda path: write_dxf(path, *geometry, float_format="%.6f")),
+    ]
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, writer in writers:
+            path = os.path.join(tmp, "bench.dxf")
+            seconds = best_time(lambda: writer(path), repeat)
+            results.append({"writer": name, "seconds": seconds, "bytes": os.path.getsize(path)})
+    return results
+
+
+# --- Czas startu poleceń ---
+
+def startup_commands(tmp):
+    """
+    Zwraca listę (nazwa, argumenty) krótkich konwersji z wiersza poleceń dla małych plików.
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    geo_file = os.path.join(tmp, "tiny.geo")
+    lst_file = os.path.join(tmp, "tiny.lst")
+    generate_geo(geo_file, n_lines=10, n_arcs=5, n_circles=5)
+    generate_lst(lst_file, n_blocks=20, laser_blocks=2)
+    cli = os.path.join(here, "geo2dxf.py")
+    return [
+        ("geo2dxf dxf", [cli, "dxf", geo_file, os.path.join(tmp, "out.dxf")]),
+        ("geo2dxf svg", [cli, "svg", geo_file, os.path.join(tmp, "out.svg")]),
+        ("geo2dxf svg (png)", [cli, "svg", geo_file, os.path.join(tmp, "out.png")]),
+        ("geo2dxf lst", [cli, "lst", lst_file, os.path.join(tmp, "lst.dxf")]),
+        ("main.py", [os.path.join(here, "main.py"), geo_file, os.path.join(tmp, "main.dxf")]),
+    ]
+
+
+def import_time(args):
+    """
+    Łączny czas importów (ms) uruchomienia python -X importtime z podanymi argumentami:
+    suma czasów skumulowanych modułów najwyższego poziomu.
+    """
+    import subprocess
+    env = dict(os.environ)
+    env.pop("GEO2DXF_CACHE_DIR", None)
+    result = subprocess.run([sys.executable, "-X", "importtime"] + args, stdout=subprocess.DEVNULL,
+                            stderr=subprocess.PIPE, universal_newlines=True, env=env, check=True)
+    total = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line.split("|")
+        # Moduły zagnieżdżone są wcięte – liczymy tylko najwyższy poziom
+        if cumulative.strip().isdigit() and not name.startswith("  "):
+            total += int(cumulative)
+    return total / 1000.0
+
+
+def bench_startup(repeat=5, budget_ms=DEFAULT_IMPORT_BUDGET_MS):
+    """
+    Mierzy czas importów krótkich konwersji (najlepszy z repeat uruchomień).
+    Zwraca listę słowników {command, import_ms, over_budget}.
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, args in startup_commands(tmp):
+            ms = min(import_time(args) for _ in range(repeat))
+            results.append({"command": name, "import_ms": ms, "over_budget": ms > budget_ms})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarki konwertera GEO/LST.")
+    sub = parser.add_subparsers(dest="command")
+
+    suite = sub.add_parser("suite", help="pomiar wszystkich etapów dla danych syntetycznych")
+    suite.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES),
+                       help="rozmiary danych (liczba encji GEO / bloków LST)")
+    suite.add_argument("--repeat", type=int, default=3, help="liczba powtórzeń (liczy się najlepszy czas)")
+    suite.add_argument("--no-memory", action="store_true", help="pomiń pomiar pamięci (tracemalloc)")
+    suite.add_argument("--seed", type=int, default=0, help="ziarno generatora danych")
+    suite.add_argument("--json", metavar="PLIK", help="zapisz wyniki w formacie JSON")
+
+    writers = sub.add_parser("writers", help="porównanie zapisu DXF z dawną implementacją")
+    writers.add_argument("--entities", type=int, default=200000, help="liczba encji")
+    writers.add_argument("--repeat", type=int, default=3, help="liczba powtórzeń (liczy się najlepszy czas)")
+
+    gen = sub.add_parser("generate", help="zapisz syntetyczny plik GEO lub LST")
+    gen.add_argument("output", help="plik wyjściowy (*.geo lub *.lst)")
+    gen.add_argument("--size", type=int, default=10000, help="liczba encji GEO / bloków LST")
+    gen.add_argument("--seed", type=int, default=0, help="ziarno generatora danych")
+
+    startup = sub.add_parser("startup", help="czas importów krótkich konwersji (python -X importtime)")
+    startup.add_argument("--repeat", type=int, default=5, help="liczba powtórzeń (liczy się najlepszy czas)")
+    startup.add_argument("--budget", type=float, default=DEFAULT_IMPORT_BUDGET_MS, metavar="MS",
+                         help=f"budżet czasu importów w ms (domyślnie {DEFAULT_IMPORT_BUDGET_MS:g}); "
+                              "przekroczenie kończy program kodem 1")
+
+    args = parser.parse_args()
+
+    if args.command == "suite":
+        report = run_suite(args.sizes, args.repeat, memory=not args.no_memory, seed=args.seed)
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+        else:
+            json.dump(report, sys.stdout, indent=2)
+            print()
+    elif args.command == "writers":
+        results = bench_dxf_writers(args.entities, args.repeat)
+        base = results[0]["seconds"]
+        print(f"Zapis DXF, {args.entities} encji:")
+        for r in results:
+            print(f"  {r['writer']:<14} {r['seconds']:8.3f} s  x{base / r['seconds']:5.2f}  "
+                  f"{r['bytes'] / 1e6:8.2f} MB")
+    elif args.command == "generate":
+        if args.output.lower().endswith(".lst"):
+            generate_lst(args.output, n_blocks=args.size, laser_blocks=max(1, args.size // 20),
+                         seed=args.seed)
+        else:
+            n_arcs = args.size // 4
+            generate_geo(args.output, n_lines=args.size // 2, n_arcs=n_arcs,
+                         n_circles=args.size - args.size // 2 - n_arcs, seed=args.seed)
+        print(f"Zapisano plik: {args.output}")
+    elif args.command == "startup":
+        results = bench_startup(args.repeat, args.budget)
+        print(f"Czas importów (budżet {args.budget:g} ms):")
+        for r in results:
+            note = "  PRZEKROCZONY" if r["over_budget"] else ""
+            print(f"  {r['command']:<20} {r['import_ms']:8.1f} ms{note}")
+        sys.exit(1 if any(r["over_budget"] for r in results) else 0)
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
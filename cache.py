@@ -0,0 +1,188 @@
+import hashlib
+import os
+
+# Wersja formatu wyników – należy ją podnieść przy każdej zmianie, która zmienia
+# zawartość generowanych plików DXF/SVG, aby stare wpisy nie były używane.
+CACHE_VERSION = 4
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# Co ile zapisów rozmiar cache jest liczony od nowa (przejście po katalogu), nawet gdy
+# szacunek nie przekracza limitu – uwzględnia wpisy dodane przez inne procesy
+RESCAN_INTERVAL = 64
+
+# tempfile i shutil importowane są dopiero przy zapisie/odczycie wpisu – moduł jest ładowany
+# przy każdym uruchomieniu skryptów, także bez cache.
+
+# Zmienne środowiskowe używane przez skrypty (cache_from_env)
+ENV_CACHE_DIR = "GEO2DXF_CACHE_DIR"
+ENV_CACHE_MAX_MB = "GEO2DXF_CACHE_MAX_MB"
+
+
+class ConversionCache:
+    """
+    Trwały cache wyników konwersji na dysku.
+
+    Kluczem jest skrót SHA-256 zawartości pliku wejściowego, rodzaju konwersji
+    (np. "dxf", "svg"), jej opcji oraz CACHE_VERSION. Powtórna konwersja tego samego
+    pliku sprowadza się do skopiowania (lub podlinkowania) gotowego wyniku.
+
+    - Zapis jest atomowy: wynik powstaje w pliku tymczasowym w katalogu cache
+      i dopiero gotowy jest przenoszony na miejsce przez os.replace.
+    - Rozmiar jest ograniczony (max_bytes); przy przekroczeniu usuwane są
+      najdawniej używane wpisy (LRU wg czasu modyfikacji, odświeżanego przy odczycie).
+      Łączny rozmiar liczony jest raz (przejście po katalogu), a potem aktualizowany przy
+      każdym zapisie; katalog przeglądany jest ponownie dopiero po przekroczeniu limitu
+      albo co RESCAN_INTERVAL zapisów.
+    - use_hardlinks=True zamiast kopiowania tworzy twarde dowiązania. Wpisy są wtedy
+      tylko do odczytu, żeby nadpisanie pliku wynikowego nie uszkodziło cache.
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES, use_hardlinks=False):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.use_hardlinks = use_hardlinks
+        os.makedirs(directory, exist_ok=True)
+        # Szacowany łączny rozmiar wpisów (None – jeszcze nie liczony) i liczba zapisów od
+        # ostatniego przejścia po katalogu
+        self._total = None
+        self._stores = 0
+
+    def key(self, input_file, kind, options=None):
+        """
+        Wylicza klucz wpisu dla pliku wejściowego, rodzaju konwersji i jej opcji.
+        """
+        h = hashlib.sha256()
+        h.update(f"{CACHE_VERSION}\0{kind}\0{sorted((options or {}).items())!r}\0".encode())
+        with open(input_file, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        return h.hexdigest()
+
+    def path(self, key, suffix=""):
+        return os.path.join(self.directory, key[:2], key + suffix)
+
+    def fetch(self, key, output_file):
+        """
+        Jeśli wpis istnieje, umieszcza go w output_file i zwraca True.
+        """
+        entry = self.path(key, os.path.splitext(output_file)[1])
+        try:
+            # Odświeżamy czas użycia (LRU)
+            os.utime(entry)
+        except FileNotFoundError:
+            return False
+        try:
+            self._materialize(entry, output_file)
+        except FileNotFoundError:
+            # Wpis usunięty w międzyczasie przez inny proces
+            return False
+        return True
+
+    def store(self, key, produced_file, suffix=""):
+        """
+        Przenosi gotowy plik (utworzony w katalogu cache) pod klucz key – atomowo.
+        """
+        entry = self.path(key, suffix)
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        if self.use_hardlinks:
+            os.chmod(produced_file, 0o444)
+        size = os.path.getsize(produced_file)
+        try:
+            replaced = os.path.getsize(entry)
+        except FileNotFoundError:
+            replaced = 0
+        os.replace(produced_file, entry)
+        self._stores += 1
+        if self._total is not None:
+            self._total += size - replaced
+        if self._total is None or self._total > self.max_bytes or self._stores >= RESCAN_INTERVAL:
+            self.evict(keep=entry)
+        return entry
+
+    def convert(self, convert_func, input_file, output_file, kind, options=None):
+        """
+        Wykonuje convert_func(input_file, plik_wynikowy) tylko wtedy, gdy wyniku nie ma w cache.
+        Zwraca True, jeśli wynik pochodził z cache.
+        """
+        options = options or {}
+        key = self.key(input_file, kind, options)
+        if self.fetch(key, output_file):
+            return True
+
+        suffix = os.path.splitext(output_file)[1]
+        import tempfile
+        fd, tmp = tempfile.mkstemp(suffix=suffix, prefix=".tmp-", dir=self.directory)
+        os.close(fd)
+        try:
+            convert_func(input_file, tmp)
+            entry = self.store(key, tmp, suffix)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        self._materialize(entry, output_file)
+        return False
+
+    def evict(self, keep=None):
+        """
+        Usuwa najdawniej używane wpisy, dopóki łączny rozmiar przekracza max_bytes.
+        Wpis keep (np. właśnie zapisany) nigdy nie jest usuwany. Przegląda cały katalog
+        i zapamiętuje policzony rozmiar (store wywołuje ją tylko w razie potrzeby).
+        """
+        self._stores = 0
+        entries = []
+        total = 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.startswith(".tmp-"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+        self._total = total
+        if total <= self.max_bytes:
+            return
+        entries.sort()
+        for _, size, path in entries:
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            self._total = total
+            if total <= self.max_bytes:
+                break
+
+    def _materialize(self, entry, output_file):
+        if os.path.lexists(output_file):
+            # Usuwamy stary plik zamiast go nadpisywać – mógłby być dowiązaniem do wpisu
+            os.remove(output_file)
+        if self.use_hardlinks:
+            try:
+                os.link(entry, output_file)
+                return
+            except OSError:
+                # Inny system plików lub brak obsługi dowiązań – kopiujemy
+                pass
+        import shutil
+        shutil.copyfile(entry, output_file)
+
+
+def cache_from_env(directory=None):
+    """
+    Tworzy cache na podstawie zmiennych GEO2DXF_CACHE_DIR i GEO2DXF_CACHE_MAX_MB.
+    directory (np. z opcji --cache) zastępuje GEO2DXF_CACHE_DIR, limit rozmiaru nadal
+    pochodzi ze zmiennej. Zwraca None, jeśli katalog cache nie został ustawiony.
+    """
+    directory = directory or os.environ.get(ENV_CACHE_DIR)
+    if not directory:
+        return None
+    max_mb = os.environ.get(ENV_CACHE_MAX_MB)
+    max_bytes = int(float(max_mb) * 1024 * 1024) if max_mb else DEFAULT_MAX_BYTES
+    return ConversionCache(directory, max_bytes)
@@ -0,0 +1,325 @@
+import math
+from arcs import arc_axis_points, bulge_arc, geometry_arc_params
+
+# Składanie konturów z linii i łuków modelu Geometry.
+#
+# Końce odcinków wstawiane są do słownika po skwantowanych współrzędnych
+# (round(x / tolerance), round(y / tolerance)); dopasowanie końca sprawdza komórkę
+# punktu i 8 sąsiednich, więc punkty odległe o mniej niż tolerance zawsze się znajdą,
+# a całość działa w czasie liniowym zamiast porównywania każdej pary odcinków.
+#
+# Odcinek konturu to krotka (rodzaj, indeks, odwrócony): rodzaj "line" lub "arc"
+# (jak w spatial.py), indeks w kolumnach danego rodzaju, odwrócony=True oznacza
+# przejście od punktu końcowego do początkowego. Każdy okrąg to osobny kontur zamknięty.
+
+LINE = "line"
+ARC = "arc"
+CIRCLE = "circle"
+
+DEFAULT_TOLERANCE = 1e-6
+
+
+class Contour:
+    """
+    Uporządkowany ciąg odcinków (segments) tworzący pętlę zamkniętą lub otwartą.
+
+      - closed: czy koniec ostatniego odcinka pokrywa się z początkiem pierwszego,
+      - color: kolor odcinków (None, jeśli kontur łączy różne kolory),
+      - area: pole ze znakiem (dodatnie dla obiegu CCW; łuki liczone dokładnie),
+              dla konturu otwartego – pole wielokąta domkniętego cięciwą,
+      - length: długość (np. długość cięcia do wyceny),
+      - depth: poziom zagnieżdżenia po classify_contours (0 = kontur zewnętrzny),
+      - is_outer: depth parzysty (kontur zewnętrzny lub wyspa w otworze).
+    """
+
+    __slots__ = ("segments", "closed", "color", "area", "length", "bbox", "depth", "_vertices")
+
+    def __init__(self, segments, closed, color, vertices, area, length, bbox):
+        self.segments = segments
+        self.closed = closed
+        self.color = color
+        self._vertices = vertices
+        self.area = area
+        self.length = length
+        self.bbox = bbox
+        self.depth = None
+
+    @property
+    def is_outer(self):
+        return self.depth is None or self.depth % 2 == 0
+
+    @property
+    def is_ccw(self):
+        return self.area > 0
+
+    def vertices(self):
+        """
+        Wierzchołki jako [(x, y, bulge), ...] (bulge = tan(kąt łuku / 4), 0 dla linii,
+        ze znakiem: dodatni dla łuku CCW), gotowe dla LWPOLYLINE. Kontur zamknięty
+        nie powtarza pierwszego punktu na końcu; w konturze otwartym ostatni punkt
+        ma bulge 0.
+        """
+        return list(self._vertices)
+
+    def points(self):
+        return [(x, y) for x, y, _ in self._vertices]
+
+    def reverse(self):
+        """
+        Odwraca kierunek obiegu konturu (w miejscu).
+        """
+        self.segments = [(kind, index, not reversed_) for kind, index, reversed_ in reversed(self.segments)]
+        vertices = self._vertices
+        if self.closed:
+            # Kolejność wierzchołków od pierwszego wstecz; bulge przechodzi na poprzedni wierzchołek
+            n = len(vertices)
+            self._vertices = [(vertices[-k % n][0], vertices[-k % n][1], -vertices[(-k - 1) % n][2] or 0.0)
+                              for k in range(n)]
+        else:
+            # Odcinek k -> k+1 ma bulge wierzchołka k; po odwróceniu przechodzi na wierzchołek k+1
+            n = len(vertices) - 1
+            self._vertices = [(vertices[n - j][0], vertices[n - j][1], -vertices[n - j - 1][2] or 0.0)
+                              for j in range(n)] + [(vertices[0][0], vertices[0][1], 0.0)]
+        self.area = -self.area
+
+    def __len__(self):
+        return len(self.segments)
+
+    def __repr__(self):
+        kind = "closed" if self.closed else "open"
+        return f"Contour({kind}, segments={len(self.segments)}, area={self.area:.6g}, length={self.length:.6g})"
+
+
+def _segment_table(geometry):
+    """
+    Tablica odcinków: (rodzaj, indeks, x0, y0, x1, y1, kolor, kąt łuku ze znakiem,
+    xc, yc, r) – dla linii kąt 0 i brak środka.
+    """
+    xs, ys = geometry.xs, geometry.ys
+    table = []
+    for i, (p1, p2, color) in enumerate(zip(geometry.line_start, geometry.line_end, geometry.line_color)):
+        table.append((LINE, i, xs[p1], ys[p1], xs[p2], ys[p2], color, 0.0, 0.0, 0.0, 0.0))
+    params = geometry_arc_params(geometry)
+    for i, (c, s, e, direction, color, r, sweep) in enumerate(zip(
+            geometry.arc_center, geometry.arc_start, geometry.arc_end, geometry.arc_direction,
+            geometry.arc_color, params.radius, params.sweep)):
+        # Rozpiętość w kierunku od punktu początkowego do końcowego (ujemna dla CW)
+        theta = math.radians(sweep if direction == 1 else -sweep)
+        table.append((ARC, i, xs[s], ys[s], xs[e], ys[e], color, theta, xs[c], ys[c], r))
+    return table
+
+
+def chain_contours(geometry, tolerance=DEFAULT_TOLERANCE, split_colors=True):
+    """
+    Składa linie i łuki modelu Geometry w kontury (lista Contour), a każdy okrąg
+    zwraca jako osobny kontur zamknięty.
+
+    tolerance: maksymalna odległość końców uznawanych za ten sam punkt
+    split_colors: łączy tylko odcinki tego samego koloru (cięcie i grawer osobno)
+
+    Kolejność konturów odpowiada kolejności pierwszych odcinków w pliku;
+    kontury nie są orientowane (patrz classify_contours).
+    """
+    if tolerance <= 0:
+        raise ValueError("tolerance musi być dodatnia")
+    table = _segment_table(geometry)
+    buckets = {}
+    for s, seg in enumerate(table):
+        color = seg[6] if split_colors else None
+        for end, (x, y) in enumerate(((seg[2], seg[3]), (seg[4], seg[5]))):
+            key = (round(x / tolerance), round(y / tolerance), color)
+            buckets.setdefault(key, []).append(2 * s + end)
+
+    used = bytearray(len(table))
+
+    def take(x, y, color):
+        """
+        Nieużyty koniec odcinka w odległości <= tolerance od (x, y) albo -1.
+        """
+        kx, ky = round(x / tolerance), round(y / tolerance)
+        for dx in (0, -1, 1):
+            for dy in (0, -1, 1):
+                endpoints = buckets.get((kx + dx, ky + dy, color))
+                if not endpoints:
+                    continue
+                for endpoint in endpoints:
+                    s = endpoint >> 1
+                    if used[s]:
+                        continue
+                    seg = table[s]
+                    px, py = (seg[4], seg[5]) if endpoint & 1 else (seg[2], seg[3])
+                    if math.hypot(px - x, py - y) <= tolerance:
+                        return endpoint
+        return -1
+
+    contours = []
+    for first in range(len(table)):
+        if used[first]:
+            continue
+        used[first] = 1
+        color = table[first][6] if split_colors else None
+        # Odcinki jako (numer, odwrócony); przedłużamy najpierw w przód, potem wstecz
+        chain = [(first, False)]
+        sx, sy = table[first][2], table[first][3]
+        x, y = table[first][4], table[first][5]
+        # Pętla kończy się po powrocie do punktu startowego (nawet gdy spotyka się tam więcej odcinków)
+        while math.hypot(x - sx, y - sy) > tolerance:
+            endpoint = take(x, y, color)
+            if endpoint < 0:
+                break
+            s, reversed_ = endpoint >> 1, bool(endpoint & 1)
+            used[s] = 1
+            chain.append((s, reversed_))
+            seg = table[s]
+            x, y = (seg[2], seg[3]) if reversed_ else (seg[4], seg[5])
+        closed = math.hypot(x - sx, y - sy) <= tolerance
+        if not closed:
+            head = []
+            while True:
+                endpoint = take(sx, sy, color)
+                if endpoint < 0:
+                    break
+                # Dochodzimy do (sx, sy) końcem odcinka – czyli bez odwracania
+                s, reversed_ = endpoint >> 1, not (endpoint & 1)
+                used[s] = 1
+                head.append((s, reversed_))
+                seg = table[s]
+                sx, sy = (seg[4], seg[5]) if reversed_ else (seg[2], seg[3])
+            chain = head[::-1] + chain
+            closed = math.hypot(x - sx, y - sy) <= tolerance
+        contours.append(_make_contour(table, chain, closed, split_colors))
+
+    xs, ys = geometry.xs, geometry.ys
+    for i, (c, r, color) in enumerate(zip(geometry.circle_center, geometry.circle_radius,
+                                          geometry.circle_color)):
+        cx, cy = xs[c], ys[c]
+        contours.append(Contour([(CIRCLE, i, False)], True, color,
+                                [(cx + r, cy, 1.0), (cx - r, cy, 1.0)],
+                                math.pi * r * r, 2 * math.pi * r, (cx - r, cy - r, cx + r, cy + r)))
+    return contours
+
+
+def _make_contour(table, chain, closed, split_colors):
+    segments = []
+    vertices = []
+    colors = set()
+    twice_area = 0.0
+    arc_area = 0.0
+    length = 0.0
+    bx, by = [], []
+    for s, reversed_ in chain:
+        kind, index, x0, y0, x1, y1, color, theta, cx, cy, r = table[s]
+        if reversed_:
+            x0, y0, x1, y1, theta = x1, y1, x0, y0, -theta
+        segments.append((kind, index, reversed_))
+        colors.add(color)
+        vertices.append((x0, y0, math.tan(theta / 4) or 0.0))
+        twice_area += x0 * y1 - x1 * y0
+        bx += (x0, x1)
+        by += (y0, y1)
+        if kind == LINE:
+            length += math.hypot(x1 - x0, y1 - y0)
+        else:
+            # Odcinek koła między cięciwą a łukiem
+            arc_area += 0.5 * r * r * (theta - math.sin(theta))
+            length += r * abs(theta)
+            for px, py in arc_axis_points(cx, cy, r, math.atan2(y0 - cy, x0 - cx), theta):
+                bx.append(px)
+                by.append(py)
+    if not closed:
+        vertices.append((x1, y1, 0.0))
+        # Pole liczymy dla wielokąta domkniętego cięciwą
+        first_x, first_y = vertices[0][0], vertices[0][1]
+        twice_area += x1 * first_y - first_x * y1
+    color = colors.pop() if len(colors) == 1 else None
+    return Contour(segments, closed, color, vertices, 0.5 * twice_area + arc_area, length,
+                   (min(bx), min(by), max(bx), max(by)))
+
+
+def _contains(contour, x, y):
+    """
+    Czy punkt (x, y) leży wewnątrz zamkniętego konturu (łuki przybliżone wierzchołkami
+    i punktami pośrednimi – wystarczające do ustalenia zagnieżdżenia).
+    """
+    polygon = _polygon(contour)
+    inside = False
+    n = len(polygon)
+    for k in range(n):
+        x0, y0 = polygon[k]
+        x1, y1 = polygon[(k + 1) % n]
+        if (y0 > y) != (y1 > y) and x < x0 + (y - y0) * (x1 - x0) / (y1 - y0):
+            inside = not inside
+    return inside
+
+
+def _polygon(contour, steps=8):
+    vertices = contour._vertices
+    polygon = []
+    n = len(vertices)
+    for k, (x0, y0, bulge) in enumerate(vertices):
+        polygon.append((x0, y0))
+        if bulge and (contour.closed or k + 1 < n):
+            x1, y1 = vertices[(k + 1) % n][:2]
+            arc = bulge_arc(x0, y0, x1, y1, bulge)
+            if arc is None:
+                continue
+            cx, cy, r, start, theta = arc
+            for step in range(1, steps):
+                a = start + theta * step / steps
+                polygon.append((cx + r * math.cos(a), cy + r * math.sin(a)))
+    return polygon
+
+
+def classify_contours(contours, orient=False):
+    """
+    Ustala poziom zagnieżdżenia (depth) zamkniętych konturów: 0 – kontur zewnętrzny,
+    1 – otwór w nim, 2 – wyspa w otworze itd. Kontury otwarte dostają depth None.
+
+    Kontury przetwarzane są od największego pola. Kandydaci na kontur zawierający
+    pobierani są z siatki prostokątów otaczających (komórka punktu startowego konturu),
+    a zawieranie sprawdzane jest testem punktu – rodzicem jest najmniejszy zawierający.
+    orient=True ustawia obieg: zewnętrzne CCW (pole dodatnie), wewnętrzne CW.
+    Zwraca listę konturów (tę samą).
+    """
+    closed = sorted((c for c in contours if c.closed), key=lambda c: -abs(c.area))
+    cell_size = _grid_cell_size(closed)
+    cells = {}
+    large = []
+    for k, contour in enumerate(closed):
+        x, y = contour._vertices[0][:2]
+        x0, y0, x1, y1 = contour.bbox
+        parent = None
+        candidates = large + cells.get((math.floor(x / cell_size), math.floor(y / cell_size)), [])
+        # Największy numer = najmniejsze pole, więc pierwszy zawierający jest rodzicem
+        for j in sorted(candidates, reverse=True):
+            outer = closed[j]
+            ox0, oy0, ox1, oy1 = outer.bbox
+            if ox0 <= x0 and oy0 <= y0 and ox1 >= x1 and oy1 >= y1 and _contains(outer, x, y):
+                parent = outer
+                break
+        contour.depth = 0 if parent is None else parent.depth + 1
+        if orient and (contour.area > 0) != contour.is_outer:
+            contour.reverse()
+
+        ix0, iy0 = math.floor(x0 / cell_size), math.floor(y0 / cell_size)
+        ix1, iy1 = math.floor(x1 / cell_size), math.floor(y1 / cell_size)
+        if (ix1 - ix0 + 1) * (iy1 - iy0 + 1) > 64:
+            large.append(k)
+        else:
+            for ix in range(ix0, ix1 + 1):
+                for iy in range(iy0, iy1 + 1):
+                    cells.setdefault((ix, iy), []).append(k)
+    for contour in contours:
+        if not contour.closed:
+            contour.depth = None
+    return contours
+
+
+def _grid_cell_size(closed):
+    """
+    Rozmiar komórki siatki: średni bok prostokątów otaczających konturów.
+    """
+    if not closed:
+        return 1.0
+    total = sum(max(c.bbox[2] - c.bbox[0], c.bbox[3] - c.bbox[1]) for c in closed)
+    return max(total / len(closed), 1e-9)
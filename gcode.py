@@ -0,0 +1,256 @@
+import re
+
+# Interpreter programów G-code z sekcji START_TEXT ... STOP_TEXT plików LST.
+#
+# Wspólny rdzeń dla parse_lst.parse_lst i new_lst_parse.parse_gcode_block:
+#   - read_program / program_lines wybierają linie programu (bajty, cp1250),
+#   - interpret przechodzi linie raz, utrzymuje stan modalny (G90/G91, ostatnia komenda)
+#     i generuje rekordy ruchu, z których każdy konsument buduje własny wynik.
+#
+# Rekordy zwracane przez interpret (zwykłe krotki – najtańsze w tworzeniu):
+#   (LINEAR,  x0, y0, x1, y1, i, j, explicit)   ruch liniowy (G00/G01)
+#   (ARC_CW,  x0, y0, x1, y1, i, j, explicit)   łuk zgodnie z ruchem wskazówek (G02)
+#   (ARC_CCW, x0, y0, x1, y1, i, j, explicit)   łuk przeciwnie (G03)
+#   (LASER_ON, color)                           TC_LASER_ON(...), color 2 (grawer) lub 7
+#   (LASER_OFF,)                                TC_LASER_OFF
+# (x0, y0) to pozycja przed ruchem, (x1, y1) po ruchu (współrzędne bezwzględne),
+# i, j to przesunięcie środka łuku względem (x0, y0), a explicit mówi,
+# czy w bloku podano X lub Y.
+
+LINEAR = 1
+ARC_CW = 2
+ARC_CCW = 3
+ABSOLUTE = 90
+INCREMENTAL = 91
+LASER_ON = 10
+LASER_OFF = 11
+
+ENCODING = 'cp1250'
+
+# Komendy G (numer dokładnie tak, jak w pliku) -> kod komendy.
+# Nieznane numery (np. G4) są pomijane, a blok wykonuje ostatnią znaną komendę.
+G_CODES = {
+    "0": LINEAR, "00": LINEAR,  # szybki ruch traktujemy jak liniowy
+    "1": LINEAR, "01": LINEAR,
+    "2": ARC_CW, "02": ARC_CW,
+    "3": ARC_CCW, "03": ARC_CCW,
+    "90": ABSOLUTE,
+    "91": INCREMENTAL,
+}
+_G_CODES_BYTES = {number.encode(): code for number, code in G_CODES.items()}
+
+# Tokeny bloku: litera adresu i liczba
+TOKEN_RE = re.compile(r'([A-Z])([-+]?[0-9]*\.?[0-9]+)')
+LASER_PARAMS_RE = re.compile(r'TC_LASER_ON\((.*?)\)')
+_PARAM_SPLIT_RE = re.compile(r'[,\s]+')
+
+# "Kształt" linii to linia z usuniętymi cyframi, np. b"N G X. Y-.".
+# Linia o kształcie złożonym wyłącznie ze słów [A-Z][-+]?.? rozdzielonych spacjami
+# daje dokładnie te same tokeny co TOKEN_RE, ale można ją podzielić przez split().
+_DIGITS = b"0123456789"
+_LETTERS = b"ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+_SHAPE_WORD_RE = re.compile(rb"[A-Z][-+]?\.?")
+
+
+def program_lines(data, first_block_only=False):
+    """
+    Zwraca listę linii programu (bajty) spomiędzy START_TEXT i STOP_TEXT
+    z zawartości pliku LST. Domyślnie zbiera wszystkie bloki w pliku;
+    first_block_only=True kończy na pierwszym STOP_TEXT.
+
+    Końce linii traktujemy jak przy odczycie tekstowym (\\r\\n, \\r i \\n).
+    Znaczniki wyszukiwane są w całym buforze, a nie linia po linii.
+    """
+    if b"\r" in data:
+        data = data.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+    result = []
+    pos = 0
+    while True:
+        start = data.find(b"START_TEXT", pos)
+        if start < 0:
+            return result
+        if first_block_only and data.find(b"STOP_TEXT", pos, data.rfind(b"\n", 0, start) + 1) >= 0:
+            # STOP_TEXT przed pierwszym blokiem kończy odczyt
+            return result
+        begin = data.find(b"\n", start) + 1
+        if begin == 0:
+            return result
+        # Linia ze STOP_TEXT kończy blok, chyba że zawiera też START_TEXT (wtedy jest pomijana)
+        end = begin
+        while True:
+            stop = data.find(b"STOP_TEXT", end)
+            if stop < 0:
+                stop_line = pos = len(data)
+                break
+            stop_line = data.rfind(b"\n", 0, stop) + 1
+            pos = data.find(b"\n", stop) + 1 or len(data)
+            if b"START_TEXT" not in data[stop_line:pos]:
+                break
+            end = pos
+        region = data[begin:stop_line]
+        lines = region.split(b"\n") if region else []
+        if region.endswith(b"\n"):
+            # Pusty element po ostatnim znaku końca linii – to nie jest linia
+            lines.pop()
+        if b"START_TEXT" in region:
+            # Linie ze START_TEXT wewnątrz bloku nie są częścią programu
+            lines = [line for line in lines if b"START_TEXT" not in line]
+        result.extend(lines)
+        if first_block_only or pos >= len(data):
+            return result
+
+
+def read_program(lst_filename, first_block_only=False):
+    """
+    Wczytuje plik LST jednym odczytem i zwraca linie programu (patrz program_lines).
+    """
+    with open(lst_filename, 'rb') as f:
+        return program_lines(f.read(), first_block_only)
+
+
+def laser_color(line):
+    """
+    Kolor dla TC_LASER_ON(...): 2 (grawerka), jeśli wśród parametrów jest '2' lub '3',
+    w przeciwnym razie 7 (cięcie). Bez nawiasu z parametrami – 7.
+    """
+    m = LASER_PARAMS_RE.search(line)
+    if m:
+        tokens_param = _PARAM_SPLIT_RE.split(m.group(1))
+        if '2' in tokens_param or '3' in tokens_param:
+            return 2
+    return 7
+
+
+def _shape_plan(shape):
+    """
+    Plan odczytu dla linii o danym kształcie: (liczba tokenów, indeksy tokenów G, X, Y, I, J
+    lub -1, gdy brak) albo None, jeśli linię trzeba przetworzyć wyrażeniem regularnym
+    (słowa innego rodzaju, powtórzone adresy).
+    """
+    words = shape.split()
+    letters = []
+    for word in words:
+        if not _SHAPE_WORD_RE.fullmatch(word):
+            return None
+        letters.append(word[:1])
+    if len(set(letters)) != len(letters):
+        return None
+    index = {letter: k for k, letter in enumerate(letters)}
+    return (len(words),) + tuple(index.get(letter, -1) for letter in (b"G", b"X", b"Y", b"I", b"J"))
+
+
+def _parse_block(line, first_g=False):
+    """
+    Ścieżka ogólna: zwraca (rekord lasera, zmiana trybu) dla linii TC_LASER_ON/OFF
+    albo (komenda, zmiana trybu, X, Y, I, J) wg tokenów TOKEN_RE – tokeny przetwarzane są
+    po kolei, jak na maszynie (ostatni znany kod G i ostatnia wartość adresu wygrywają).
+    G90/G91 w linii lasera też zmienia tryb (jak w dawnym parserze).
+
+    first_g=True odtwarza dawny parser new_lst_parse: komendą jest tylko pierwszy kod G
+    bloku (nieznany daje komendę None), a tryb – pierwszy z G90/G91. Blok "G91 G01 X1"
+    zmienia wtedy tryb, ale nie wykonuje ruchu.
+    """
+    line = line.decode(ENCODING).strip()
+    laser = None
+    if "TC_LASER_ON" in line:
+        laser = (LASER_ON, laser_color(line))
+    elif "TC_LASER_OFF" in line:
+        laser = (LASER_OFF,)
+    command = None
+    mode = None
+    params = {}
+    seen_g = False
+    for letter, number in TOKEN_RE.findall(line):
+        if letter == 'G':
+            code = G_CODES.get(number)
+            if first_g:
+                if not seen_g:
+                    command = code
+                seen_g = True
+                if mode is None and (code == ABSOLUTE or code == INCREMENTAL):
+                    mode = code
+            elif code is not None:
+                command = code
+                if code == ABSOLUTE or code == INCREMENTAL:
+                    mode = code
+        else:
+            params[letter] = number
+    if laser is not None:
+        return laser, mode
+    return command, mode, params.get('X'), params.get('Y'), params.get('I'), params.get('J')
+
+
+def interpret(lines, incremental=False, modal=True):
+    """
+    Wykonuje linie programu (bajty, jak z read_program) i generuje rekordy ruchu
+    (patrz opis modułu).
+
+    incremental: tryb początkowy (False = G90, współrzędne bezwzględne; True = G91)
+    modal: czy blok bez kodu G powtarza ostatnią komendę (jak na maszynie);
+           przy modal=False takie bloki są pomijane, a – jak w dawnym parserze
+           new_lst_parse – liczy się tylko pierwszy kod G bloku (patrz _parse_block).
+
+    Typowy blok (np. "N10 G01 X12.5 Y-3") rozpoznawany jest po kształcie linii bez cyfr,
+    wyliczanym naraz dla całego programu; plan odczytu dla kształtu liczony jest raz,
+    a liczby bloku (linia bez liter, również przygotowana naraz) dzielone są przez split()
+    i zamieniane na float bez wyrażeń regularnych.
+    Pozostałe linie (TC_LASER_ON/OFF, nietypowy zapis) idą ścieżką ogólną.
+    """
+    joined = b"\n".join(lines)
+    shapes = joined.translate(None, _DIGITS).split(b"\n")
+    # Te same linie bez liter adresów – w typowym bloku zostają same liczby
+    numbers = joined.translate(None, _LETTERS).split(b"\n")
+    del joined
+    plans = {shape: _shape_plan(shape) for shape in set(shapes)}
+    g_codes = _G_CODES_BYTES
+    x = y = 0.0
+    command = None
+
+    for line, plan, values in zip(lines, map(plans.__getitem__, shapes), numbers):
+        if plan is not None:
+            values = values.split()
+        try:
+            if plan is None or len(values) != plan[0]:
+                raise ValueError
+            _, gi, xi, yi, ii, ji = plan
+            code = mode = None
+            if gi >= 0:
+                code = g_codes[values[gi]]
+                if code == ABSOLUTE or code == INCREMENTAL:
+                    mode = code
+            xv = float(values[xi]) if xi >= 0 else None
+            yv = float(values[yi]) if yi >= 0 else None
+            iv = float(values[ii]) if ii >= 0 else 0.0
+            jv = float(values[ji]) if ji >= 0 else 0.0
+        except (ValueError, KeyError):
+            block = _parse_block(line, not modal)
+            if len(block) == 2:
+                laser, mode = block
+                if mode is not None:
+                    incremental = mode == INCREMENTAL
+                yield laser
+                continue
+            code, mode, xv, yv, iv, jv = block
+            xv = float(xv) if xv is not None else None
+            yv = float(yv) if yv is not None else None
+            iv = float(iv) if iv is not None else 0.0
+            jv = float(jv) if jv is not None else 0.0
+
+        if mode is not None:
+            incremental = mode == INCREMENTAL
+        if code is not None:
+            command = code
+        elif modal:
+            code = command
+        if code is None or code > ARC_CCW:
+            # Brak komendy ruchu (albo sama zmiana trybu G90/G91)
+            continue
+
+        if incremental:
+            nx = x + (xv if xv is not None else 0.0)
+            ny = y + (yv if yv is not None else 0.0)
+        else:
+            nx = xv if xv is not None else x
+            ny = yv if yv is not None else y
+        yield (code, x, y, nx, ny, iv, jv, xv is not None or yv is not None)
+        x, y = nx, ny
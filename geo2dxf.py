@@ -0,0 +1,127 @@
+import argparse
+import sys
+from parse_geo import BACKENDS
+from write_dxf import DXF_MODES
+
+# Wspólny punkt wejścia wszystkich konwersji:
+#
+#   python geo2dxf.py dxf   <plik.geo> <plik.dxf> [--mode polyline] [--parser mmap] [--simplify 0.01]
+#   python geo2dxf.py svg   <plik.geo> <plik.svg|plik.png> [--margin 10] [--size 256]
+#   python geo2dxf.py lst   <plik.lst> <plik.dxf|plik.svg> [--mode ...]
+#   python geo2dxf.py sheet <plik.lst> <katalog_detali> <plik.dxf>
+#
+# Moduły konwersji importowane są dopiero w obsłudze wybranego polecenia, więc krótka
+# konwersja ładuje tylko to, czego potrzebuje (np. "dxf" nie importuje generatora SVG,
+# interpretera G-code ani cache, gdy nie jest używany). Na poziomie modułu są tylko
+# parse_geo i write_dxf – potrzebne każdemu poleceniu. Tryb wsadowy i obserwowanie
+# katalogu pozostają w main.py, usługa – w service.py.
+
+SIMPLIFY_HELP = "scal współliniowe odcinki i zastąp ciągi odcinków łukami z tolerancją TOL"
+
+
+def _cache(args):
+    """
+    Cache z opcji --cache albo ze zmiennych środowiskowych (cache.cache_from_env);
+    limit rozmiaru zawsze pochodzi z GEO2DXF_CACHE_MAX_MB.
+    """
+    from cache import cache_from_env
+    return cache_from_env(args.cache)
+
+
+def _dxf(args):
+    from main import geo_to_dxf
+    geo_to_dxf(args.input, args.output, cache=_cache(args), backend=args.parser, mode=args.mode,
+               weld=args.weld, simplify=args.simplify)
+
+
+def _svg(args):
+    from geo_to_svg import geo_to_thumbnail
+    geo_to_thumbnail(args.input, args.output, margin=args.margin, cache=_cache(args), size=args.size,
+                     simplify=args.simplify)
+
+
+def _lst(args):
+    if args.output.lower().endswith(".svg"):
+        from new_lst_parse import generate_svg_from_paths, parse_gcode_paths
+        generate_svg_from_paths(parse_gcode_paths(args.input), args.output)
+        return
+    from parse_lst import parse_lst
+    from write_dxf import write_dxf
+    geometry = parse_lst(args.input, weld=args.weld)
+    if args.simplify is not None:
+        from simplify import simplify_geometry
+        geometry = simplify_geometry(geometry, args.simplify)
+    write_dxf(args.output, *geometry, mode=args.mode)
+    print(f"Program LST '{args.input}' został zapisany do '{args.output}'.")
+
+
+def _sheet(args):
+    from parse_lst import export_sheet
+    export_sheet(args.input, args.output, args.parts, backend=args.parser, weld=args.weld,
+                 simplify=args.simplify, mode=args.mode)
+    print(f"Arkusz '{args.input}' został zapisany do '{args.output}'.")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="geo2dxf", description="Konwersja plików GEO i LST (Trumpf).")
+    sub = parser.add_subparsers(dest="command")
+
+    dxf = sub.add_parser("dxf", help="GEO -> DXF")
+    dxf.add_argument("input", help="plik wejściowy GEO")
+    dxf.add_argument("output", help="plik wyjściowy DXF")
+    dxf.add_argument("--mode", choices=DXF_MODES, default="entities",
+                     help="zapis geometrii: osobne LINE/ARC (domyślnie), POLYLINE (R12) lub LWPOLYLINE (R2000)")
+    dxf.add_argument("--parser", choices=BACKENDS, default="stream", help="parser GEO")
+    dxf.add_argument("--weld", type=float, metavar="TOL", help="scal punkty odległe o nie więcej niż TOL")
+    dxf.add_argument("--simplify", type=float, metavar="TOL", help=SIMPLIFY_HELP)
+    dxf.add_argument("--cache", metavar="KATALOG", help="katalog cache wyników")
+    dxf.set_defaults(handler=_dxf)
+
+    svg = sub.add_parser("svg", help="GEO -> podgląd SVG albo PNG (wg rozszerzenia pliku wyjściowego)")
+    svg.add_argument("input", help="plik wejściowy GEO")
+    svg.add_argument("output", help="plik wyjściowy SVG lub PNG")
+    svg.add_argument("--margin", type=int, default=10, help="margines (dla PNG w pikselach)")
+    svg.add_argument("--size", type=int, default=256, help="dłuższy bok podglądu PNG w pikselach")
+    svg.add_argument("--simplify", type=float, metavar="TOL", help=SIMPLIFY_HELP)
+    svg.add_argument("--cache", metavar="KATALOG", help="katalog cache wyników")
+    svg.set_defaults(handler=_svg)
+
+    lst = sub.add_parser("lst", help="program LST -> DXF (geometria) albo SVG (kontury cięcia)")
+    lst.add_argument("input", help="plik wejściowy LST")
+    lst.add_argument("output", help="plik wyjściowy DXF lub SVG")
+    lst.add_argument("--mode", choices=DXF_MODES, default="entities", help="zapis geometrii DXF")
+    lst.add_argument("--weld", type=float, metavar="TOL",
+                     help="scal punkty odległe o nie więcej niż TOL (tylko DXF)")
+    lst.add_argument("--simplify", type=float, metavar="TOL", help=SIMPLIFY_HELP + " (tylko DXF)")
+    lst.set_defaults(handler=_lst)
+
+    sheet = sub.add_parser("sheet", help="cały arkusz z LST -> DXF (detale jako bloki)")
+    sheet.add_argument("input", help="plik wejściowy LST")
+    sheet.add_argument("parts", help="katalog z plikami GEO detali")
+    sheet.add_argument("output", help="plik wyjściowy DXF")
+    sheet.add_argument("--mode", choices=("entities", "polyline"), default="entities",
+                       help="zapis geometrii bloków: osobne LINE/ARC (domyślnie) lub POLYLINE (R12)")
+    sheet.add_argument("--parser", choices=BACKENDS, default="stream", help="parser GEO")
+    sheet.add_argument("--weld", type=float, metavar="TOL", help="scal punkty odległe o nie więcej niż TOL")
+    sheet.add_argument("--simplify", type=float, metavar="TOL", help=SIMPLIFY_HELP)
+    sheet.set_defaults(handler=_sheet)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command is None:
+        parser.print_help()
+        sys.exit(1)
+    # Podgląd SVG programu LST rysuje kontury cięcia, a nie model Geometry – opcji
+    # przetwarzania geometrii nie da się do niego zastosować
+    if args.command == "lst" and args.output.lower().endswith(".svg"):
+        for option in ("weld", "simplify"):
+            if getattr(args, option) is not None:
+                parser.error(f"--{option} działa tylko przy zapisie LST do DXF")
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
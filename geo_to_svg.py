@@ -1,11 +1,28 @@
-import sys
 import math
-import svgwrite
+import sys
+from itertools import chain
+from arcs import geometry_arc_params
+from cache import cache_from_env
+from geometry import as_geometry
 from parse_geo import parse_geo
-# import cairosvg
+from raster import Canvas
+from simplify import simplify_geometry
+from spatial import ARC, CIRCLE, LINE, SpatialIndex
+from svg_writer import (GROUP_END, SVG_FOOTER, element_chunks, group_start, path_chunks, svg_header,
+                        write_svg)
+from transform import transformed_columns
+
+# Podgląd PNG: dłuższy bok obrazu w pikselach i paleta (tło, czarny, żółty)
+THUMBNAIL_SIZE = 256
+PNG_PALETTE = [(255, 255, 255), (0, 0, 0), (255, 255, 0)]
+PNG_COLORS = {"black": 1, "yellow": 2}
 
+# Dopuszczalne odchylenie cięciw od łuku w podglądzie PNG (w pikselach)
+PNG_ARC_TOLERANCE = 0.5
 
-def geo_to_svg(points, lines, arcs, circles, output_filename="output.svg", margin=10):
+
+def geo_to_svg(points, lines, arcs, circles, output_filename="output.svg", margin=10, verbose=True,
+               transform=None, viewport=None, index=None):
     """
     Generuje plik SVG na podstawie danych z GEO.
 
@@ -16,99 +33,236 @@ def geo_to_svg(points, lines, arcs, circles, output_filename="output.svg", margi
       - circles: lista [(center_point, radius, color_idx), ...]
       - output_filename: nazwa pliku SVG (np. "thumbnail.svg")
       - margin: margines wokół rysunku
+      - verbose: czy wypisać komunikat o zapisie pliku
+      - transform: opcjonalne przekształcenie geometrii (transform.Affine)
+      - viewport: opcjonalne okno (min_x, min_y, max_x, max_y) – rysujemy tylko encje,
+        które je przecinają (wg indeksu przestrzennego), a rysunek obejmuje samo okno
+      - index: gotowy spatial.SpatialIndex dla tej geometrii (i tego samego transform),
+        np. przy wielu oknach jednego rysunku; domyślnie budowany dla viewport
     """
-    # Obliczamy granice rysunku na podstawie punktów (i elementów, które rozszerzają zakres)
-    xs, ys = [], []
-    for (x, y, _) in points.values():
-        xs.append(x)
-        ys.append(y)
-    for (center_id, radius, _) in circles:
-        cx, cy, _ = points.get(center_id, (0, 0, 0))
-        xs.extend([cx - radius, cx + radius])
-        ys.extend([cy - radius, cy + radius])
-    for (center_id, start_id, end_id, _, _) in arcs:
-        for pid in (center_id, start_id, end_id):
-            x, y, _ = points.get(pid, (0, 0, 0))
-            xs.append(x)
-            ys.append(y)
-    if xs and ys:
-        min_x, max_x = min(xs), max(xs)
-        min_y, max_y = min(ys), max(ys)
+    geometry = as_geometry(points, lines, arcs, circles)
+    pxs, pys, directions, radii = transformed_columns(geometry, transform)
+
+    if viewport is not None:
+        min_x, min_y, max_x, max_y = viewport
+        if index is None:
+            index = SpatialIndex(geometry, transform=transform)
+        selected = {LINE: [], ARC: [], CIRCLE: []}
+        for kind, i in index.query(min_x, min_y, max_x, max_y):
+            selected[kind].append(i)
     else:
-        min_x = min_y = 0
-        max_x = max_y = 100
+        selected = None
+        min_x, min_y, max_x, max_y = _drawing_bounds(geometry, pxs, pys, radii)
 
     width = max_x - min_x + 2 * margin
     height = max_y - min_y + 2 * margin
 
-    # Tworzymy rysunek SVG – ustawiamy viewBox tak, aby rysunek mieścił się z marginesem
-    dwg = svgwrite.Drawing(output_filename, size=(f"{width}px", f"{height}px"),
-                           viewBox=f"{min_x - margin} {min_y - margin} {width} {height}")
-
-    # Rysowanie linii
-    for start_id, end_id, color_idx in lines:
-        start = points.get(start_id)
-        end = points.get(end_id)
-        if start and end:
-            color = "yellow" if color_idx in {2, 3} else "black"
-            dwg.add(dwg.line(start=(start[0], start[1]), end=(end[0], end[1]),
-                             stroke=color, stroke_width=1))
-
-    # Rysowanie łuków – używamy komendy SVG "A" (arc)
-    # Obliczamy kąty tak, jak w wersji DXF/matplotlib, by zachować zgodność
-    for center_id, start_id, end_id, direction, color_idx in arcs:
-        center = points.get(center_id)
-        start = points.get(start_id)
-        end = points.get(end_id)
-        if center and start and end:
-            # Obliczamy promień (odległość od środka do punktu startowego)
-            radius = math.hypot(start[0] - center[0], start[1] - center[1])
-            # Obliczamy kąty startowy i końcowy (w stopniach, zakres 0-360)
-            start_angle = math.degrees(math.atan2(start[1] - center[1], start[0] - center[0])) % 360
-            end_angle = math.degrees(math.atan2(end[1] - center[1], end[0] - center[0])) % 360
-
-            # Korekta kątów w zależności od kierunku (direction: 1 = CCW, inaczej CW)
-            if direction == 1:
-                if end_angle < start_angle:
-                    end_angle += 360
-            else:
-                if start_angle < end_angle:
-                    start_angle += 360
-
-            angle_range = end_angle - start_angle
-            # Wyznaczamy flagi SVG: large_arc_flag = 1 gdy kąt > 180°, sweep_flag zależny od kierunku
-            large_arc_flag = 1 if angle_range > 180 else 0
-            sweep_flag = 1 if direction == 1 else 0  # zakładamy, że CCW daje sweep_flag = 1
-
-            color = "yellow" if color_idx in {2, 3} else "black"
-            # Tworzymy ścieżkę: zaczynamy w punkcie start, następnie komenda "A" rysuje łuk
-            path_data = f"M {start[0]},{start[1]} " \
-                        f"A {radius},{radius} 0 {large_arc_flag},{sweep_flag} {end[0]},{end[1]}"
-            dwg.add(dwg.path(d=path_data, fill="none", stroke=color, stroke_width=1))
-
-    # Rysowanie okręgów (opcjonalnie – jeśli mają być rysowane)
-    for center_id, radius, color_idx in circles:
-        center = points.get(center_id)
-        if center:
-            color = "yellow" if color_idx in {2, 3} else "black"
-            dwg.add(dwg.circle(center=(center[0], center[1]), r=radius,
-                               stroke=color, fill="none", stroke_width=1))
-
-    dwg.save()
-    print(f"SVG zapisany do pliku: {output_filename}")
-
-
-def geo_to_thumbnail(geo_file, output_file="output.svg", margin=10):
-    points, lines, arcs, circles = parse_geo(geo_file)
-    geo_to_svg(points, lines, arcs, circles, output_filename=output_file, margin=margin)
+    # Nagłówek – viewBox ustawiamy tak, aby rysunek mieścił się z marginesem
+    header = svg_header(width, height, (min_x - margin, min_y - margin, width, height), unit="px")
+    arc_params = geometry_arc_params(geometry, pxs, pys, directions)
+    rows = {
+        LINE: lambda: _rows(selected and selected[LINE], geometry.line_start, geometry.line_end,
+                            geometry.line_color),
+        ARC: lambda: _rows(selected and selected[ARC], geometry.arc_start, geometry.arc_end,
+                           arc_params.radius, arc_params.large_arc, arc_params.sweep_flag,
+                           geometry.arc_color),
+        CIRCLE: lambda: _rows(selected and selected[CIRCLE], geometry.circle_center, radii,
+                              geometry.circle_color),
+    }
+
+    def body():
+        # Encje grupowane są wg koloru obrysu: linie i łuki jednego koloru tworzą jedną ścieżkę
+        # (łuki komendą SVG "A"; parametry liczone wsadowo tym samym kodem co w DXF),
+        # okręgi to elementy <circle> w tej samej grupie
+        for stroke in _strokes(geometry, selected):
+            yield group_start(stroke)
+            lines_d = (f"M {pxs[start_row]},{pys[start_row]} L {pxs[end_row]},{pys[end_row]}"
+                       for start_row, end_row, color_idx in rows[LINE]()
+                       if stroke_color(color_idx) == stroke)
+            arcs_d = (f"M {pxs[start_row]},{pys[start_row]} "
+                      f"A {radius},{radius} 0 {large_arc_flag},{sweep_flag} {pxs[end_row]},{pys[end_row]}"
+                      for start_row, end_row, radius, large_arc_flag, sweep_flag, color_idx in rows[ARC]()
+                      if stroke_color(color_idx) == stroke)
+            yield from path_chunks(chain(lines_d, arcs_d))
+            yield from element_chunks(f'<circle cx="{pxs[center_row]}" cy="{pys[center_row]}" r="{radius}"/>\n'
+                                      for center_row, radius, color_idx in rows[CIRCLE]()
+                                      if stroke_color(color_idx) == stroke)
+            yield GROUP_END
+
+    write_svg(output_filename, chain([header], body(), [SVG_FOOTER]))
+    if verbose:
+        print(f"SVG zapisany do pliku: {output_filename}")
+
+
+def stroke_color(color_idx):
+    """
+    Kolor obrysu SVG dla koloru encji: żółty dla grawerki (2, 3), czarny dla pozostałych.
+    """
+    return "yellow" if color_idx in {2, 3} else "black"
+
+
+def _strokes(geometry, selected):
+    """
+    Kolory obrysu występujące wśród rysowanych encji, w stałej kolejności (czarny, żółty).
+    """
+    colors = set()
+    for kind, column in ((LINE, geometry.line_color), (ARC, geometry.arc_color),
+                         (CIRCLE, geometry.circle_color)):
+        if selected is None:
+            colors.update(column)
+        else:
+            colors.update(column[i] for i in selected[kind])
+    return sorted({stroke_color(color_idx) for color_idx in colors})
+
+
+def _drawing_bounds(geometry, xs, ys, radii):
+    """
+    Granice rysunku na podstawie punktów (i elementów, które rozszerzają zakres).
+    Łuki korzystają z tych samych punktów, więc wystarczą kolumny punktów i okręgi.
+    """
+    if not len(xs):
+        return 0, 0, 100, 100
+    min_x, max_x = min(xs), max(xs)
+    min_y, max_y = min(ys), max(ys)
+    for (center_row, radius) in zip(geometry.circle_center, radii):
+        cx, cy = xs[center_row], ys[center_row]
+        min_x, max_x = min(min_x, cx - radius), max(max_x, cx + radius)
+        min_y, max_y = min(min_y, cy - radius), max(max_y, cy + radius)
+    return min_x, min_y, max_x, max_y
+
+
+def geo_to_png(points, lines, arcs, circles, output_filename="output.png", size=THUMBNAIL_SIZE,
+               margin=2, verbose=True, transform=None):
+    """
+    Generuje rastrowy podgląd PNG (dłuższy bok = size pikseli, margin w pikselach)
+    bez pośredniego SVG. Orientacja i kolory jak w geo_to_svg.
+
+    Geometria upraszczana jest do rozdzielczości obrazu: współrzędne zaokrąglane są
+    do pikseli, encje mniejsze niż piksel stają się pojedynczym punktem, łuki i okręgi
+    zastępowane są cięciwami o odchyleniu do PNG_ARC_TOLERANCE piksela, a współliniowe
+    odcinki i powtórzenia scala raster.Canvas.
+    """
+    geometry = as_geometry(points, lines, arcs, circles)
+    pxs, pys, directions, radii = transformed_columns(geometry, transform)
+    min_x, min_y, max_x, max_y = _drawing_bounds(geometry, pxs, pys, radii)
+
+    extent = max(max_x - min_x, max_y - min_y)
+    inner = max(size - 2 * margin, 1)
+    scale = inner / extent if extent > 0 else 1.0
+    width = min(size, math.ceil((max_x - min_x) * scale) + 2 * margin)
+    height = min(size, math.ceil((max_y - min_y) * scale) + 2 * margin)
+    last_x, last_y = width - 1, height - 1
+    canvas = Canvas(width, height)
+
+    def to_px(x, y):
+        # Łuki mogą wychodzić poza granice liczone z punktów – przycinamy do obrazu
+        return (max(0, min(int((x - min_x) * scale + margin), last_x)),
+                max(0, min(int((y - min_y) * scale + margin), last_y)))
+
+    qx = [min(int((x - min_x) * scale + margin), last_x) for x in pxs]
+    qy = [min(int((y - min_y) * scale + margin), last_y) for y in pys]
+    segment = canvas.segment
+
+    for start_row, end_row, color_idx in zip(geometry.line_start, geometry.line_end, geometry.line_color):
+        segment(qx[start_row], qy[start_row], qx[end_row], qy[end_row], PNG_COLORS[stroke_color(color_idx)])
+
+    arc_params = geometry_arc_params(geometry, pxs, pys, directions)
+    for center_row, start_row, end_row, direction, radius, a_s, span, color_idx in zip(
+            geometry.arc_center, geometry.arc_start, geometry.arc_end, directions, arc_params.radius,
+            arc_params.angle_start, arc_params.sweep, geometry.arc_color):
+        color = PNG_COLORS[stroke_color(color_idx)]
+        # Łuk rysowany jest CCW od a_s – dla łuków CW od punktu końcowego
+        first, last = (start_row, end_row) if direction == 1 else (end_row, start_row)
+        steps = _chord_steps(radius * scale, math.radians(span))
+        x0, y0 = qx[first], qy[first]
+        cx, cy = pxs[center_row], pys[center_row]
+        start = math.radians(a_s)
+        step = math.radians(span) / steps
+        for k in range(1, steps):
+            x1, y1 = to_px(cx + radius * math.cos(start + k * step), cy + radius * math.sin(start + k * step))
+            segment(x0, y0, x1, y1, color)
+            x0, y0 = x1, y1
+        segment(x0, y0, qx[last], qy[last], color)
+
+    for center_row, radius, color_idx in zip(geometry.circle_center, radii, geometry.circle_color):
+        color = PNG_COLORS[stroke_color(color_idx)]
+        cx, cy = pxs[center_row], pys[center_row]
+        steps = _chord_steps(radius * scale, 2 * math.pi)
+        if steps < 3:
+            canvas.dot(qx[center_row], qy[center_row], color)
+            continue
+        step = 2 * math.pi / steps
+        x0, y0 = start_px = to_px(cx + radius, cy)
+        for k in range(1, steps):
+            x1, y1 = to_px(cx + radius * math.cos(k * step), cy + radius * math.sin(k * step))
+            segment(x0, y0, x1, y1, color)
+            x0, y0 = x1, y1
+        segment(x0, y0, start_px[0], start_px[1], color)
+
+    canvas.save_png(output_filename, PNG_PALETTE)
+    if verbose:
+        print(f"PNG zapisany do pliku: {output_filename}")
+
+
+def _chord_steps(radius_px, span):
+    """
+    Liczba cięciw przybliżających łuk o promieniu radius_px (piksele) i rozpiętości span (radiany)
+    z odchyleniem nie większym niż PNG_ARC_TOLERANCE.
+    """
+    if radius_px <= PNG_ARC_TOLERANCE:
+        return 1
+    return max(1, math.ceil(span / (2 * math.acos(1 - PNG_ARC_TOLERANCE / radius_px))))
+
+
+def _rows(selected, *columns):
+    """
+    Wiersze kolumn: wszystkie (selected None) albo tylko o podanych indeksach.
+    """
+    if selected is None:
+        return zip(*columns)
+    return (tuple(column[i] for column in columns) for i in selected)
+
+
+def geo_to_thumbnail(geo_file, output_file="output.svg", margin=10, cache=None, size=THUMBNAIL_SIZE,
+                     verbose=True, simplify=None):
+    """
+    Generuje podgląd pliku GEO: SVG albo – dla pliku wynikowego .png – rastrowy podgląd
+    PNG o dłuższym boku size pikseli (geo_to_png, margin w pikselach). Jeśli podano cache
+    (cache.ConversionCache), powtórne żądanie dla tego samego pliku kopiuje gotowy wynik z cache.
+    simplify – tolerancja upraszczania geometrii przed rysowaniem (simplify.py); None wyłącza.
+    """
+    png = output_file.lower().endswith(".png")
+
+    def convert(input_file, out_file):
+        geometry = parse_geo(input_file)
+        if simplify is not None:
+            geometry = simplify_geometry(geometry, simplify)
+        points, lines, arcs, circles = geometry
+        if png:
+            geo_to_png(points, lines, arcs, circles, output_filename=out_file, size=size, margin=margin,
+                       verbose=False)
+        else:
+            geo_to_svg(points, lines, arcs, circles, output_filename=out_file, margin=margin,
+                       verbose=False)
+
+    if cache is not None:
+        options = {"margin": margin}
+        if png:
+            options["size"] = size
+        if simplify is not None:
+            options["simplify"] = simplify
+        cache.convert(convert, geo_file, output_file, "png" if png else "svg", options)
+    else:
+        convert(geo_file, output_file)
+    if verbose:
+        print(f"{'PNG' if png else 'SVG'} zapisany do pliku: {output_file}")
 
 
 if __name__ == "__main__":
     if len(sys.argv) < 3:
-        print("Usage: python geo_to_svg.py <plik.geo> <output.svg>")
+        print("Usage: python geo_to_svg.py <plik.geo> <output.svg|output.png> [rozmiar_px]")
         sys.exit(1)
     geo_file = sys.argv[1]
     output_file = sys.argv[2]
-    geo_to_thumbnail(geo_file, output_file)
-
-    # cairosvg.svg2png(url='output.svg', write_to='output.png')
\ No newline at end of file
+    size = int(sys.argv[3]) if len(sys.argv) > 3 else THUMBNAIL_SIZE
+    geo_to_thumbnail(geo_file, output_file, cache=cache_from_env(), size=size)
@@ -0,0 +1,151 @@
+import mmap
+import struct
+import sys
+from array import array
+from geometry import Geometry
+
+# Binarny format pośredni dla sparsowanej geometrii (plik *.geob).
+#
+# Nagłówek (little-endian):
+#   magic (8 bajtów), wersja (u32), flagi (u32), id_base (i64),
+#   liczba punktów, linii, łuków, okręgów (4 x u64)
+# Dalej kolejno surowe kolumny (little-endian) w kolejności COLUMNS,
+# każda wyrównana do 8 bajtów, dzięki czemu można je zmapować bez kopiowania.
+MAGIC = b"GEOBIN\x00\x01"
+VERSION = 1
+HEADER = struct.Struct("<8sIIqQQQQ")
+ALIGN = 8
+
+# Flaga: identyfikatory punktów są kolejne od id_base (indeks id -> wiersz niepotrzebny)
+FLAG_DENSE_IDS = 1
+
+# (nazwa kolumny, kod typu array, która liczność ją określa)
+COLUMNS = (
+    ("point_ids", "q", "points"),
+    ("xs", "d", "points"),
+    ("ys", "d", "points"),
+    ("zs", "d", "points"),
+    ("line_start", "q", "lines"),
+    ("line_end", "q", "lines"),
+    ("line_color", "h", "lines"),
+    ("arc_center", "q", "arcs"),
+    ("arc_start", "q", "arcs"),
+    ("arc_end", "q", "arcs"),
+    ("arc_direction", "b", "arcs"),
+    ("arc_color", "h", "arcs"),
+    ("circle_center", "q", "circles"),
+    ("circle_radius", "d", "circles"),
+    ("circle_color", "h", "circles"),
+)
+
+_LITTLE_ENDIAN = sys.byteorder == "little"
+
+
+def _padding(size):
+    return -size % ALIGN
+
+
+def is_geobin(filename):
+    """
+    Sprawdza, czy plik zaczyna się od sygnatury formatu binarnego.
+    """
+    with open(filename, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def dump_geometry(geometry, filename):
+    """
+    Zapisuje model Geometry do pliku binarnego.
+    """
+    dense = geometry._index is None and geometry._id_base is not None
+    counts = {
+        "points": len(geometry.point_ids),
+        "lines": len(geometry.line_start),
+        "arcs": len(geometry.arc_center),
+        "circles": len(geometry.circle_center),
+    }
+    with open(filename, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, FLAG_DENSE_IDS if dense else 0,
+                            geometry._id_base if dense else 0,
+                            counts["points"], counts["lines"], counts["arcs"], counts["circles"]))
+        for name, typecode, _ in COLUMNS:
+            column = array(typecode, getattr(geometry, name))
+            if not _LITTLE_ENDIAN:
+                column.byteswap()
+            data = column.tobytes()
+            f.write(data)
+            f.write(b"\x00" * _padding(len(data)))
+
+
+def load_geometry(filename):
+    """
+    Wczytuje plik binarny przez mmap. Kolumny modelu są widokami memoryview
+    na zmapowany plik (bez kopiowania danych), więc wczytanie jest praktycznie
+    natychmiastowe niezależnie od rozmiaru. Zwrócony model jest tylko do odczytu.
+
+    Mapowanie zwalnia geometry.close() (lub blok with); bez tego zostaje zwolnione
+    razem z modelem. Przy błędzie (zły format, uszkodzony plik) jest zamykane od razu.
+    """
+    with open(filename, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    # Widoki na mapowanie – przed mapped.close() wszystkie muszą zostać zwolnione
+    views = [memoryview(mapped)]
+
+    def close():
+        for view in reversed(views):
+            view.release()
+        mapped.close()
+
+    try:
+        magic, version, flags, id_base, *counts = HEADER.unpack_from(mapped, 0)
+        if magic != MAGIC:
+            raise ValueError(f"'{filename}' nie jest plikiem w formacie geobin")
+        if version != VERSION:
+            raise ValueError(f"Nieobsługiwana wersja formatu geobin: {version}")
+        counts = dict(zip(("points", "lines", "arcs", "circles"), counts))
+
+        geometry = Geometry()
+        buffer = views[0]
+        offset = HEADER.size
+        for name, typecode, count_key in COLUMNS:
+            itemsize = array(typecode).itemsize
+            size = counts[count_key] * itemsize
+            if offset + size > len(mapped):
+                raise ValueError(f"Plik '{filename}' jest uszkodzony (za krótki)")
+            raw = buffer[offset:offset + size]
+            views.append(raw)
+            if _LITTLE_ENDIAN:
+                column = raw.cast(typecode)
+                views.append(column)
+            else:
+                column = array(typecode, raw.tobytes())
+                column.byteswap()
+            setattr(geometry, name, column)
+            offset += size + _padding(size)
+    except BaseException:
+        close()
+        raise
+
+    if flags & FLAG_DENSE_IDS:
+        geometry._id_base = id_base
+    geometry._close = close
+    return geometry
+
+
+def main():
+    if len(sys.argv) < 3:
+        print("Użycie: python geobin.py <plik.geo|plik.lst> <plik.geob>")
+        sys.exit(1)
+    source, target = sys.argv[1], sys.argv[2]
+    if source.lower().endswith(".lst"):
+        from parse_lst import parse_lst
+        geometry = parse_lst(source)
+    else:
+        from parse_geo import parse_geo
+        geometry = parse_geo(source)
+    dump_geometry(geometry, target)
+    print(f"Zapisano {geometry!r} do '{target}'.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,388 @@
+from array import array
+from collections.abc import Mapping, Sequence
+from itertools import repeat
+
+
+class Geometry:
+    """
+    Kolumnowy model geometrii odczytanej z pliku GEO/LST.
+
+    Zamiast słownika krotek trzymamy dane w tablicach array.array:
+      - punkty: point_ids, xs, ys, zs
+      - linie: line_start, line_end, line_color
+      - łuki: arc_center, arc_start, arc_end, arc_direction, arc_color
+      - okręgi: circle_center, circle_radius, circle_color
+
+    Odwołania do punktów w liniach/łukach/okręgach to numery wierszy w tablicach
+    punktów (a nie identyfikatory z pliku), dzięki czemu zapis DXF/SVG może
+    odczytywać współrzędne bezpośrednio z xs/ys, bez wyszukiwania w słowniku.
+
+    Indeks id -> wiersz budowany jest tylko wtedy, gdy identyfikatory punktów
+    nie są kolejnymi liczbami (typowy plik GEO numeruje punkty 1, 2, 3, ...),
+    więc w zwykłym przypadku punkt zajmuje 32 bajty (id + x, y, z).
+
+    Powtórzony identyfikator punktu nadpisuje współrzędne istniejącego wiersza (ostatnia
+    definicja wygrywa, jak w dawnym słowniku punktów): encje dodane wcześniej widzą nowe
+    współrzędne, a w kolumnach nie zostają nieaktualne wiersze.
+
+    Dawny interfejs krotkowy dostępny jest jako widoki:
+      points, lines, arcs, circles = geometry
+    gdzie points zachowuje się jak słownik {id: (x, y, z)}, a pozostałe
+    jak listy krotek w formacie zwracanym wcześniej przez parse_geo.
+    """
+
+    def __init__(self):
+        self.point_ids = array('q')
+        self.xs = array('d')
+        self.ys = array('d')
+        self.zs = array('d')
+
+        self.line_start = array('q')
+        self.line_end = array('q')
+        self.line_color = array('h')
+
+        self.arc_center = array('q')
+        self.arc_start = array('q')
+        self.arc_end = array('q')
+        self.arc_direction = array('b')
+        self.arc_color = array('h')
+
+        self.circle_center = array('q')
+        self.circle_radius = array('d')
+        self.circle_color = array('h')
+
+        # _index None i _id_base ustawione = identyfikatory kolejne, wiersz = id - _id_base
+        self._index = None
+        self._id_base = None
+        # Zwolnienie zasobów, na które wskazują kolumny (np. mapowanie pliku geobin) – patrz close()
+        self._close = None
+
+    # --- Zasoby ---
+
+    def close(self):
+        """
+        Zwalnia zasoby modelu wczytanego z pliku geobin (kolumny to widoki na zmapowany
+        plik – geobin.load_geometry); dla pozostałych modeli nic nie robi. Po zamknięciu
+        kolumn takiego modelu nie można już czytać. Model można też użyć w bloku with:
+          with parse_geo("detal.geob") as geometry: ...
+        """
+        close, self._close = self._close, None
+        if close is not None:
+            close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @classmethod
+    def from_tuples(cls, points, lines, arcs, circles):
+        """
+        Buduje model kolumnowy z dawnych struktur (słownik punktów i listy krotek).
+        Encje odwołujące się do nieistniejących punktów są pomijane – tak jak robił
+        to dawny generator SVG (points.get(...) i pominięcie elementu).
+        """
+        geometry = cls()
+        for pid, (x, y, z) in points.items():
+            geometry.add_point(pid, x, y, z)
+        for (start_p, end_p, color_idx) in lines:
+            try:
+                geometry.add_line(start_p, end_p, color_idx)
+            except KeyError:
+                pass
+        for (center_p, start_p, end_p, direction, color_idx) in arcs:
+            try:
+                geometry.add_arc(center_p, start_p, end_p, direction, color_idx)
+            except KeyError:
+                pass
+        for (center_p, radius, color_idx) in circles or ():
+            try:
+                geometry.add_circle(center_p, radius, color_idx)
+            except KeyError:
+                pass
+        return geometry
+
+    # --- Indeks punktów ---
+
+    def row(self, point_id):
+        """
+        Zwraca numer wiersza punktu o podanym identyfikatorze (KeyError, gdy brak).
+        """
+        if self._index is not None:
+            return self._index[point_id]
+        if self._id_base is not None:
+            row = point_id - self._id_base
+            if 0 <= row < len(self.point_ids):
+                return row
+            raise KeyError(point_id)
+        # Identyfikatory niekolejne, a indeks jeszcze nie powstał (np. po wczytaniu z geobin)
+        return self.index[point_id]
+
+    @property
+    def index(self):
+        """
+        Słownik {id punktu: wiersz}. Tworzony na żądanie, jeśli identyfikatory są kolejne.
+        """
+        if self._index is None:
+            self._index = {pid: row for row, pid in enumerate(self.point_ids)}
+        return self._index
+
+    # --- Dodawanie elementów ---
+
+    def add_point(self, point_id, x, y, z=0.0):
+        row = len(self.point_ids)
+        if self._index is None:
+            if row == 0:
+                self._id_base = point_id
+            elif self._id_base is not None and self._id_base <= point_id < self._id_base + row:
+                # Powtórzony identyfikator przy kolejnej numeracji – nadpisujemy jego wiersz
+                return self._redefine(point_id - self._id_base, x, y, z)
+            elif self._id_base is None or point_id != self._id_base + row:
+                # Identyfikatory przestały być kolejne – przechodzimy na słownik
+                self.index
+        if self._index is not None:
+            existing = self._index.get(point_id)
+            if existing is not None:
+                return self._redefine(existing, x, y, z)
+            self._index[point_id] = row
+        self.point_ids.append(point_id)
+        self.xs.append(x)
+        self.ys.append(y)
+        self.zs.append(z)
+        return row
+
+    def _redefine(self, row, x, y, z):
+        # Ostatnia definicja punktu wygrywa (jak w słowniku)
+        self.xs[row] = x
+        self.ys[row] = y
+        self.zs[row] = z
+        return row
+
+    # Wiersze wyznaczane są przed dopisaniem czegokolwiek – KeyError (brak punktu)
+    # nie zostawia w kolumnach niepełnej encji.
+
+    def add_line(self, start_p, end_p, color_idx):
+        start_row, end_row = self.row(start_p), self.row(end_p)
+        self.line_start.append(start_row)
+        self.line_end.append(end_row)
+        self.line_color.append(color_idx)
+
+    def add_arc(self, center_p, start_p, end_p, direction, color_idx):
+        center_row, start_row, end_row = self.row(center_p), self.row(start_p), self.row(end_p)
+        self.arc_center.append(center_row)
+        self.arc_start.append(start_row)
+        self.arc_end.append(end_row)
+        self.arc_direction.append(direction)
+        self.arc_color.append(color_idx)
+
+    def add_circle(self, center_p, radius, color_idx):
+        self.circle_center.append(self.row(center_p))
+        self.circle_radius.append(radius)
+        self.circle_color.append(color_idx)
+
+    # --- Dodawanie hurtowe (np. z parsera bajtowego) ---
+
+    def rows(self, point_ids):
+        """
+        Hurtowa wersja row(): zamienia ciąg identyfikatorów na tablicę wierszy.
+        """
+        point_ids = array('q', point_ids)
+        if self._index is None and self._id_base is not None and point_ids:
+            if min(point_ids) < self._id_base or \
+                    max(point_ids) >= self._id_base + len(self.point_ids):
+                # Zgłaszamy pierwszy brakujący identyfikator, tak jak row()
+                for pid in point_ids:
+                    self.row(pid)
+            return array('q', map(int.__sub__, point_ids, repeat(self._id_base)))
+        return array('q', map(self.index.__getitem__, point_ids))
+
+    def extend_points(self, point_ids, xs, ys, zs):
+        point_ids = array('q', point_ids)
+        start = len(self.point_ids)
+        if point_ids and self._index is None:
+            base = point_ids[0] if start == 0 else self._id_base
+            if base is not None and point_ids == array('q', range(base + start,
+                                                                  base + start + len(point_ids))):
+                self._id_base = base
+            else:
+                self.index
+        if self._index is not None:
+            rows = dict(zip(point_ids, range(start, start + len(point_ids))))
+            if len(rows) != len(point_ids) or not self._index.keys().isdisjoint(rows):
+                # Powtórzone identyfikatory – punkt po punkcie, żeby ostatnia definicja nadpisała wiersz
+                for point in zip(point_ids, xs, ys, zs):
+                    self.add_point(*point)
+                return
+            self._index.update(rows)
+        self.point_ids.extend(point_ids)
+        self.xs.extend(xs)
+        self.ys.extend(ys)
+        self.zs.extend(zs)
+
+    def extend_lines(self, start_ids, end_ids, colors):
+        start_rows, end_rows = self.rows(start_ids), self.rows(end_ids)
+        self.line_start.extend(start_rows)
+        self.line_end.extend(end_rows)
+        self.line_color.extend(colors)
+
+    def extend_arcs(self, center_ids, start_ids, end_ids, directions, colors):
+        center_rows, start_rows, end_rows = self.rows(center_ids), self.rows(start_ids), self.rows(end_ids)
+        self.arc_center.extend(center_rows)
+        self.arc_start.extend(start_rows)
+        self.arc_end.extend(end_rows)
+        self.arc_direction.extend(directions)
+        self.arc_color.extend(colors)
+
+    def extend_circles(self, center_ids, radii, colors):
+        self.circle_center.extend(self.rows(center_ids))
+        self.circle_radius.extend(radii)
+        self.circle_color.extend(colors)
+
+    # --- Widoki zgodne z dawnym API ---
+
+    @property
+    def points(self):
+        return PointsView(self)
+
+    @property
+    def lines(self):
+        return LinesView(self)
+
+    @property
+    def arcs(self):
+        return ArcsView(self)
+
+    @property
+    def circles(self):
+        return CirclesView(self)
+
+    def __iter__(self):
+        # Pozwala na: points, lines, arcs, circles = parse_geo(...)
+        return iter((self.points, self.lines, self.arcs, self.circles))
+
+    def __getitem__(self, i):
+        # Zgodność z dawnym wynikiem w postaci krotki (points, lines, arcs, circles)
+        return (self.points, self.lines, self.arcs, self.circles)[i]
+
+    def __repr__(self):
+        return (f"<Geometry points={len(self.point_ids)} lines={len(self.line_start)} "
+                f"arcs={len(self.arc_center)} circles={len(self.circle_center)}>")
+
+
+class PointsView(Mapping):
+    """
+    Widok punktów w postaci słownika {id: (x, y, z)}.
+    """
+
+    def __init__(self, geometry):
+        self.geometry = geometry
+
+    def __getitem__(self, point_id):
+        g = self.geometry
+        row = g.row(point_id)
+        return (g.xs[row], g.ys[row], g.zs[row])
+
+    def __iter__(self):
+        g = self.geometry
+        if g._index is None and g._id_base is not None:
+            return iter(g.point_ids)
+        return iter(g.index)
+
+    def __len__(self):
+        g = self.geometry
+        if g._index is None and g._id_base is not None:
+            return len(g.point_ids)
+        return len(g.index)
+
+    def __contains__(self, point_id):
+        try:
+            self.geometry.row(point_id)
+        except (KeyError, TypeError):
+            return False
+        return True
+
+
+class _RecordsView(Sequence):
+    """
+    Wspólna baza widoków krotkowych dla linii, łuków i okręgów.
+    """
+
+    def __init__(self, geometry):
+        self.geometry = geometry
+
+    def __len__(self):
+        return len(self._columns()[0])
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[k] for k in range(*i.indices(len(self)))]
+        return self._record(*(column[i] for column in self._columns()))
+
+    def __iter__(self):
+        record = self._record
+        for values in zip(*self._columns()):
+            yield record(*values)
+
+    def __eq__(self, other):
+        if isinstance(other, (list, tuple, _RecordsView)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+class LinesView(_RecordsView):
+    """
+    Widok linii: [(start_p, end_p, color_idx), ...]
+    """
+
+    def _columns(self):
+        g = self.geometry
+        return (g.line_start, g.line_end, g.line_color)
+
+    def _record(self, start_row, end_row, color_idx):
+        ids = self.geometry.point_ids
+        return (ids[start_row], ids[end_row], color_idx)
+
+
+class ArcsView(_RecordsView):
+    """
+    Widok łuków: [(center_p, start_p, end_p, direction, color_idx), ...]
+    """
+
+    def _columns(self):
+        g = self.geometry
+        return (g.arc_center, g.arc_start, g.arc_end, g.arc_direction, g.arc_color)
+
+    def _record(self, center_row, start_row, end_row, direction, color_idx):
+        ids = self.geometry.point_ids
+        return (ids[center_row], ids[start_row], ids[end_row], direction, color_idx)
+
+
+class CirclesView(_RecordsView):
+    """
+    Widok okręgów: [(center_p, radius, color_idx), ...]
+    """
+
+    def _columns(self):
+        g = self.geometry
+        return (g.circle_center, g.circle_radius, g.circle_color)
+
+    def _record(self, center_row, radius, color_idx):
+        return (self.geometry.point_ids[center_row], radius, color_idx)
+
+
+def as_geometry(points, lines, arcs, circles):
+    """
+    Zwraca model kolumnowy dla podanych danych.
+    Jeśli dane to widoki jednego obiektu Geometry (np. wynik parse_geo),
+    zwracamy ten obiekt bez kopiowania; w przeciwnym razie budujemy nowy.
+    """
+    if isinstance(points, PointsView):
+        geometry = points.geometry
+        views = (lines, arcs, circles)
+        if all(isinstance(v, _RecordsView) and v.geometry is geometry for v in views):
+            return geometry
+    return Geometry.from_tuples(points, lines, arcs, circles or [])
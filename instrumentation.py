@@ -0,0 +1,163 @@
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+# cProfile/pstats i json importowane są dopiero w funkcjach, które ich używają –
+# zwykła konwersja (bez --profile i --metrics) nie ponosi kosztu ich importu.
+
+# Zmienna środowiskowa włączająca profilowanie (odpowiednik flagi --profile):
+#   "1" / "cprofile"  – cProfile (biblioteka standardowa)
+#   "pyinstrument"    – pyinstrument, jeśli jest zainstalowany (w przeciwnym razie cProfile)
+ENV_PROFILE = "GEO2DXF_PROFILE"
+
+
+class Metrics:
+    """
+    Pomiary jednej konwersji: czasy etapów (parse, weld, simplify, transform, write, ...)
+    oraz liczniki (liczba encji danego typu, bajty odczytane/zapisane, trafienia cache).
+
+    Użycie:
+        metrics = Metrics(input="a.geo")
+        with metrics.stage("parse"):
+            geometry = parse_geo(...)
+        metrics.count("lines", len(geometry.line_start))
+
+    Opcjonalne on_stage(nazwa, sekundy) wywoływane jest po każdym etapie –
+    pozwala podpiąć własne raportowanie bez zmiany kodu konwersji.
+    """
+
+    def __init__(self, on_stage=None, **info):
+        self.info = info
+        self.stages = {}
+        self.counters = {}
+        self.on_stage = on_stage
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name, seconds):
+        # Etap wykonany kilka razy (np. kilka detali) sumuje się
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+        if self.on_stage is not None:
+            self.on_stage(name, seconds)
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def count_geometry(self, geometry):
+        """
+        Zlicza encje modelu Geometry według typu.
+        """
+        self.count("points", len(geometry.point_ids))
+        self.count("lines", len(geometry.line_start))
+        self.count("arcs", len(geometry.arc_center))
+        self.count("circles", len(geometry.circle_center))
+
+    @property
+    def total(self):
+        return sum(self.stages.values())
+
+    def as_dict(self):
+        return {**self.info, "stages": dict(self.stages), "total": self.total,
+                "counters": dict(self.counters)}
+
+    def to_json(self, **kwargs):
+        import json
+        return json.dumps(self.as_dict(), ensure_ascii=False, **kwargs)
+
+
+class NullMetrics(Metrics):
+    """
+    Metryki, które niczego nie zapisują – domyślne, gdy pomiary są wyłączone.
+    """
+
+    @contextmanager
+    def stage(self, name):
+        yield self
+
+    def add_time(self, name, seconds):
+        pass
+
+    def count(self, name, value=1):
+        pass
+
+    def count_geometry(self, geometry):
+        pass
+
+
+def write_metrics(records, target):
+    """
+    Zapisuje listę metryk (słowników) jako JSON do pliku lub na stderr (target "-").
+    """
+    import json
+    text = json.dumps(records, ensure_ascii=False, indent=2)
+    if target == "-":
+        print(text, file=sys.stderr)
+    else:
+        with open(target, 'w', encoding='utf-8') as f:
+            f.write(text + "\n")
+
+
+def profile_mode(flag=None):
+    """
+    Ustala tryb profilowania na podstawie flagi --profile lub zmiennej GEO2DXF_PROFILE.
+    Zwraca None (brak profilowania), "cprofile" lub "pyinstrument".
+    """
+    value = flag or os.environ.get(ENV_PROFILE, "")
+    value = value.strip().lower()
+    if value in ("", "0", "no", "off"):
+        return None
+    if value == "pyinstrument":
+        try:
+            import pyinstrument  # noqa: F401
+            return "pyinstrument"
+        except ImportError:
+            print("pyinstrument nie jest zainstalowany – używam cProfile.", file=sys.stderr)
+    return "cprofile"
+
+
+@contextmanager
+def profiled(mode, output=None, limit=30):
+    """
+    Profiluje blok kodu. Wynik trafia na stderr, a jeśli podano output, także do pliku
+    (cProfile: plik .prof do otwarcia np. w snakeviz; pyinstrument: raport HTML).
+    mode=None oznacza brak profilowania.
+    """
+    if mode is None:
+        yield
+        return
+
+    if mode == "pyinstrument":
+        from pyinstrument import Profiler
+        profiler = Profiler()
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            print(profiler.output_text(unicode=True), file=sys.stderr)
+            if output:
+                with open(output, 'w', encoding='utf-8') as f:
+                    f.write(profiler.output_html())
+        return
+
+    import cProfile
+    import io
+    import pstats
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        stream = io.StringIO()
+        pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(limit)
+        print(stream.getvalue(), file=sys.stderr)
+        if output:
+            profiler.dump_stats(output)
@@ -1,27 +1,392 @@
+import argparse
+import glob
+import os
 import sys
-from parse_geo import parse_geo
-from write_dxf import write_dxf
+import time
+from cache import ENV_CACHE_DIR, cache_from_env
+from instrumentation import ENV_PROFILE, Metrics, NullMetrics, profile_mode, profiled, write_metrics
+from parse_geo import BACKENDS, parse_geo
+from simplify import simplify_geometry
+from transform import transformed_geometry
+from weld import weld_points
+from write_dxf import DXF_MODES, write_dxf
 
-def geo_to_dxf(geo_file, dxf_file):
+# Opcje plików skonwertowanych w trybie wsadowym (katalog wyjściowy, patrz convert_batch)
+BATCH_MANIFEST = ".geo2dxf-batch.json"
+
+
+def conversion_options(mode="entities", weld=None, simplify=None, transform=None):
+    """
+    Opcje konwersji GEO -> DXF wpływające na wynik (klucz cache, manifest trybu wsadowego).
+    Opcje domyślne są pomijane, więc wpisy sprzed ich wprowadzenia pozostają ważne.
+    """
+    options = {}
+    if mode != "entities":
+        options["mode"] = mode
+    if weld is not None:
+        options["weld"] = weld
+    if simplify is not None:
+        options["simplify"] = simplify
+    if transform is not None and not transform.is_identity:
+        # Współczynniki Affine (a, b, c, d, e, f) – lista, żeby opcje dało się zapisać jako JSON
+        options["transform"] = list(transform.coefficients)
+    return options
+
+
+def replace_atomically(output_file, produce):
+    """
+    Wywołuje produce(plik_tymczasowy) i dopiero gotowy wynik przenosi na miejsce output_file
+    (os.replace w tym samym katalogu). Przerwana lub nieudana konwersja nie zostawia
+    uciętego pliku wynikowego. Zwraca wynik produce.
+    """
+    directory, name = os.path.split(output_file)
+    tmp = os.path.join(directory, f".{name}.{os.getpid()}.tmp")
+    try:
+        result = produce(tmp)
+        os.replace(tmp, output_file)
+    finally:
+        if os.path.lexists(tmp):
+            os.remove(tmp)
+    return result
+
+
+def geo_to_dxf(geo_file, dxf_file, verbose=True, cache=None, backend="stream", metrics=None,
+               mode="entities", weld=None, simplify=None, transform=None):
     """
     Konwertuje plik GEO do DXF.
     Kolor linii ustalany jest na podstawie parametrów z pliku GEO:
       - Jeśli linia ma w parametrach token '2' lub '3' (np. "3 0"),
         to traktujemy ją jako grawer (kolor żółty, czyli 2).
       - W przeciwnym wypadku kolor domyślny wynosi 7.
+
+    Jeśli podano cache (cache.ConversionCache), a ten sam plik GEO był już
+    konwertowany, wynik jest kopiowany z cache bez ponownego parsowania.
+    backend wybiera parser GEO ("stream" lub "mmap", patrz parse_geo.parse_geo).
+    mode wybiera sposób zapisu geometrii (write_dxf.DXF_MODES, np. "polyline").
+    weld – tolerancja spawania punktów przy parsowaniu (patrz weld.py); None wyłącza.
+    simplify – tolerancja upraszczania geometrii przed zapisem (scalanie współliniowych
+    odcinków i dopasowanie łuków, patrz simplify.py); None wyłącza.
+    transform – opcjonalne przekształcenie geometrii (transform.Affine) przed zapisem.
+
+    Plik DXF zapisywany jest atomowo (replace_atomically).
+
+    metrics (instrumentation.Metrics) zbiera czasy etapów (parse – odczyt i parsowanie
+    w jednym przebiegu strumieniowym, weld, simplify, transform, write, cache) oraz liczniki:
+    bajty odczytane/zapisane, liczba encji każdego typu, trafienia cache.
     """
-    points, lines, arcs, circles = parse_geo(geo_file)
-    write_dxf(dxf_file, points, lines, arcs, circles)
-    print(f"Plik GEO '{geo_file}' został skonwertowany do '{dxf_file}'.")
+    if metrics is None:
+        metrics = NullMetrics()
+
+    def convert(input_file, output_file):
+        metrics.count("bytes_read", os.path.getsize(input_file))
+        # Odczyt i parsowanie to jeden etap: parser czyta plik strumieniowo
+        with metrics.stage("parse"):
+            parsed = parse_geo(input_file, backend=backend)
+        # close() zwalnia mapowanie pliku geobin od razu po zapisie
+        with parsed:
+            geometry = parsed
+            if weld is not None:
+                with metrics.stage("weld"):
+                    geometry = weld_points(geometry, weld)
+            if simplify is not None:
+                with metrics.stage("simplify"):
+                    geometry = simplify_geometry(geometry, simplify)
+            metrics.count_geometry(geometry)
+            if transform is not None:
+                with metrics.stage("transform"):
+                    geometry = transformed_geometry(geometry, transform)
+            with metrics.stage("write"):
+                metrics.count("bytes_written", write_dxf(output_file, *geometry, mode=mode))
+
+    if cache is not None:
+        start, inner = time.perf_counter(), metrics.total
+        options = conversion_options(mode, weld, simplify, transform)
+        from_cache = replace_atomically(
+            dxf_file, lambda tmp: cache.convert(convert, geo_file, tmp, "dxf", options))
+        # Etap "cache" to tylko obsługa cache (skrót, kopiowanie) – bez parse/write
+        metrics.add_time("cache", time.perf_counter() - start - (metrics.total - inner))
+        metrics.count("cache_hits" if from_cache else "cache_misses")
+    else:
+        replace_atomically(dxf_file, lambda tmp: convert(geo_file, tmp))
+        from_cache = False
+    if verbose:
+        note = " (z cache)" if from_cache else ""
+        print(f"Plik GEO '{geo_file}' został skonwertowany do '{dxf_file}'{note}.")
+
+
+def find_geo_files(source):
+    """
+    Zwraca posortowaną listę plików GEO: wszystkie *.geo z katalogu
+    albo pliki pasujące do wzorca glob (np. "export/**/*.geo").
+    """
+    if os.path.isdir(source):
+        return sorted(os.path.join(source, name) for name in os.listdir(source)
+                      if name.lower().endswith(".geo"))
+    return sorted(path for path in glob.glob(source, recursive=True) if os.path.isfile(path))
+
+
+def _source_root(source):
+    """
+    Katalog, względem którego liczone są ścieżki plików źródła trybu wsadowego:
+    sam katalog albo stała część wzorca glob przed pierwszym składnikiem ze znakami * ? [.
+    """
+    if os.path.isdir(source):
+        return source
+    components = source.split(os.sep)
+    for k, component in enumerate(components):
+        if any(char in component for char in "*?["):
+            return os.sep.join(components[:k]) or (os.sep if source.startswith(os.sep) else ".")
+    return os.path.dirname(source) or "."
+
+
+def is_up_to_date(geo_file, dxf_file, options=None, recorded_options=None):
+    """
+    Plik wynikowy uznajemy za aktualny, gdy istnieje, nie jest starszy od pliku GEO
+    i powstał z tymi samymi opcjami konwersji (recorded_options – zapisane w manifeście;
+    None, gdy nie wiadomo, z jakimi opcjami powstał plik).
+    """
+    if recorded_options is None or recorded_options != (options or {}):
+        return False
+    try:
+        return os.path.getmtime(dxf_file) >= os.path.getmtime(geo_file)
+    except OSError:
+        return False
+
+
+def _load_batch_manifest(out_dir):
+    import json
+    try:
+        with open(os.path.join(out_dir, BATCH_MANIFEST), encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _save_batch_manifest(out_dir, manifest):
+    import json
+
+    def write(tmp):
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+
+    replace_atomically(os.path.join(out_dir, BATCH_MANIFEST), write)
+
+
+def _convert_job(geo_file, dxf_file, cache=None, backend="stream", mode="entities", weld=None,
+                 simplify=None):
+    """
+    Zadanie wykonywane w procesie roboczym – zwraca metryki konwersji (słownik).
+    """
+    metrics = Metrics(input=geo_file, output=dxf_file, backend=backend)
+    geo_to_dxf(geo_file, dxf_file, verbose=False, cache=cache, backend=backend, metrics=metrics,
+               mode=mode, weld=weld, simplify=simplify)
+    return metrics.as_dict()
+
+
+def convert_batch(source, out_dir, jobs=None, force=False, cache=None, backend="stream",
+                  mode="entities", weld=None, simplify=None):
+    """
+    Konwertuje wiele plików GEO do katalogu out_dir, rozdzielając pracę
+    na jobs procesów (domyślnie liczba rdzeni). Pliki, dla których DXF jest
+    aktualny, są pomijane (chyba że force=True).
+
+    Podkatalogi źródła (np. dla wzorca "export/**/*.geo") odtwarzane są w out_dir,
+    więc detale o tej samej nazwie z różnych katalogów się nie nadpisują. Opcje, z jakimi
+    powstał każdy plik, zapisywane są w manifeście BATCH_MANIFEST w out_dir – zmiana
+    --dxf-mode, --weld lub --simplify powoduje ponowną konwersję.
+
+    Wyniki raportowane są na bieżąco, w kolejności zakończenia konwersji.
+    Zwraca słownik z liczbą plików skonwertowanych, pominiętych i błędnych
+    oraz listą metryk poszczególnych konwersji ("metrics").
+    """
+    if jobs is not None and jobs < 1:
+        raise ValueError("jobs musi być liczbą dodatnią")
+    os.makedirs(out_dir, exist_ok=True)
+    options = conversion_options(mode, weld, simplify)
+    manifest = _load_batch_manifest(out_dir)
+    root = _source_root(source)
+    tasks = []
+    skipped = 0
+    converted = 0
+    failed = 0
+    records = []
+    outputs = {}
+    start = time.perf_counter()
+
+    def report(geo_file, dxf_file, record=None, error=None):
+        nonlocal converted, failed
+        name = os.path.relpath(dxf_file, out_dir)
+        if error is None:
+            converted += 1
+            records.append(record)
+            manifest[name] = options
+            print(f"OK    {record['total']:7.3f} s  {geo_file} -> {dxf_file}")
+        else:
+            failed += 1
+            manifest.pop(name, None)
+            print(f"BŁĄD             {geo_file}: {error}", file=sys.stderr)
+
+    for geo_file in find_geo_files(source):
+        name = os.path.splitext(os.path.relpath(geo_file, root))[0] + ".dxf"
+        dxf_file = os.path.join(out_dir, name)
+        previous = outputs.setdefault(os.path.normcase(dxf_file), geo_file)
+        if previous != geo_file:
+            # Np. "detal.geo" i "detal.GEO" w jednym katalogu – drugi plik nadpisałby pierwszy
+            failed += 1
+            print(f"BŁĄD             {geo_file}: ten sam plik wynikowy co {previous}", file=sys.stderr)
+            continue
+        if not force and is_up_to_date(geo_file, dxf_file, options, manifest.get(name)):
+            skipped += 1
+            continue
+        os.makedirs(os.path.dirname(dxf_file), exist_ok=True)
+        tasks.append((geo_file, dxf_file))
+
+    if jobs == 1 or len(tasks) <= 1:
+        for geo_file, dxf_file in tasks:
+            try:
+                record = _convert_job(geo_file, dxf_file, cache, backend, mode, weld, simplify)
+                report(geo_file, dxf_file, record=record)
+            except Exception as e:
+                report(geo_file, dxf_file, error=e)
+    else:
+        # Pula procesów (multiprocessing) importowana tylko wtedy, gdy jest potrzebna
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = {pool.submit(_convert_job, geo_file, dxf_file, cache, backend, mode, weld, simplify):
+                       (geo_file, dxf_file) for geo_file, dxf_file in tasks}
+            for future in as_completed(futures):
+                geo_file, dxf_file = futures[future]
+                try:
+                    report(geo_file, dxf_file, record=future.result())
+                except Exception as e:
+                    report(geo_file, dxf_file, error=e)
+
+    if tasks:
+        _save_batch_manifest(out_dir, manifest)
+    total = time.perf_counter() - start
+    print(f"Skonwertowano: {converted}, pominięto (aktualne): {skipped}, błędy: {failed}, "
+          f"czas: {total:.2f} s")
+    return {"converted": converted, "skipped": skipped, "failed": failed, "metrics": records}
+
+
+def _positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"wymagana liczba dodatnia: {value}")
+    return number
+
 
 def main():
-    if len(sys.argv) < 3:
+    parser = argparse.ArgumentParser(
+        description="Konwersja plików GEO (Trumpf) do DXF (R12).",
+        usage="python main.py <plik.geo> <plik.dxf>\n"
+              "       python main.py --batch <katalog|wzorzec> --out <katalog> [--jobs N]\n"
+              "       python main.py --sheet <plik.lst> --parts <katalog> <plik.dxf>\n"
+              "       python main.py --watch <katalog> --out <katalog> [--settle S] [--poll]")
+    parser.add_argument("geo_file", nargs="?", help="plik wejściowy GEO")
+    parser.add_argument("dxf_file", nargs="?", help="plik wyjściowy DXF")
+    parser.add_argument("--batch", metavar="ŹRÓDŁO",
+                        help="katalog z plikami GEO lub wzorzec glob (tryb wsadowy)")
+    parser.add_argument("--out", metavar="KATALOG",
+                        help="katalog wyjściowy dla trybu wsadowego i --watch")
+    parser.add_argument("--watch", metavar="KATALOG",
+                        help="obserwuj katalog i konwertuj nowe lub zmienione pliki GEO/LST")
+    parser.add_argument("--settle", type=float, default=None, metavar="S",
+                        help="tryb --watch: ile sekund plik musi być niezmieniony przed konwersją "
+                             "(domyślnie 1)")
+    parser.add_argument("--poll", action="store_true",
+                        help="tryb --watch: skanuj katalog okresowo zamiast inotify (np. udziały sieciowe)")
+    parser.add_argument("--jobs", type=_positive_int, default=None,
+                        help="liczba procesów roboczych (domyślnie liczba rdzeni)")
+    parser.add_argument("--force", action="store_true",
+                        help="konwertuj również pliki, których DXF jest aktualny")
+    parser.add_argument("--sheet", metavar="PLIK_LST",
+                        help="eksport całego arkusza z pliku LST (detale jako bloki DXF)")
+    parser.add_argument("--parts", metavar="KATALOG",
+                        help="katalog z plikami GEO detali dla trybu --sheet")
+    parser.add_argument("--parser", choices=BACKENDS, default="stream",
+                        help="parser GEO: strumieniowy (domyślnie) lub bajtowy mmap")
+    parser.add_argument("--dxf-mode", choices=DXF_MODES, default="entities",
+                        help="zapis geometrii: osobne LINE/ARC (domyślnie), kontury jako POLYLINE (R12) "
+                             "lub LWPOLYLINE (R2000)")
+    parser.add_argument("--weld", type=float, metavar="TOL",
+                        help="scal punkty odległe o nie więcej niż TOL (spawanie przy parsowaniu)")
+    parser.add_argument("--simplify", type=float, metavar="TOL",
+                        help="scal współliniowe odcinki i zastąp ciągi odcinków łukami z tolerancją TOL")
+    parser.add_argument("--cache", metavar="KATALOG",
+                        help=f"katalog cache wyników (domyślnie ${ENV_CACHE_DIR}, jeśli ustawiona)")
+    parser.add_argument("--cache-size", type=float, metavar="MB",
+                        help="maksymalny rozmiar cache w MB")
+    parser.add_argument("--metrics", metavar="PLIK",
+                        help="zapisz czasy etapów i liczniki w formacie JSON (\"-\" = stderr)")
+    parser.add_argument("--profile", nargs="?", const="cprofile", choices=("cprofile", "pyinstrument"),
+                        help=f"profiluj konwersję (domyślnie cProfile; także ${ENV_PROFILE})")
+    parser.add_argument("--profile-out", metavar="PLIK",
+                        help="zapisz wynik profilowania do pliku (.prof lub .html dla pyinstrument)")
+    args = parser.parse_args()
+
+    cache = cache_from_env(args.cache)
+    if cache is not None and args.cache_size:
+        cache.max_bytes = int(args.cache_size * 1024 * 1024)
+
+    mode = profile_mode(args.profile)
+
+    if args.batch:
+        if not args.out:
+            parser.error("tryb --batch wymaga podania --out <katalog>")
+        # Profiler widzi tylko bieżący proces, więc przy profilowaniu konwertujemy bez puli
+        jobs = 1 if mode else args.jobs
+        with profiled(mode, args.profile_out):
+            result = convert_batch(args.batch, args.out, jobs=jobs, force=args.force, cache=cache,
+                                   backend=args.parser, mode=args.dxf_mode, weld=args.weld,
+                                   simplify=args.simplify)
+        if args.metrics:
+            write_metrics(result["metrics"], args.metrics)
+        sys.exit(1 if result["failed"] else 0)
+
+    if args.watch:
+        if not args.out:
+            parser.error("tryb --watch wymaga podania --out <katalog>")
+        # Import tutaj: watch korzysta z geo_to_dxf z tego modułu
+        from watch import DEFAULT_SETTLE, Watcher
+        settle = DEFAULT_SETTLE if args.settle is None else args.settle
+        watcher = Watcher(args.watch, args.out, settle=settle, polling=args.poll, jobs=args.jobs,
+                          force=args.force, cache=cache, backend=args.parser, mode=args.dxf_mode,
+                          weld=args.weld, simplify=args.simplify)
+        try:
+            watcher.run()
+        except KeyboardInterrupt:
+            pass
+        return
+
+    if args.sheet:
+        # W trybie arkusza jedynym argumentem pozycyjnym jest plik wyjściowy DXF
+        if not args.parts or not args.geo_file or args.dxf_file:
+            parser.error("tryb --sheet wymaga podania --parts <katalog> i jednego pliku DXF")
+        # Arkusz z blokami zapisywany jest jako R12 – bez LWPOLYLINE
+        if args.dxf_mode == "lwpolyline":
+            parser.error("tryb --sheet obsługuje tylko --dxf-mode entities lub polyline")
+        from parse_lst import export_sheet
+        with profiled(mode, args.profile_out):
+            export_sheet(args.sheet, args.geo_file, args.parts, backend=args.parser, weld=args.weld,
+                         simplify=args.simplify, mode=args.dxf_mode)
+        print(f"Arkusz '{args.sheet}' został zapisany do '{args.geo_file}'.")
+        return
+
+    if not args.geo_file or not args.dxf_file:
         print("Użycie: python main.py <plik.geo> <plik.dxf>")
         sys.exit(1)
 
-    geo_file = sys.argv[1]
-    dxf_file = sys.argv[2]
-    geo_to_dxf(geo_file, dxf_file)
+    if args.metrics:
+        metrics = Metrics(input=args.geo_file, output=args.dxf_file, backend=args.parser)
+    else:
+        metrics = NullMetrics()
+    with profiled(mode, args.profile_out):
+        geo_to_dxf(args.geo_file, args.dxf_file, cache=cache, backend=args.parser, metrics=metrics,
+                   mode=args.dxf_mode, weld=args.weld, simplify=args.simplify)
+    if args.metrics:
+        write_metrics([metrics.as_dict()], args.metrics)
+
 
 if __name__ == "__main__":
     main()
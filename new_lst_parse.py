@@ -1,6 +1,14 @@
-import re
 import math
-import xml.etree.ElementTree as ET
+from itertools import chain
+from arcs import arc_axis_points, bulge_arc
+from gcode import ARC_CW, LASER_OFF, LASER_ON, LINEAR, interpret, read_program
+from svg_writer import SVG_FOOTER, element_chunks, path_chunks, svg_header, write_svg
+
+# Styl ścieżek cięcia w podglądzie SVG
+CUT_STYLE = ' fill="none" stroke="black" style="stroke-width:1;"'
+
+# Odległość, poniżej której koniec łuku uznajemy za równy początkowi (pełny okrąg)
+FULL_CIRCLE_TOL = 1e-9
 
 
 def parse_gcode_block(lst_filename):
@@ -9,107 +17,193 @@ def parse_gcode_block(lst_filename):
     Wyodrębnia kontury cięcia – każdy blok między TC_LASER_ON a TC_LASER_OFF traktowany jest jako jeden kontur.
     Zwraca listę konturów – każdy kontur to lista punktów (x, y).
     """
-    with open(lst_filename, 'r', encoding='cp1250') as f:
-        lines = f.readlines()
+    program = read_program(lst_filename, first_block_only=True)
+    # Ten parser przyjmuje domyślnie tryb przyrostowy (G91) i pomija bloki bez kodu G
+    return _contours_from_records(interpret(program, incremental=True, modal=False))
+
+
+def parse_gcode_paths(lst_filename):
+    """
+    Jak parse_gcode_block, ale łuki pozostają łukami: każdy kontur to lista wierzchołków
+    [(x, y, bulge), ...], gdzie bulge = tan(kąt łuku / 4) opisuje odcinek od danego
+    wierzchołka do następnego (0 – odcinek prosty, dodatni – łuk CCW, ujemny – CW);
+    ostatni wierzchołek ma bulge 0.
+
+    Łuk, którego koniec pokrywa się z początkiem (lub podany bez X/Y, z samym I/J),
+    to pełny okrąg – zapisywany jako dwa półokręgi (bulge ±1).
+    Polilinię z dokładnością do zadanej cięciwy daje tessellate_path.
+    """
+    program = read_program(lst_filename, first_block_only=True)
+    return _paths_from_records(interpret(program, incremental=True, modal=False))
+
+
+def approximate_arc(start, end, i_offset, j_offset, is_clockwise, steps=10):
+    cx = start[0] + i_offset
+    cy = start[1] + j_offset
+    r = math.hypot(i_offset, j_offset)
+    start_ang = math.atan2(start[1] - cy, start[0] - cx)
+    end_ang = math.atan2(end[1] - cy, end[0] - cx)
+    if is_clockwise:
+        if end_ang > start_ang:
+            end_ang -= 2 * math.pi
+    else:
+        if end_ang < start_ang:
+            end_ang += 2 * math.pi
+    points = []
+    for step in range(steps):
+        t = step / (steps - 1)
+        ang = start_ang + t * (end_ang - start_ang)
+        x = cx + r * math.cos(ang)
+        y = cy + r * math.sin(ang)
+        points.append((x, y))
+    return points
 
-    in_text = False
-    gcode_lines = []
-    for line in lines:
-        line = line.strip()
-        if "START_TEXT" in line:
-            in_text = True
-            continue
-        if "STOP_TEXT" in line:
-            in_text = False
-            break
-        if in_text:
-            gcode_lines.append(line)
 
-    mode_incremental = True
+def _contours_from_records(records):
+    """
+    Składa kontury z rekordów interpretera gcode.interpret:
+    TC_LASER_ON / TC_LASER_OFF zamykają bieżący kontur.
+    """
     contours = []
     current_contour = []
-    current_pos = (0.0, 0.0)
+    for record in records:
+        code = record[0]
+        if code == LASER_ON or code == LASER_OFF:
+            if current_contour:
+                contours.append(current_contour)
+                current_contour = []
+            continue
+        _, x0, y0, x1, y1, i_offset, j_offset, explicit = record
+        if code == LINEAR:  # ruch liniowy
+            current_contour.append((x1, y1))
+        elif explicit:  # ruch łukowy – tylko z podanym punktem końcowym
+            arc_points = approximate_arc((x0, y0), (x1, y1), i_offset, j_offset,
+                                         is_clockwise=(code == ARC_CW), steps=10)
+            current_contour.extend(arc_points[1:])
+    if current_contour:
+        contours.append(current_contour)
+    return contours
 
-    regex_cmd = re.compile(r'G(\d+\.?\d*)')
-    regex_coord = re.compile(r'([XYIJ])([-+]?[0-9]*\.?[0-9]+)')
-    regex_laser_on = re.compile(r'TC_LASER_ON')
-    regex_laser_off = re.compile(r'TC_LASER_OFF')
-    regex_mode = re.compile(r'G(90|91)')
 
-    def approximate_arc(start, end, i_offset, j_offset, is_clockwise, steps=10):
-        cx = start[0] + i_offset
-        cy = start[1] + j_offset
+def _paths_from_records(records):
+    """
+    Jak _contours_from_records, ale z łukami zapisanymi jako bulge (patrz parse_gcode_paths).
+    Wierzchołki to końce ruchów; kontur zaczynający się łukiem zaczyna się od jego początku.
+    """
+    paths = []
+    current = []
+    for record in records:
+        code = record[0]
+        if code == LASER_ON or code == LASER_OFF:
+            if current:
+                paths.append(current)
+                current = []
+            continue
+        _, x0, y0, x1, y1, i_offset, j_offset, explicit = record
+        if code == LINEAR:
+            current.append((x1, y1, 0.0))
+            continue
         r = math.hypot(i_offset, j_offset)
-        start_ang = math.atan2(start[1] - cy, start[0] - cx)
-        end_ang = math.atan2(end[1] - cy, end[0] - cx)
-        if is_clockwise:
+        full_circle = r > 0 and (not explicit or math.hypot(x1 - x0, y1 - y0) <= FULL_CIRCLE_TOL)
+        if not explicit and not full_circle:
+            continue
+        clockwise = code == ARC_CW
+        if not current:
+            current.append((x0, y0, 0.0))
+        if full_circle:
+            # Dwa półokręgi przez punkt przeciwległy do początku
+            bulge = -1.0 if clockwise else 1.0
+            cx, cy = x0 + i_offset, y0 + j_offset
+            current[-1] = (x0, y0, bulge)
+            current.append((2 * cx - x0, 2 * cy - y0, bulge))
+            current.append((x0, y0, 0.0))
+            continue
+        cx, cy = x0 + i_offset, y0 + j_offset
+        start_ang = math.atan2(y0 - cy, x0 - cx)
+        end_ang = math.atan2(y1 - cy, x1 - cx)
+        # Ten sam wybór kierunku co w approximate_arc
+        if clockwise:
             if end_ang > start_ang:
                 end_ang -= 2 * math.pi
         else:
             if end_ang < start_ang:
                 end_ang += 2 * math.pi
-        points = []
-        for step in range(steps):
-            t = step / (steps - 1)
-            ang = start_ang + t * (end_ang - start_ang)
-            x = cx + r * math.cos(ang)
-            y = cy + r * math.sin(ang)
-            points.append((x, y))
-        return points
-
-    for line in gcode_lines:
-        m = regex_mode.search(line)
-        if m:
-            if m.group(1) == "90":
-                mode_incremental = False
-            elif m.group(1) == "91":
-                mode_incremental = True
-
-        if regex_laser_on.search(line):
-            if current_contour:
-                contours.append(current_contour)
-                current_contour = []
+        current[-1] = (x0, y0, math.tan((end_ang - start_ang) / 4))
+        current.append((x1, y1, 0.0))
+    if current:
+        paths.append(current)
+    return paths
+
+
+def tessellate_path(path, chord_tolerance=0.01):
+    """
+    Zamienia kontur z łukami (parse_gcode_paths) na listę punktów (x, y).
+    Liczba odcinków łuku dobierana jest tak, by strzałka (odległość cięciwy od łuku)
+    nie przekraczała chord_tolerance – małe otwory dostają mało punktów, duże łuki więcej.
+    """
+    points = []
+    n = len(path)
+    for k, (x0, y0, bulge) in enumerate(path):
+        points.append((x0, y0))
+        if not bulge or k + 1 >= n:
             continue
-        if regex_laser_off.search(line):
-            if current_contour:
-                contours.append(current_contour)
-                current_contour = []
+        x1, y1 = path[k + 1][:2]
+        arc = bulge_arc(x0, y0, x1, y1, bulge)
+        if arc is None:
             continue
+        cx, cy, r, start, theta = arc
+        if chord_tolerance >= r:
+            steps = 2
+        else:
+            steps = max(2, math.ceil(abs(theta) / (2 * math.acos(1 - chord_tolerance / r))))
+        for step in range(1, steps):
+            a = start + theta * step / steps
+            points.append((cx + r * math.cos(a), cy + r * math.sin(a)))
+    return points
+
 
-        cmd_match = regex_cmd.search(line)
-        if not cmd_match:
+def path_circle(path, tol=1e-6):
+    """
+    (cx, cy, r), jeśli kontur to dokładnie pełny okrąg – zamknięty i złożony wyłącznie
+    z łuków o wspólnym środku i promieniu, obiegających łącznie 360° (np. dwa półokręgi
+    z parse_gcode_paths) – w przeciwnym razie None. W odróżnieniu od detect_circle
+    nie zgaduje okręgu z próbek.
+    """
+    if len(path) < 2 or math.hypot(path[-1][0] - path[0][0], path[-1][1] - path[0][1]) > tol:
+        return None
+    circle = None
+    total = 0.0
+    for k in range(len(path) - 1):
+        x0, y0, bulge = path[k]
+        arc = bulge_arc(x0, y0, path[k + 1][0], path[k + 1][1], bulge)
+        if arc is None:
+            return None
+        cx, cy, r, _, theta = arc
+        if circle is None:
+            circle = (cx, cy, r)
+        elif max(abs(cx - circle[0]), abs(cy - circle[1]), abs(r - circle[2])) > tol:
+            return None
+        total += theta
+    if abs(abs(total) - 2 * math.pi) > 1e-6:
+        return None
+    return circle
+
+
+def path_bounds(path):
+    """
+    Prostokąt otaczający konturu z łukami (min_x, min_y, max_x, max_y) – z ekstremami łuków.
+    """
+    xs = [v[0] for v in path]
+    ys = [v[1] for v in path]
+    for k in range(len(path) - 1):
+        x0, y0, bulge = path[k]
+        arc = bulge_arc(x0, y0, path[k + 1][0], path[k + 1][1], bulge)
+        if arc is None:
             continue
-        cmd = float(cmd_match.group(1))
-        params = {match.group(1): float(match.group(2)) for match in regex_coord.finditer(line)}
-        if cmd in [0.0, 1.0]:  # ruch liniowy
-            new_x = current_pos[0]
-            new_y = current_pos[1]
-            if 'X' in params:
-                new_x = params['X'] + (current_pos[0] if mode_incremental else 0)
-            if 'Y' in params:
-                new_y = params['Y'] + (current_pos[1] if mode_incremental else 0)
-            current_pos = (new_x, new_y)
-            current_contour.append(current_pos)
-        elif cmd in [2.0, 3.0]:  # ruch łukowy
-            if 'X' in params or 'Y' in params:
-                new_x = current_pos[0]
-                new_y = current_pos[1]
-                if 'X' in params:
-                    new_x = params['X'] + (current_pos[0] if mode_incremental else 0)
-                if 'Y' in params:
-                    new_y = params['Y'] + (current_pos[1] if mode_incremental else 0)
-                end_point = (new_x, new_y)
-            else:
-                continue
-            i_offset = params.get('I', 0.0)
-            j_offset = params.get('J', 0.0)
-            arc_points = approximate_arc(current_pos, end_point, i_offset, j_offset, is_clockwise=(cmd == 2.0),
-                                         steps=10)
-            current_contour.extend(arc_points[1:])
-            current_pos = end_point
-    if current_contour:
-        contours.append(current_contour)
-    return contours
+        for px, py in arc_axis_points(*arc):
+            xs.append(px)
+            ys.append(py)
+    return min(xs), min(ys), max(xs), max(ys)
 
 
 def detect_circle(contour, tol=0.05):
@@ -147,72 +241,91 @@ def generate_svg_from_contours(contours, svg_filename):
         print("Brak ścieżek cięcia do generacji SVG!")
         return
 
-    # Ustal bounding box dla wszystkich punktów
-    all_x = []
-    all_y = []
-    for path in contours:
-        for (x, y) in path:
-            all_x.append(x)
-            all_y.append(y)
-    min_x, min_y = min(all_x), min(all_y)
-    max_x, max_y = max(all_x), max(all_y)
-    svg_width = max_x - min_x
-    svg_height = max_y - min_y
-
-    svg = ET.Element("svg", xmlns="http://www.w3.org/2000/svg",
-                     version="1.1", width=str(svg_width), height=str(svg_height))
-
-    # Lista elementów SVG, zaczynamy od obrysu zewnętrznego i potem dodajemy otwory
-    # Jeśli detalu mamy więcej niż jeden kontur, przyjmujemy, że pierwszy jest obrysem.
-    # Jeśli kontur da się aproksymować jako okrąg, tworzymy <circle>.
-    external = None
-    holes = []
-    if contours:
-        external = contours[0]
-        for inner in contours[1:]:
-            holes.append(inner)
-
-    # Funkcja do przesunięcia konturu
-    def shift_contour(contour):
-        return [(x - min_x, y - min_y) for (x, y) in contour]
-
-    d_total = ""
-    # Obrys zewnętrzny – generujemy ścieżkę
-    if external:
-        ext = shift_contour(external)
-        d_ext = "M " + " L ".join(f"{x:.3f} {y:.3f}" for (x, y) in ext) + " Z "
-        d_total += d_ext
-
-    # Dla każdego otworu – jeśli otwór to okrąg, dodajemy <circle>, inaczej do ścieżki
-    circle_elements = []
-    path_holes = ""
-    for hole in holes:
-        hole_shifted = shift_contour(hole)
-        circ = detect_circle(hole_shifted)
+    # Ustal bounding box dla wszystkich punktów (bez kopiowania współrzędnych do list)
+    min_x = min(x for path in contours for (x, _) in path)
+    min_y = min(y for path in contours for (_, y) in path)
+    max_x = max(x for path in contours for (x, _) in path)
+    max_y = max(y for path in contours for (_, y) in path)
+
+    # Pierwszy kontur to obrys zewnętrzny (zawsze w ścieżce), kolejne to otwory –
+    # otwór będący okręgiem zapisujemy jako <circle>, pozostałe dołączamy do ścieżki.
+    path_contours = [contours[0]]
+    circles = []
+    for hole in contours[1:]:
+        circ = detect_circle([(x - min_x, y - min_y) for (x, y) in hole])
         if circ:
-            cx, cy, r = circ
-            # Utwórz element <circle>
-            circle_el = ET.Element("circle", cx=f"{cx:.3f}", cy=f"{cy:.3f}", r=f"{r:.3f}",
-                                   fill="none", stroke="black", style="stroke-width:1;")
-            circle_elements.append(circle_el)
+            circles.append(circ)
         else:
-            d_hole = "M " + " L ".join(f"{x:.3f} {y:.3f}" for (x, y) in hole_shifted) + " Z "
-            path_holes += d_hole
-
-    # Jeśli mamy jakiekolwiek ścieżki (obrys i ewentualne nieokrągłe otwory)
-    if d_total or path_holes:
-        combined_d = d_total + path_holes
-        ET.SubElement(svg, "path", d=combined_d, fill="none", stroke="black",
-                      style="stroke-width:1;", **{"fill-rule": "evenodd"})
-    # Dodajemy okrągłe otwory jako oddzielne elementy
-    for ce in circle_elements:
-        svg.append(ce)
-
-    tree = ET.ElementTree(svg)
-    tree.write(svg_filename, encoding="utf-8", xml_declaration=True)
+            path_contours.append(hole)
+
+    def commands():
+        for contour in path_contours:
+            yield "M " + " L ".join(f"{x - min_x:.3f} {y - min_y:.3f}" for (x, y) in contour) + " Z"
+
+    _write_cut_svg(svg_filename, max_x - min_x, max_y - min_y, commands(), circles)
+
+
+def _write_cut_svg(svg_filename, width, height, commands, circles):
+    """
+    Zapisuje strumieniowo (svg_writer) jedną ścieżkę z fill-rule="evenodd" oraz okręgi (cx, cy, r).
+    """
+    circle_elements = (f'<circle cx="{cx:.3f}" cy="{cy:.3f}" r="{r:.3f}"{CUT_STYLE}/>\n'
+                       for cx, cy, r in circles)
+    write_svg(svg_filename, chain([svg_header(width, height)],
+                                  path_chunks(commands, CUT_STYLE + ' fill-rule="evenodd"'),
+                                  element_chunks(circle_elements), [SVG_FOOTER]))
     print("SVG zapisane jako:", svg_filename)
 
 
+def _path_data(path, dx, dy):
+    """
+    Dane ścieżki SVG dla konturu z łukami: M, a dalej L lub A (łuk natywny), na końcu Z.
+    """
+    x0, y0 = path[0][0] - dx, path[0][1] - dy
+    parts = [f"M {x0:.3f} {y0:.3f}"]
+    for k in range(len(path) - 1):
+        xa, ya, bulge = path[k]
+        xb, yb = path[k + 1][0], path[k + 1][1]
+        arc = bulge_arc(xa, ya, xb, yb, bulge)
+        if arc is None:
+            parts.append(f"L {xb - dx:.3f} {yb - dy:.3f}")
+        else:
+            r, theta = arc[2], arc[4]
+            large_arc = 1 if abs(theta) > math.pi else 0
+            sweep = 1 if theta > 0 else 0
+            parts.append(f"A {r:.3f} {r:.3f} 0 {large_arc} {sweep} {xb - dx:.3f} {yb - dy:.3f}")
+    return " ".join(parts) + " Z"
+
+
+def generate_svg_from_paths(paths, svg_filename):
+    """
+    Jak generate_svg_from_contours, ale dla konturów z łukami (parse_gcode_paths):
+    łuki zapisywane są komendą SVG "A", a kontury będące pełnym okręgiem – jako <circle>
+    (rozpoznane dokładnie, bez zgadywania z punktów). Pierwszy kontur to obrys zewnętrzny,
+    pozostałe to otwory; wszystko poza okręgami trafia do jednej ścieżki z fill-rule="evenodd".
+    """
+    if not paths:
+        print("Brak ścieżek cięcia do generacji SVG!")
+        return
+
+    bounds = [path_bounds(path) for path in paths]
+    min_x, min_y = min(b[0] for b in bounds), min(b[1] for b in bounds)
+    max_x, max_y = max(b[2] for b in bounds), max(b[3] for b in bounds)
+
+    path_contours = [paths[0]]
+    circles = []
+    for hole in paths[1:]:
+        circ = path_circle(hole)
+        if circ:
+            cx, cy, r = circ
+            circles.append((cx - min_x, cy - min_y, r))
+        else:
+            path_contours.append(hole)
+
+    commands = (_path_data(path, min_x, min_y) for path in path_contours)
+    _write_cut_svg(svg_filename, max_x - min_x, max_y - min_y, commands, circles)
+
+
 if __name__ == "__main__":
     import sys
 
@@ -221,6 +334,6 @@ if __name__ == "__main__":
         sys.exit(1)
     lst_file = sys.argv[1]
     svg_file = sys.argv[2]
-    contours = parse_gcode_block(lst_file)
-    print(f"Znaleziono {len(contours)} konturów cięcia.")
-    generate_svg_from_contours(contours, svg_file)
+    paths = parse_gcode_paths(lst_file)
+    print(f"Znaleziono {len(paths)} konturów cięcia.")
+    generate_svg_from_paths(paths, svg_file)
@@ -1,126 +1,314 @@
-import math
+import mmap
+import re
+from array import array
+from operator import itemgetter
+from geobin import is_geobin, load_geometry
+from geometry import Geometry
+from weld import weld_points
 
-def parse_geo(geo_filename):
+# Dostępne implementacje parsera (parametr backend funkcji parse_geo)
+BACKENDS = ("stream", "mmap")
+
+# Wzorce dla parsera bajtowego. _WS to dowolny biały znak z wyjątkiem końca linii,
+# dzięki czemu wzorce odpowiadają strip()/split() z parsera strumieniowego (także dla CRLF).
+# Każdy wzorzec zaczyna się od słowa kluczowego (silnik re szybko wyszukuje stały prefiks),
+# a lookbehind sprawdza, że słowo stoi na początku linii.
+_WS = rb"[^\S\n]*"
+_SEP = rb"[^\S\n]+"
+_TOKEN = rb"(\S+)"
+
+
+def _keyword(word):
+    return word + rb"(?<![^\s]" + word + rb")" + _WS + rb"\n"
+
+
+def _line(*parts):
+    # Jedna linia rekordu: tokeny rozdzielone białymi znakami, otoczone opcjonalnymi spacjami
+    return _WS + _SEP.join(parts) + _WS + rb"\n"
+
+
+_PARAMS = _WS + rb"([^\n]*)\n"
+_P_RE = re.compile(_keyword(rb"P") + _line(_TOKEN) + _WS + _SEP.join([_TOKEN] * 3) + rb"[^\n]*\n")
+_LIN_RE = re.compile(_keyword(rb"LIN") + _PARAMS + _line(_TOKEN, _TOKEN))
+_ARC_RE = re.compile(_keyword(rb"ARC") + _PARAMS + _line(_TOKEN, _TOKEN, _TOKEN) + _line(_TOKEN))
+_CIR_RE = re.compile(_keyword(rb"CIR") + _PARAMS + _line(_TOKEN) + _line(_TOKEN))
+
+
+def _color_from_params(param_line):
+    """
+    Ustala kolor elementu na podstawie linii parametrów (np. "1 0", "3 0").
+    Jeśli w tokenach pojawi się '2' lub '3', uznajemy to za grawer (kolor żółty, 2),
+    w przeciwnym razie kolor domyślny wynosi 7 (cięcie).
     """
-    Odczytuje plik GEO Trumpfa (w uproszczeniu) i zwraca:
-      - points: słownik {nr_punktu: (x, y, z)}
-      - lines: lista [(start_p, end_p, color_idx), ...]
-      - arcs:  lista [(center_p, start_p, end_p, direction, color_idx), ...]
-      - circles: lista [(center_p, radius, color_idx), ...]  # nowa obsługa okręgów (CIR)
+    if any(token in {"2", "3"} for token in param_line.split()):
+        return 2
+    return 7
 
-    Logika:
-      - W sekcji "LIN" pobieramy linię parametrów (np. "1 0", "3 0" itd.).
-        Jeśli w tokenach pojawi się '2' lub '3', uznajemy, że to grawerka (kolor żółty, 2),
-        w przeciwnym razie domyślnie kolor wynosi 7.
-      - Analogicznie dla poleceń "ARC" oraz "CIR".
+
+def iter_geo_records(f):
     """
-    points = {}
-    lines_list = []
-    arcs = []
-    circles = []  # lista dla elementów CIR
+    Strumieniowo czyta otwarty plik GEO (linia po linii) i zwraca kolejne rekordy:
+      - ("P", point_id, x, y, z)
+      - ("LIN", start_p, end_p, color_idx)
+      - ("ARC", center_p, start_p, end_p, direction, color_idx)
+      - ("CIR", center_p, radius, color_idx)
 
-    with open(geo_filename, 'r', encoding='utf-8') as f:
-        file_lines = [line.strip() for line in f]
+    Plik nie jest wczytywany w całości – w pamięci trzymamy tylko bieżący rekord.
+    Rekordy mają stałą liczbę linii, więc po rozpoznaniu polecenia pobieramy
+    kolejne linie bezpośrednio z uchwytu pliku.
+    """
+    lines = (line.strip() for line in f)
+
+    def next_line():
+        # Niepełny rekord na końcu pliku – zwracamy pusty tekst,
+        # dzięki czemu int()/float() zgłoszą czytelny ValueError
+        return next(lines, "")
 
     in_points_section = False
     in_edges_section = False
-    i = 0
-    while i < len(file_lines):
-        line = file_lines[i]
-
+    for line in lines:
         # Wykrywanie sekcji
         if line.startswith("#~31"):
             in_points_section = True
             in_edges_section = False
-            i += 1
             continue
         elif line.startswith("#~331"):
             in_points_section = False
             in_edges_section = True
-            i += 1
             continue
         elif line.startswith("#~") and not line.startswith("#~3"):
             in_points_section = False
             in_edges_section = False
-            i += 1
             continue
 
         # Parsowanie sekcji punktów
         if in_points_section:
             if line == "P":
-                # Kolejne linie: "P", id, współrzędne, separator ("|~")
-                point_id = int(file_lines[i + 1])
-                coords = file_lines[i + 2].split()
-                x, y, z = float(coords[0]), float(coords[1]), float(coords[2])
-                points[point_id] = (x, y, z)
-                i += 4  # pomijamy "P", id, współrzędne, "|~"
-                continue
+                # Kolejne linie: id, współrzędne, separator ("|~")
+                point_id = int(next_line())
+                coords = next_line().split()
+                next_line()
+                yield ("P", point_id, float(coords[0]), float(coords[1]), float(coords[2]))
+            continue
 
         # Parsowanie sekcji krawędzi (LIN/ARC/CIR)
         if in_edges_section:
             if line == "LIN":
-                # Pobieramy linię parametrów (np. "1 0" lub "3 0")
-                param_line = file_lines[i + 1]
-                tokens = param_line.split()
-
-                # Domyślnie: kolor = 7 (np. cięcie)
-                # Jeśli w tokenach znajduje się '2' lub '3', uznajemy to za grawer (żółty)
-                if any(token in {"2", "3"} for token in tokens):
-                    color_index = 2
-                else:
-                    color_index = 7
-
-                # Pobieramy identyfikatory punktów
-                points_line = file_lines[i + 2]
-                start_p_str, end_p_str = points_line.split()
-                start_p = int(start_p_str)
-                end_p = int(end_p_str)
-
-                lines_list.append((start_p, end_p, color_index))
-                i += 4  # LIN, param_line, punkty, separator ("|~")
-                continue
+                # Linia parametrów, identyfikatory punktów, separator ("|~")
+                color_index = _color_from_params(next_line())
+                start_p_str, end_p_str = next_line().split()
+                next_line()
+                yield ("LIN", int(start_p_str), int(end_p_str), color_index)
 
             elif line == "ARC":
-                param_line = file_lines[i + 1]
-                tokens = param_line.split()
+                # Linia parametrów, punkty (środek, start, koniec), kierunek, separator
+                color_index = _color_from_params(next_line())
+                center_str, start_str, end_str = next_line().split()
+                direction = int(next_line())
+                next_line()
+                yield ("ARC", int(center_str), int(start_str), int(end_str), direction, color_index)
 
-                if any(token in {"2", "3"} for token in tokens):
-                    color_index = 2
-                else:
-                    color_index = 7
+            elif line == "CIR":
+                # Linia parametrów, punkt środkowy, promień, separator
+                color_index = _color_from_params(next_line())
+                center_id = int(next_line())
+                radius = float(next_line())
+                next_line()
+                yield ("CIR", center_id, radius, color_index)
 
-                arc_points_line = file_lines[i + 2]
-                center_str, start_str, end_str = arc_points_line.split()
-                center_id = int(center_str)
-                start_id = int(start_str)
-                end_id = int(end_str)
 
-                direction_line = file_lines[i + 3]
-                direction = int(direction_line)
+def _geo_sections(buf):
+    """
+    Dzieli zmapowany plik na fragmenty (stan, początek, koniec) między znacznikami "#~".
+    Stan to "points" (#~31), "edges" (#~331) lub None; znaczniki "#~3..." o innym
+    numerze nie zmieniają stanu – tak samo jak w iter_geo_records.
+    """
+    state = None
+    pos = 0
+    found = buf.find(b"#~")
+    while found != -1:
+        line_start = buf.rfind(b"\n", 0, found) + 1
+        line_end = buf.find(b"\n", found)
+        if line_end == -1:
+            line_end = len(buf)
+        # Znacznik liczy się tylko na początku linii (np. "##~~" nie jest znacznikiem)
+        if not buf[line_start:found].strip():
+            if state is not None:
+                yield state, pos, line_start
+            marker = buf[found:line_end].strip()
+            if marker.startswith(b"#~31"):
+                state = "points"
+            elif marker.startswith(b"#~331"):
+                state = "edges"
+            elif not marker.startswith(b"#~3"):
+                state = None
+            pos = line_end
+        found = buf.find(b"#~", line_end)
+    if state is not None:
+        yield state, pos, len(buf)
 
-                arcs.append((center_id, start_id, end_id, direction, color_index))
-                i += 5  # ARC, param_line, punkty, kierunek, separator ("|~")
-                continue
 
-            elif line == "CIR":
-                param_line = file_lines[i + 1]
-                tokens = param_line.split()
+def _point_columns(buf, start, end):
+    """
+    Zwraca kolumny (ids, xs, ys, zs) jako listy bajtów dla sekcji punktów.
+    Typowa sekcja to powtarzające się rekordy "P / id / x y z / |~" – wtedy dzielimy
+    fragment na tokeny i wybieramy kolumny krokiem 6 (bez analizy linii).
+    W pozostałych przypadkach używamy wyrażenia regularnego.
+    """
+    tokens = buf[start:end].split()
+    n = len(tokens) // 6
+    records = tokens[:6 * n]
+    if (records[0::6].count(b"P") == n and records[5::6].count(b"|~") == n
+            and b"P" not in tokens[6 * n:]):
+        return records[1::6], records[2::6], records[3::6], records[4::6]
+    records = _P_RE.findall(buf, start, end)
+    return [list(map(itemgetter(i), records)) for i in range(4)]
+
+
+def _colors(param_lines):
+    # Linie parametrów powtarzają się, więc kolor liczymy raz dla każdej unikalnej linii
+    memo = {p: _color_from_params(p.decode('utf-8', 'replace')) for p in set(param_lines)}
+    return array('h', map(memo.__getitem__, param_lines))
+
+
+def _columns(pattern, buf, start, end):
+    records = pattern.findall(buf, start, end)
+    if not records:
+        return None
+    return [list(map(itemgetter(i), records)) for i in range(pattern.groups)]
 
-                if any(token in {"2", "3"} for token in tokens):
-                    color_index = 2
-                else:
-                    color_index = 7
 
-                # Pobieramy identyfikator punktu środkowego okręgu oraz promień
-                center_line = file_lines[i + 2]
-                center_id = int(center_line)
-                radius_line = file_lines[i + 3]
-                radius = float(radius_line)
+def _parse_geo_mmap(geo_filename):
+    """
+    Parser bajtowy: mapuje plik przez mmap i wyszukuje rekordy P/LIN/ARC/CIR
+    skompilowanymi wyrażeniami regularnymi bezpośrednio w buforze, bez dekodowania
+    i dzielenia na linie. Wartości liczbowe konwertowane są hurtowo do kolumn modelu.
+    """
+    geometry = Geometry()
+    with open(geo_filename, 'rb') as f:
+        try:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Pusty plik – mmap nie obsługuje długości 0
+            return geometry
+    with buf:
+        _scan_geo_buffer(buf, geometry)
+    return geometry
+
+
+def _scan_geo_buffer(buf, geometry):
+    """
+    Dopisuje do geometry wszystkie rekordy znalezione w buforze.
+    """
+    for state, start, end in _geo_sections(buf):
+        if state == "points":
+            ids, xs, ys, zs = _point_columns(buf, start, end)
+            geometry.extend_points(map(int, ids), array('d', map(float, xs)),
+                                   array('d', map(float, ys)), array('d', map(float, zs)))
+            continue
+
+        columns = _columns(_LIN_RE, buf, start, end)
+        if columns:
+            params, starts, ends = columns
+            _extend_entities(geometry.extend_lines, geometry.add_line, array('q', map(int, starts)),
+                             array('q', map(int, ends)), _colors(params))
 
-                circles.append((center_id, radius, color_index))
-                i += 5  # CIR, param_line, center, radius, separator ("|~")
-                continue
+        columns = _columns(_ARC_RE, buf, start, end)
+        if columns:
+            params, centers, starts, ends, directions = columns
+            _extend_entities(geometry.extend_arcs, geometry.add_arc, array('q', map(int, centers)),
+                             array('q', map(int, starts)), array('q', map(int, ends)),
+                             array('b', map(int, directions)), _colors(params))
+
+        columns = _columns(_CIR_RE, buf, start, end)
+        if columns:
+            params, centers, radii = columns
+            _extend_entities(geometry.extend_circles, geometry.add_circle,
+                             array('q', map(int, centers)), array('d', map(float, radii)),
+                             _colors(params))
+
+
+def _extend_entities(extend, add, *columns):
+    """
+    Dopisuje encje hurtowo; gdy któraś odwołuje się do nieistniejącego punktu (KeyError),
+    dopisuje je pojedynczo i pomija encje z brakującymi punktami – jak parser strumieniowy.
+    """
+    try:
+        extend(*columns)
+    except KeyError:
+        for record in zip(*columns):
+            try:
+                add(*record)
+            except KeyError:
+                pass
+
+
+def parse_geo(geo_filename, backend="stream", weld=None):
+    """
+    Odczytuje plik GEO Trumpfa (w uproszczeniu) i zwraca model Geometry
+    (kolumny array.array, patrz geometry.py). Dla zgodności wynik można rozpakować:
+      points, lines, arcs, circles = parse_geo(geo_filename)
+    gdzie:
+      - points: widok słownika {nr_punktu: (x, y, z)}
+      - lines: widok listy [(start_p, end_p, color_idx), ...]
+      - arcs:  widok listy [(center_p, start_p, end_p, direction, color_idx), ...]
+      - circles: widok listy [(center_p, radius, color_idx), ...]
 
-        i += 1
+    Logika:
+      - W sekcji "LIN" pobieramy linię parametrów (np. "1 0", "3 0" itd.).
+        Jeśli w tokenach pojawi się '2' lub '3', uznajemy, że to grawerka (kolor żółty, 2),
+        w przeciwnym razie domyślnie kolor wynosi 7.
+      - Analogicznie dla poleceń "ARC" oraz "CIR".
+
+    backend:
+      - "stream" (domyślnie): plik czytany jest strumieniowo (patrz iter_geo_records),
+        więc zużycie pamięci zależy od liczby elementów geometrii, a nie od rozmiaru pliku.
+      - "mmap": parser bajtowy na zmapowanym pliku (_parse_geo_mmap), ok. dwukrotnie szybszy
+        dla dużych plików; dla poprawnych plików GEO daje identyczny wynik.
+    Plik w binarnym formacie pośrednim (geobin.py) jest mapowany bez parsowania.
+
+    weld: tolerancja spawania punktów (weld.weld_points) – punkty odległe o nie więcej
+    niż weld są scalane, a odwołania encji przepisywane; None (domyślnie) wyłącza spawanie.
+    """
+    if weld is not None:
+        # Model po spawaniu ma własne kolumny – źródło (np. zmapowany geobin) można zamknąć
+        with parse_geo(geo_filename, backend) as geometry:
+            return weld_points(geometry, weld)
+    if backend not in BACKENDS:
+        raise ValueError(f"Nieznany parser GEO: {backend!r} (dostępne: {', '.join(BACKENDS)})")
+    if is_geobin(geo_filename):
+        return load_geometry(geo_filename)
+    if backend == "mmap":
+        return _parse_geo_mmap(geo_filename)
+    with open(geo_filename, 'r', encoding='utf-8') as f:
+        return _parse_geo_lines(f)
+
+
+def _parse_geo_lines(f):
+    """
+    Parser strumieniowy: buduje model z rekordów iter_geo_records.
+    """
+    geometry = Geometry()
+    add_point = geometry.add_point
+    add_line = geometry.add_line
+    add_arc = geometry.add_arc
+    add_circle = geometry.add_circle
+
+    for record in iter_geo_records(f):
+        kind = record[0]
+        if kind == "P":
+            add_point(*record[1:])
+            continue
+        # Encje odwołujące się do nieistniejących punktów są pomijane (jak w dawnym
+        # generatorze SVG i Geometry.from_tuples)
+        try:
+            if kind == "LIN":
+                add_line(*record[1:])
+            elif kind == "ARC":
+                add_arc(*record[1:])
+            else:
+                add_circle(*record[1:])
+        except KeyError:
+            pass
 
-    return points, lines_list, arcs, circles
+    return geometry
@@ -1,178 +1,258 @@
+import os
 import re
-import math
+from array import array
+from arcs import compute_arc_params  # noqa: F401 – zgodność wsteczna (dawna funkcja tego modułu)
+from gcode import ARC_CCW, ARC_CW, ENCODING, LASER_ON, LINEAR, interpret, program_lines
+from geobin import is_geobin, load_geometry
+from geometry import Geometry, as_geometry
+from parse_geo import parse_geo
+from transform import Affine
+from weld import weld_points
+from write_dxf import (DXF_FOOTER, DXF_HEADER, DXF_HEADER_R12_TABLES, WRITE_BUFFER_SIZE, block_name, iter_block_chunks,
+                       iter_entity_chunks, write_chunks)
+
+# Sufiks numeru egzemplarza w nazwie detalu, np. "_1" w "test_pr100x80_1"
+INSTANCE_SUFFIX_RE = re.compile(r'_\d+$')
+
+
+class LstDocument:
+    """
+    Plik LST wczytany jednym odczytem.
+
+    Przy tworzeniu budowany jest indeks sekcji: przesunięcia linii z DA,'SHT-1'
+    i bloku BEGIN_PARTS_IN_PROGRAM_POS ... ENDE_PARTS_IN_PROGRAM_POS, wymiary arkusza
+    oraz słownik nazwa detalu -> pozycja (part_positions; part_placements to wszystkie
+    rozmieszczenia jako (nazwa, x, y) w kolejności z pliku). Zapytania (sheet_contour, part_position)
+    odpowiadają z pamięci, bez ponownego otwierania pliku; program G-code
+    (START_TEXT ... STOP_TEXT) wybierany jest z tego samego bufora.
+
+    Funkcje parse_lst, parse_sheet_contour i parse_part_position przyjmują
+    LstDocument zamiast nazwy pliku – przy wielu zapytaniach o ten sam plik
+    wystarczy go otworzyć raz:
+        doc = LstDocument.open('example.LST')
+        offsets = [parse_part_position(doc, name) for name in names]
+    """
+
+    def __init__(self, data):
+        # Końce linii jak przy odczycie tekstowym (\r\n, \r i \n)
+        if b"\r" in data:
+            data = data.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+        self.data = data
+        self.sheet_offsets = self._line_offsets(b"DA,'SHT-1'")
+        self.parts_section = self._parts_section()
+        self.sheet_size = self._sheet_size()
+        self.part_lines = self._part_lines()
+        self.part_positions = {}
+        self.part_placements = []
+        for line in self.part_lines:
+            parts = line.strip().split(',')
+            if len(parts) > 2 and parts[2].strip().startswith("'"):
+                name = parts[2].strip().strip("'")
+                position = self._position(parts)
+                self.part_positions.setdefault(name, position)
+                self.part_placements.append((name,) + position)
+
+    @classmethod
+    def open(cls, lst_filename):
+        with open(lst_filename, 'rb') as f:
+            return cls(f.read())
+
+    def _line_bounds(self, pos):
+        """
+        Zwraca (początek, koniec) linii zawierającej bajt pos (koniec bez znaku nowej linii).
+        """
+        data = self.data
+        end = data.find(b"\n", pos)
+        return data.rfind(b"\n", 0, pos) + 1, end if end >= 0 else len(data)
+
+    def _line_offsets(self, marker):
+        """
+        Przesunięcia początków kolejnych linii zawierających marker.
+        """
+        data = self.data
+        offsets = []
+        pos = data.find(marker)
+        while pos >= 0:
+            start, end = self._line_bounds(pos)
+            offsets.append(start)
+            pos = data.find(marker, end)
+        return offsets
+
+    def _line(self, start):
+        return self.data[start:self._line_bounds(start)[1]].decode(ENCODING)
+
+    def _parts_section(self):
+        """
+        (początek, koniec) treści pierwszego bloku BEGIN_PARTS_IN_PROGRAM_POS –
+        od linii po znaczniku do linii z ENDE_PARTS_IN_PROGRAM_POS – albo None.
+        """
+        data = self.data
+        begin = data.find(b"BEGIN_PARTS_IN_PROGRAM_POS")
+        if begin < 0:
+            return None
+        start = self._line_bounds(begin)[1] + 1
+        end = data.find(b"ENDE_PARTS_IN_PROGRAM_POS", start)
+        return start, self._line_bounds(end)[0] if end >= 0 else len(data)
+
+    def _sheet_size(self):
+        # Pierwsza linia DA,'SHT-1' z poprawną szerokością i wysokością
+        for start in self.sheet_offsets:
+            parts = self._line(start).strip().split(',')
+            try:
+                return float(parts[2]), float(parts[3])
+            except Exception:
+                pass
+        return None
+
+    def _part_lines(self):
+        if self.parts_section is None:
+            return []
+        start, end = self.parts_section
+        lines = self.data[start:end].decode(ENCODING).split("\n")
+        # Kolejne znaczniki BEGIN_PARTS_IN_PROGRAM_POS wewnątrz bloku są pomijane
+        return [line for line in lines if "BEGIN_PARTS_IN_PROGRAM_POS" not in line]
+
+    @staticmethod
+    def _position(parts):
+        # Przykładowa linia: DA,1,'test_pr100x80_1','NOID_1',10.00,10.00,...
+        try:
+            return float(parts[4]), float(parts[5])
+        except Exception:
+            return 0.0, 0.0
+
+    def program_lines(self, first_block_only=False):
+        """
+        Linie programu G-code (bajty) – patrz gcode.program_lines.
+        """
+        return program_lines(self.data, first_block_only)
+
+    def geometry(self):
+        """
+        Geometria wszystkich ruchów programu (jak parse_lst).
+        """
+        return _geometry_from_program(self.program_lines())
+
+    def sheet_contour(self):
+        """
+        Kontur arkusza (jak parse_sheet_contour) albo None.
+        """
+        if self.sheet_size is None:
+            return None
+        sheet_width, sheet_height = self.sheet_size
+        return [(0, 0), (sheet_width, 0), (sheet_width, sheet_height), (0, sheet_height), (0, 0)]
+
+    def part_position(self, detail_name):
+        """
+        Offset (x, y) detalu o nazwie detail_name albo (0, 0), jeśli nie znaleziono.
+        Nazwa szukana jest w słowniku; w przeciwnym razie – jak dotąd – pierwsza
+        linia bloku zawierająca detail_name.
+        """
+        position = self.part_positions.get(detail_name)
+        if position is not None:
+            return position
+        for line in self.part_lines:
+            if detail_name in line:
+                return self._position(line.strip().split(','))
+        return (0.0, 0.0)
+
+
+def _document(lst):
+    """
+    LstDocument dla nazwy pliku albo gotowego dokumentu.
+    """
+    if isinstance(lst, LstDocument):
+        return lst
+    return LstDocument.open(lst)
 
 
-def parse_lst(lst_filename):
+def parse_lst(lst_filename, weld=None):
     """
     Parsuje sekcję START_TEXT ... STOP_TEXT z pliku LST (cp1250)
     i rejestruje wszystkie ruchy – zarówno gdy laser jest włączony (cięcie/grawerka)
     jak i gdy jest wyłączony (przejazdy). Dla ruchów z laserem wyłączonym przypisujemy kolor zielony (3).
 
-    Zwraca: points, lines, arcs, circles
+    Zwraca model Geometry, który można rozpakować jako: points, lines, arcs, circles
+    Plik w binarnym formacie pośrednim (geobin.py) jest mapowany bez parsowania.
+    Zamiast nazwy pliku można podać LstDocument.
+
+    weld: tolerancja spawania punktów (weld.weld_points) – powtarzające się pozycje
+    (np. punkty przebicia i powrotu) stają się jednym punktem; None wyłącza spawanie.
     """
-    with open(lst_filename, 'r', encoding='cp1250') as f:
-        all_lines = f.readlines()
-
-    in_text = False
-    gcode_lines = []
-    for line in all_lines:
-        line = line.strip()
-        if "START_TEXT" in line:
-            in_text = True
-            continue
-        if "STOP_TEXT" in line:
-            in_text = False
-            continue
-        if in_text:
-            gcode_lines.append(line)
-
-    # Inicjalizacja stanu
-    current_mode = 'absolute'  # domyślnie G90
-    current_pos = [0.0, 0.0]  # układ arkusza – współrzędne globalne
-    points = {}
-    lines_geom = []
-    arcs_geom = []
-    circles_geom = []
-    point_id_counter = 1
-
-    # Dodajemy punkt startowy (przyjmujemy, że początek układu)
-    points[point_id_counter] = (current_pos[0], current_pos[1], 0.0)
-    last_point_id = point_id_counter
-    point_id_counter += 1
+    if weld is not None:
+        # Model po spawaniu ma własne kolumny – źródło (np. zmapowany geobin) można zamknąć
+        with parse_lst(lst_filename) as geometry:
+            return weld_points(geometry, weld)
+    if isinstance(lst_filename, LstDocument):
+        return lst_filename.geometry()
+    if is_geobin(lst_filename):
+        return load_geometry(lst_filename)
 
-    # Kolory – current_color dla ruchów z laserem włączonym; travel_color = 3 dla przejazdów (laser off)
-    current_color = 7  # domyślnie (cięcie) lub 2 (grawerka)
-    travel_color = 3
-    last_command = None
-    laser_on = False  # domyślnie laser wyłączony
+    return LstDocument.open(lst_filename).geometry()
 
-    token_pattern = re.compile(r'([A-Z])([-+]?[0-9]*\.?[0-9]+)')
-
-    for line in gcode_lines:
-        # Obsługa komend lasera – zmiana stanu
-        if "TC_LASER_ON" in line:
-            m = re.search(r'TC_LASER_ON\((.*?)\)', line)
-            if m:
-                params_str = m.group(1)
-                tokens_param = re.split(r'[,\s]+', params_str)
-                # Jeśli wśród parametrów występuje '2' lub '3', ustaw kolor na 2 (grawerka),
-                # w przeciwnym razie 7 (cięcie)
-                if '2' in tokens_param or '3' in tokens_param:
-                    current_color = 2
-                else:
-                    current_color = 7
-            laser_on = True
-            continue  # nie przetwarzamy tej linii jako ruchu
 
-        if "TC_LASER_OFF" in line:
-            laser_on = False
-            continue
+def _geometry_from_program(program_lines):
+    """
+    Buduje model Geometry z linii programu (interpreter gcode.interpret).
+    Punkty numerowane są kolejno od 1 (punkt 1 to początek układu), więc kolumny
+    zbieramy bezpośrednio w tablicach i dodajemy hurtowo na końcu.
+    """
+    # Układ arkusza – współrzędne globalne; punkt startowy w początku układu
+    xs = array('d', [0.0])
+    ys = array('d', [0.0])
+    last_point_id = 1
 
-        # Pobieramy tokeny – ignorujemy numery linii (N...)
-        tokens = token_pattern.findall(line)
-        tokens = [(letter.upper(), num) for letter, num in tokens if letter.upper() != 'N']
-
-        # Ustal komendę G
-        g_cmd = None
-        for letter, number in tokens:
-            if letter == 'G':
-                if number in ['90']:
-                    current_mode = 'absolute'
-                    g_cmd = 'G90'
-                elif number in ['91']:
-                    current_mode = 'incremental'
-                    g_cmd = 'G91'
-                elif number in ['0', '00']:
-                    g_cmd = 'G01'  # traktujemy szybki ruch jako liniowy
-                elif number in ['1', '01']:
-                    g_cmd = 'G01'
-                elif number in ['2', '02']:
-                    g_cmd = 'G02'  # łuk
-                elif number in ['3', '03']:
-                    g_cmd = 'G03'
-        if g_cmd:
-            last_command = g_cmd
-        else:
-            g_cmd = last_command
-        if not g_cmd:
-            continue
+    line_start, line_end, line_color = array('q'), array('q'), array('h')
+    arc_center, arc_start, arc_end = array('q'), array('q'), array('q')
+    arc_direction, arc_color = array('b'), array('h')
 
-        # Pobieramy parametry: X, Y, I, J
-        x_val = None
-        y_val = None
-        i_val = 0.0
-        j_val = 0.0
-        for letter, number in tokens:
-            if letter == 'X':
-                x_val = float(number)
-            elif letter == 'Y':
-                y_val = float(number)
-            elif letter == 'I':
-                i_val = float(number)
-            elif letter == 'J':
-                j_val = float(number)
-
-        # Obliczamy nowe współrzędne
-        if current_mode == 'absolute':
-            new_x = x_val if x_val is not None else current_pos[0]
-            new_y = y_val if y_val is not None else current_pos[1]
-        else:
-            new_x = current_pos[0] + (x_val if x_val is not None else 0.0)
-            new_y = current_pos[1] + (y_val if y_val is not None else 0.0)
+    # Kolory – current_color dla ruchów z laserem włączonym; travel_color = 3 dla przejazdów (laser off)
+    current_color = 7  # domyślnie (cięcie) lub 2 (grawerka)
+    travel_color = 3
+    laser_on = False  # domyślnie laser wyłączony
 
-        # Wybieramy kolor użyty dla tego ruchu
-        used_color = current_color if laser_on else travel_color
+    # Metody dołączania pobrane raz – pętla wykonuje się dla każdego ruchu programu
+    add_x, add_y = xs.append, ys.append
+    add_line_start, add_line_end, add_line_color = line_start.append, line_end.append, line_color.append
+    add_arc_center, add_arc_start, add_arc_end = arc_center.append, arc_start.append, arc_end.append
+    add_arc_direction, add_arc_color = arc_direction.append, arc_color.append
 
-        if g_cmd in ['G01', 'G00']:
+    for record in interpret(program_lines):
+        code = record[0]
+        if code == LINEAR:
             # Ruch liniowy
-            points[point_id_counter] = (new_x, new_y, 0.0)
-            new_point_id = point_id_counter
-            point_id_counter += 1
-            lines_geom.append((last_point_id, new_point_id, used_color))
-            current_pos = [new_x, new_y]
+            add_x(record[3])
+            add_y(record[4])
+            new_point_id = len(xs)
+            add_line_start(last_point_id)
+            add_line_end(new_point_id)
+            # Kolor: current_color przy włączonym laserze, travel_color dla przejazdu
+            add_line_color(current_color if laser_on else travel_color)
             last_point_id = new_point_id
-
-        elif g_cmd in ['G02', 'G03']:
-            # Ruch łukowy – wyznaczamy punkt końcowy i środek łuku
-            new_x_calc = new_x
-            new_y_calc = new_y
-            center_x = current_pos[0] + i_val
-            center_y = current_pos[1] + j_val
-            # Dodaj punkt środka
-            points[point_id_counter] = (center_x, center_y, 0.0)
-            center_point_id = point_id_counter
-            point_id_counter += 1
-            # Dodaj punkt końcowy
-            points[point_id_counter] = (new_x_calc, new_y_calc, 0.0)
-            new_point_id = point_id_counter
-            point_id_counter += 1
-            direction = 1 if g_cmd == 'G03' else 0
-            arcs_geom.append((center_point_id, last_point_id, new_point_id, direction, used_color))
-            current_pos = [new_x_calc, new_y_calc]
+        elif code == ARC_CW or code == ARC_CCW:
+            # Ruch łukowy – punkt środka, a potem punkt końcowy
+            _, x0, y0, new_x, new_y, i_val, j_val, _ = record
+            add_x(x0 + i_val)
+            add_y(y0 + j_val)
+            add_x(new_x)
+            add_y(new_y)
+            new_point_id = len(xs)
+            add_arc_center(new_point_id - 1)
+            add_arc_start(last_point_id)
+            add_arc_end(new_point_id)
+            add_arc_direction(1 if code == ARC_CCW else 0)
+            add_arc_color(current_color if laser_on else travel_color)
             last_point_id = new_point_id
+        elif code == LASER_ON:
+            current_color = record[1]
+            laser_on = True
+        else:
+            laser_on = False
 
-    return points, lines_geom, arcs_geom, circles_geom
-
-
-def compute_arc_params(cx, cy, sx, sy, ex, ey, direction):
-    """
-    Oblicza parametry łuku do DXF: (xc, yc, r, angle_start, angle_end) w stopniach.
-    """
-    vx_s = sx - cx
-    vy_s = sy - cy
-    vx_e = ex - cx
-    vy_e = ey - cy
-    r = math.hypot(vx_s, vy_s)
-    a_s = math.degrees(math.atan2(vy_s, vx_s)) % 360
-    a_e = math.degrees(math.atan2(vy_e, vx_e)) % 360
-    if direction == 1:
-        if a_e < a_s:
-            a_e += 360
-    else:
-        a_s, a_e = a_e, a_s
-        if a_e < a_s:
-            a_e += 360
-    return (cx, cy, r, a_s, a_e)
+    geometry = Geometry()
+    geometry.extend_points(range(1, len(xs) + 1), xs, ys, array('d', bytes(8 * len(xs))))
+    geometry.extend_lines(line_start, line_end, line_color)
+    geometry.extend_arcs(arc_center, arc_start, arc_end, arc_direction, arc_color)
+    return geometry
 
 
 def parse_sheet_contour(lst_filename):
@@ -182,23 +262,9 @@ def parse_sheet_contour(lst_filename):
     Zwraca kontur arkusza jako listę punktów:
        [(0,0), (width,0), (width,height), (0,height), (0,0)]
     lub None, jeśli nie znaleziono.
+    Zamiast nazwy pliku można podać LstDocument.
     """
-    with open(lst_filename, 'r', encoding='cp1250') as f:
-        lines = f.readlines()
-    sheet_width = None
-    sheet_height = None
-    for line in lines:
-        if "DA,'SHT-1'" in line:
-            parts = line.strip().split(',')
-            try:
-                sheet_width = float(parts[2])
-                sheet_height = float(parts[3])
-                break
-            except Exception as e:
-                pass
-    if sheet_width is None or sheet_height is None:
-        return None
-    return [(0, 0), (sheet_width, 0), (sheet_width, sheet_height), (0, sheet_height), (0, 0)]
+    return _document(lst_filename).sheet_contour()
 
 
 def parse_part_position(lst_filename, detail_name):
@@ -208,30 +274,13 @@ def parse_part_position(lst_filename, detail_name):
     Zakładamy, że linia z danymi ma postać:
       DA,1,'detail_name','NOID_1',offsetX,offsetY, ...
     Zwraca offset (x, y) lub (0,0) jeśli nie znaleziono.
+    Przy wielu detalach z jednego pliku należy podać LstDocument – plik czytany jest wtedy raz.
     """
-    with open(lst_filename, 'r', encoding='cp1250') as f:
-        lines = f.readlines()
-    in_block = False
-    for line in lines:
-        if "BEGIN_PARTS_IN_PROGRAM_POS" in line:
-            in_block = True
-            continue
-        if "ENDE_PARTS_IN_PROGRAM_POS" in line and in_block:
-            in_block = False
-            break
-        if in_block and detail_name in line:
-            # Przykładowa linia: DA,1,'test_pr100x80_1','NOID_1',10.00,10.00,...
-            parts = line.strip().split(',')
-            try:
-                offset_x = float(parts[4])
-                offset_y = float(parts[5])
-                return (offset_x, offset_y)
-            except Exception as e:
-                return (0.0, 0.0)
-    return (0.0, 0.0)
+    return _document(lst_filename).part_position(detail_name)
 
 
-def write_dxf_with_sheet(dxf_filename, points, lines, arcs, circles, sheet_contour, part_offset):
+def write_dxf_with_sheet(dxf_filename, points, lines, arcs, circles, sheet_contour, part_offset,
+                         float_format=None, transform=None):
     """
     Zapisuje plik DXF (R12) zawierający:
       - Geometrię detalu (wszystkie ruchy – zarówno cięcia, jak i przejazdy),
@@ -242,71 +291,147 @@ def write_dxf_with_sheet(dxf_filename, points, lines, arcs, circles, sheet_conto
       - Ruchy z laserem włączonym: kolor zgodny z rejestrowanym (7 lub 2)
       - Ruchy z laserem wyłączonym: zielony (3)
       - Kontur arkusza: niebieski (5)
+
+    float_format: format liczb dla encji detalu (jak w write_dxf.write_dxf)
+    transform: opcjonalne przekształcenie detalu (transform.Affine, np. obrót),
+               stosowane przed przesunięciem o part_offset
+
+    Zwraca liczbę zapisanych bajtów.
     """
 
-    # Funkcja pomocnicza: przesunięcie punktu
-    def shift_point(pt, offset):
-        return (pt[0] + offset[0], pt[1] + offset[1], pt[2])
-
-    # Przesuwamy wszystkie punkty geometrii detalu
-    shifted_points = {}
-    for pid, pt in points.items():
-        shifted_points[pid] = shift_point(pt, part_offset)
-
-    with open(dxf_filename, 'w', encoding='cp1250') as f:
-        f.write("0\nSECTION\n  2\nENTITIES\n")
-        # Zapisujemy linie i łuki
-        for (p1, p2, color_idx) in lines:
-            x1, y1, _ = shifted_points[p1]
-            x2, y2, _ = shifted_points[p2]
-            f.write("  0\nLINE\n")
-            f.write("  8\n0\n")
-            f.write(f" 62\n{color_idx}\n")
-            f.write(f" 10\n{x1}\n 20\n{y1}\n")
-            f.write(f" 11\n{x2}\n 21\n{y2}\n")
-        for (center_id, start_id, end_id, direction, color_idx) in arcs:
-            cx, cy, _ = shifted_points[center_id]
-            sx, sy, _ = shifted_points[start_id]
-            ex, ey, _ = shifted_points[end_id]
-            (xc, yc, r, ang_s, ang_e) = compute_arc_params(cx, cy, sx, sy, ex, ey, direction)
-            f.write("  0\nARC\n")
-            f.write("  8\n0\n")
-            f.write(f" 62\n{color_idx}\n")
-            f.write(f" 10\n{xc}\n 20\n{cy}\n")
-            f.write(f" 40\n{r}\n")
-            f.write(f" 50\n{ang_s}\n")
-            f.write(f" 51\n{ang_e}\n")
-        for (center_id, radius, color_idx) in circles:
-            cx, cy, _ = shifted_points[center_id]
-            f.write("  0\nCIRCLE\n")
-            f.write("  8\n0\n")
-            f.write(f" 62\n{color_idx}\n")
-            f.write(f" 10\n{cx}\n 20\n{cy}\n")
-            f.write(f" 40\n{radius}\n")
-        # Zapis konturu arkusza – rysujemy POLYLINE, kolor niebieski (5)
-        if sheet_contour:
-            f.write("  0\nPOLYLINE\n")
-            f.write("  8\n0\n")
-            f.write(" 62\n5\n")
-            f.write(" 66\n1\n")
-            for (x, y) in sheet_contour:
-                f.write("  0\nVERTEX\n")
-                f.write("  8\n0\n")
-                f.write(f" 10\n{x}\n 20\n{y}\n 30\n0.0\n")
-            f.write("  0\nSEQEND\n")
-        f.write("  0\nENDSEC\n  0\nEOF\n")
+    geometry = as_geometry(points, lines, arcs, circles)
+
+    # Przesunięcie (i ewentualny obrót) stosowane hurtowo do kolumn podczas zapisu
+    placement = Affine.translate(part_offset[0], part_offset[1])
+    if transform is not None:
+        placement = placement @ transform
+
+    with open(dxf_filename, 'wb', buffering=WRITE_BUFFER_SIZE) as f:
+        written = write_chunks(f, [DXF_HEADER], encoding='cp1250')
+        # Zapisujemy linie, łuki i okręgi
+        written += write_chunks(f, iter_entity_chunks(geometry, float_format=float_format,
+                                                      transform=placement),
+                                encoding='cp1250')
+        written += write_chunks(f, _sheet_contour_chunks(sheet_contour), encoding='cp1250')
+        written += write_chunks(f, [DXF_FOOTER], encoding='cp1250')
+    return written
+
+
+def _sheet_contour_chunks(sheet_contour):
+    """
+    Kontur arkusza jako POLYLINE w kolorze niebieskim (5); brak konturu – brak encji.
+    """
+    if not sheet_contour:
+        return []
+    contour = ["  0\nPOLYLINE\n  8\n0\n 62\n5\n 66\n1\n"]
+    for (x, y) in sheet_contour:
+        contour.append(f"  0\nVERTEX\n  8\n0\n 10\n{x}\n 20\n{y}\n 30\n0.0\n")
+    contour.append("  0\nSEQEND\n")
+    return contour
+
+
+def write_dxf_sheet(dxf_filename, parts, placements, sheet_contour, float_format=None,
+                    mode="entities"):
+    """
+    Zapisuje cały arkusz do jednego pliku DXF (R12, z nagłówkiem i tabelami –
+    DXF_HEADER_R12_TABLES):
+      - geometria każdego detalu zapisywana jest raz, jako definicja bloku (BLOCK),
+      - każde rozmieszczenie detalu to encja INSERT z offsetem na arkuszu,
+      - kontur arkusza jak w write_dxf_with_sheet (POLYLINE, kolor 5).
+
+    parts: {nazwa_detalu: Geometry (lub points, lines, arcs, circles)}
+    placements: [(nazwa_detalu, offset_x, offset_y), ...] – np. LstDocument.part_placements
+    (wszystkie nazwy muszą występować w parts); opcjonalny czwarty element to kąt obrotu
+    detalu w stopniach (CCW) – blok wstawiany jest wtedy z obrotem
+    mode: zapis geometrii bloków – "entities" albo "polyline" (patrz write_dxf.iter_block_chunks)
+
+    Zwraca liczbę zapisanych bajtów.
+    """
+    blocks = {}
+    names = {}
+    for name, geometry in parts.items():
+        names[name] = block_name(name, blocks)
+        blocks[names[name]] = as_geometry(*geometry)
+    inserts = [(names[placement[0]],) + tuple(placement[1:]) for placement in placements]
+
+    with open(dxf_filename, 'wb', buffering=WRITE_BUFFER_SIZE) as f:
+        written = write_chunks(f, [DXF_HEADER_R12_TABLES], encoding='cp1250')
+        written += write_chunks(f, iter_block_chunks(blocks, inserts, float_format=float_format,
+                                                     mode=mode),
+                                encoding='cp1250')
+        written += write_chunks(f, _sheet_contour_chunks(sheet_contour), encoding='cp1250')
+        written += write_chunks(f, [DXF_FOOTER], encoding='cp1250')
+    return written
+
+
+def find_part_geo(geo_dir, detail_name):
+    """
+    Szuka pliku GEO detalu w katalogu geo_dir: <nazwa>.geo, a następnie nazwa bez
+    sufiksu egzemplarza (np. "test_pr100x80_1" -> "test_pr100x80.geo").
+    Wielkość liter rozszerzenia nie ma znaczenia. Zwraca ścieżkę lub None.
+    """
+    candidates = [detail_name]
+    base = INSTANCE_SUFFIX_RE.sub('', detail_name)
+    if base and base != detail_name:
+        candidates.append(base)
+    for candidate in candidates:
+        for ext in (".geo", ".GEO"):
+            path = os.path.join(geo_dir, candidate + ext)
+            if os.path.isfile(path):
+                return path
+    return None
+
+
+def export_sheet(lst_filename, dxf_filename, geo_dir, float_format=None, backend="stream", weld=None,
+                 simplify=None, mode="entities"):
+    """
+    Eksportuje cały arkusz z pliku LST: sekcja BEGIN_PARTS_IN_PROGRAM_POS czytana jest raz,
+    plik GEO każdego różnego detalu (find_part_geo) parsowany jest raz i staje się jednym
+    blokiem, a wszystkie rozmieszczenia zapisywane są do jednego DXF jako INSERT
+    (write_dxf_sheet).
+    Zamiast nazwy pliku LST można podać LstDocument.
+    weld – tolerancja spawania punktów detali (jak w parse_geo); None wyłącza.
+    simplify – tolerancja upraszczania geometrii detali (simplify.simplify_geometry); None wyłącza.
+    mode – zapis geometrii bloków ("entities" albo "polyline", jak w write_dxf_sheet).
+
+    Zwraca liczbę zapisanych bajtów; brak pliku GEO dla detalu to FileNotFoundError.
+    """
+    document = _document(lst_filename)
+    parts = {}
+    part_keys = {}
+    for name, _, _ in document.part_placements:
+        if name in part_keys:
+            continue
+        geo_file = find_part_geo(geo_dir, name)
+        if geo_file is None:
+            raise FileNotFoundError(f"Brak pliku GEO dla detalu '{name}' w katalogu '{geo_dir}'")
+        # Egzemplarze tego samego detalu (np. _1, _2) dzielą jeden plik GEO, a więc i jeden blok
+        key = os.path.splitext(os.path.basename(geo_file))[0]
+        if key not in parts:
+            geometry = parse_geo(geo_file, backend=backend, weld=weld)
+            if simplify is not None:
+                # Import tutaj: bez upraszczania moduł nie jest potrzebny
+                from simplify import simplify_geometry
+                geometry = simplify_geometry(geometry, simplify)
+            parts[key] = geometry
+        part_keys[name] = key
+    placements = [(part_keys[name], x, y) for name, x, y in document.part_placements]
+    return write_dxf_sheet(dxf_filename, parts, placements, document.sheet_contour(),
+                           float_format=float_format, mode=mode)
 
 
 # Przykładowe użycie:
 if __name__ == '__main__':
     lst_filename = 'example.LST'  # Ścieżka do pliku LST
     dxf_filename = 'output.dxf'
+    # Plik czytany jest raz; kolejne zapytania korzystają z indeksu
+    document = LstDocument.open(lst_filename)
     # Odczyt geometrii detalu (wszystkich ruchów)
-    pts, lines_geom, arcs_geom, circles_geom = parse_lst(lst_filename)
+    pts, lines_geom, arcs_geom, circles_geom = parse_lst(document)
     # Odczyt konturu arkusza (np. szerokość i wysokość)
-    sheet_contour = parse_sheet_contour(lst_filename)
+    sheet_contour = parse_sheet_contour(document)
     # Odczyt pozycji detalu – nazwa detalu wg części programu
-    part_offset = parse_part_position(lst_filename, 'test_pr100x80_1')
+    part_offset = parse_part_position(document, 'test_pr100x80_1')
     print("Part offset:", part_offset)
     # Zapis do DXF – geometrię detalu (przesuniętą) oraz kontur arkusza
     write_dxf_with_sheet(dxf_filename, pts, lines_geom, arcs_geom, circles_geom, sheet_contour, part_offset)
@@ -0,0 +1,117 @@
+import struct
+import zlib
+
+# Prosty rasteryzator podglądów (biblioteka standardowa, bez Pillow / NumPy).
+#
+# Odcinki podawane są już we współrzędnych pikselowych (liczby całkowite). Kolejne odcinki
+# jednego koloru, które przedłużają poprzedni w tym samym kierunku, są scalane, a powtórzenia
+# (np. wiele drobnych encji trafiających w te same piksele) pomijane – rysowanie zależy więc
+# od liczby różnych odcinków w rozdzielczości wyjściowej, a nie od liczby encji.
+# Obraz zapisywany jest jako PNG z paletą (jeden bajt na piksel).
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+class Canvas:
+    """
+    Obraz width x height z indeksami kolorów palety (0 – tło).
+
+      canvas = Canvas(256, 128)
+      canvas.segment(0, 0, 100, 50, 1)   # odcinek w kolorze 1 (z palety)
+      canvas.dot(10, 10, 2)
+      canvas.save_png("podglad.png", [(255, 255, 255), (0, 0, 0), (255, 255, 0)])
+
+    Odcinki rysowane są dopiero przy render()/save_png(), kolorami w rosnącej kolejności
+    indeksów (wyższy indeks na wierzchu).
+    """
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self._segments = {}
+        self._pending = {}
+
+    def segment(self, x0, y0, x1, y1, color):
+        pending = self._pending.get(color)
+        if pending is not None and pending[2] == x0 and pending[3] == y0:
+            dx0, dy0 = pending[2] - pending[0], pending[3] - pending[1]
+            dx1, dy1 = x1 - x0, y1 - y0
+            # Przedłużenie w tym samym kierunku (lub odcinek zerowy) – scalamy z poprzednim
+            if dx0 * dy1 == dy0 * dx1 and dx0 * dx1 + dy0 * dy1 >= 0:
+                pending[2], pending[3] = x1, y1
+                return
+        if pending is not None:
+            self._segments.setdefault(color, set()).add(_normalized(pending))
+        self._pending[color] = [x0, y0, x1, y1]
+
+    def dot(self, x, y, color):
+        self.segment(x, y, x, y, color)
+
+    def render(self):
+        """
+        Rysuje zebrane odcinki i zwraca piksele (bytearray, wiersz po wierszu).
+        """
+        for color, pending in self._pending.items():
+            self._segments.setdefault(color, set()).add(_normalized(pending))
+        self._pending = {}
+        pixels = bytearray(self.width * self.height)
+        for color in sorted(self._segments):
+            for x0, y0, x1, y1 in self._segments[color]:
+                _draw_line(pixels, self.width, x0, y0, x1, y1, color)
+        return pixels
+
+    def save_png(self, filename, palette):
+        write_png(filename, self.width, self.height, self.render(), palette)
+
+
+def _normalized(segment):
+    x0, y0, x1, y1 = segment
+    if (x1, y1) < (x0, y0):
+        return (x1, y1, x0, y0)
+    return (x0, y0, x1, y1)
+
+
+def _draw_line(pixels, width, x0, y0, x1, y1, color):
+    """
+    Odcinek algorytmem Bresenhama; poziome odcinki wypełniane jednym przypisaniem wycinka.
+    """
+    if y0 == y1:
+        row = y0 * width
+        if x1 < x0:
+            x0, x1 = x1, x0
+        pixels[row + x0:row + x1 + 1] = bytes((color,)) * (x1 - x0 + 1)
+        return
+    dx, dy = abs(x1 - x0), -abs(y1 - y0)
+    sx = 1 if x0 < x1 else -1
+    sy = 1 if y0 < y1 else -1
+    err = dx + dy
+    while True:
+        pixels[y0 * width + x0] = color
+        if x0 == x1 and y0 == y1:
+            return
+        e2 = 2 * err
+        if e2 >= dy:
+            err += dy
+            x0 += sx
+        if e2 <= dx:
+            err += dx
+            y0 += sy
+
+
+def _png_chunk(kind, data):
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xffffffff)
+
+
+def write_png(filename, width, height, pixels, palette):
+    """
+    Zapisuje piksele (indeksy palety, bajt na piksel) jako PNG z paletą, palette – lista (r, g, b).
+    """
+    raw = b"".join(b"\x00" + pixels[y * width:(y + 1) * width] for y in range(height))
+    header = struct.pack(">IIBBBBB", width, height, 8, 3, 0, 0, 0)
+    plte = b"".join(bytes(rgb) for rgb in palette)
+    with open(filename, "wb") as f:
+        f.write(PNG_SIGNATURE)
+        f.write(_png_chunk(b"IHDR", header))
+        f.write(_png_chunk(b"PLTE", plte))
+        f.write(_png_chunk(b"IDAT", zlib.compress(raw, 9)))
+        f.write(_png_chunk(b"IEND", b""))
@@ -0,0 +1,344 @@
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import signal
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+from cache import ENV_CACHE_DIR, cache_from_env
+from geo_to_svg import THUMBNAIL_SIZE, geo_to_thumbnail
+from main import geo_to_dxf
+from parse_lst import parse_lst
+from write_dxf import DXF_MODES, write_dxf
+
+# Długo działająca usługa konwersji (HTTP po TCP lub gnieździe Unix).
+#
+# Front asyncio przyjmuje pliki (treść żądania POST), a konwersje – zadania obciążające CPU –
+# wykonuje stała pula procesów, więc koszt startu interpretera i importów ponoszony jest raz.
+# Liczba zadań w toku (wykonywanych i oczekujących) jest ograniczona; przy pełnej kolejce
+# usługa od razu odpowiada 503 z nagłówkiem Retry-After, zamiast gromadzić żądania w pamięci.
+# Nagłe zakończenie procesu roboczego (np. brak pamięci) psuje całą pulę – jest ona wtedy
+# tworzona od nowa, a przerwane żądania dostają 503, więc klient może je ponowić.
+# Wynik odsyłany jest strumieniowo, blokami, z oczekiwaniem na odbiór danych przez klienta.
+#
+#   POST /dxf?mode=polyline       GEO -> DXF (main.geo_to_dxf)
+#   POST /svg?margin=10           GEO -> SVG (geo_to_svg.geo_to_thumbnail)
+#   POST /png?size=256&margin=2   GEO -> PNG (geo_to_svg.geo_to_thumbnail)
+#   POST /lst?mode=entities       LST -> DXF (parse_lst.parse_lst + write_dxf)
+#   GET  /health                  stan puli i kolejki (JSON)
+
+DEFAULT_PORT = 8765
+DEFAULT_QUEUE = 32
+MAX_UPLOAD_BYTES = 64 * 1024 * 1024
+MAX_HEADER_LINES = 100
+HEADER_TIMEOUT = 30.0
+STREAM_CHUNK = 256 * 1024
+
+# Rodzaj konwersji: (rozszerzenie wejścia, rozszerzenie wyniku, Content-Type wyniku)
+CONVERSIONS = {
+    "/dxf": (".geo", ".dxf", "application/dxf"),
+    "/svg": (".geo", ".svg", "image/svg+xml"),
+    "/png": (".geo", ".png", "image/png"),
+    "/lst": (".lst", ".dxf", "application/dxf"),
+}
+
+
+class QueueFull(Exception):
+    pass
+
+
+class WorkerCrashed(Exception):
+    pass
+
+
+class RequestError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def conversion_options(kind, query):
+    """
+    Sprawdza parametry zapytania dla danego rodzaju konwersji i zwraca słownik opcji.
+    Niepoprawne wartości zgłaszane są jako RequestError (400).
+    """
+    params = {name: values[-1] for name, values in parse_qs(query).items()}
+    options = {}
+    try:
+        if kind in ("/dxf", "/lst"):
+            mode = params.get("mode", "entities")
+            if mode not in DXF_MODES:
+                raise ValueError(f"nieznany tryb {mode!r} (dozwolone: {', '.join(DXF_MODES)})")
+            options["mode"] = mode
+        else:
+            options["margin"] = int(params.get("margin", 10 if kind == "/svg" else 2))
+            if kind == "/png":
+                options["size"] = int(params.get("size", THUMBNAIL_SIZE))
+                if not 16 <= options["size"] <= 4096:
+                    raise ValueError("size musi być z zakresu 16–4096")
+    except ValueError as e:
+        raise RequestError(HTTPStatus.BAD_REQUEST, str(e))
+    return options
+
+
+def _run_conversion(kind, data, options, cache=None):
+    """
+    Zadanie wykonywane w procesie roboczym: zapisuje przesłany plik w katalogu tymczasowym,
+    konwertuje go i zwraca ścieżkę wyniku. Katalog usuwa wywołujący (po wysłaniu wyniku).
+    """
+    input_suffix, output_suffix, _ = CONVERSIONS[kind]
+    directory = tempfile.mkdtemp(prefix="geo2dxf-")
+    try:
+        input_file = os.path.join(directory, "input" + input_suffix)
+        output_file = os.path.join(directory, "output" + output_suffix)
+        with open(input_file, "wb") as f:
+            f.write(data)
+        if kind == "/dxf":
+            geo_to_dxf(input_file, output_file, verbose=False, cache=cache, mode=options["mode"])
+        elif kind == "/lst":
+            with parse_lst(input_file) as geometry:
+                write_dxf(output_file, *geometry, mode=options["mode"])
+        else:
+            geo_to_thumbnail(input_file, output_file, margin=options["margin"], cache=cache,
+                             size=options.get("size", THUMBNAIL_SIZE), verbose=False)
+        return output_file
+    except BaseException:
+        shutil.rmtree(directory, ignore_errors=True)
+        raise
+
+
+def _warm_up():
+    return os.getpid()
+
+
+class ConversionService:
+    """
+    Pula procesów z ograniczoną kolejką oraz obsługa połączeń HTTP/1.1 (keep-alive).
+
+      service = ConversionService(jobs=4, max_queue=32)
+      server = await service.start(port=8765)      # albo start(unix_path="/run/geo2dxf.sock")
+
+    jobs – liczba procesów roboczych (domyślnie liczba rdzeni); max_queue – ile zadań może
+    czekać na wolny proces ponad te wykonywane; cache – opcjonalny cache.ConversionCache
+    współdzielony przez wszystkie procesy.
+    """
+
+    def __init__(self, jobs=None, max_queue=DEFAULT_QUEUE, cache=None, max_upload=MAX_UPLOAD_BYTES,
+                 verbose=True):
+        self.jobs = jobs or os.cpu_count() or 1
+        self.max_pending = self.jobs + max_queue
+        self.cache = cache
+        self.max_upload = max_upload
+        self.verbose = verbose
+        self.pending = 0
+        self.pool = ProcessPoolExecutor(max_workers=self.jobs)
+
+    async def start(self, host="127.0.0.1", port=DEFAULT_PORT, unix_path=None):
+        # Uruchamiamy wszystkie procesy od razu, żeby pierwsze żądania nie czekały na ich start
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.pool, _warm_up) for _ in range(self.jobs)))
+        if unix_path is not None:
+            return await asyncio.start_unix_server(self.handle, path=unix_path)
+        return await asyncio.start_server(self.handle, host, port)
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+
+    async def convert(self, kind, data, options):
+        """
+        Wykonuje konwersję w puli procesów i zwraca ścieżkę wyniku.
+        Przy pełnej kolejce zgłasza QueueFull, a gdy proces roboczy zakończył się nagle –
+        WorkerCrashed (pula jest wtedy tworzona od nowa).
+        """
+        if self.pending >= self.max_pending:
+            raise QueueFull()
+        self.pending += 1
+        pool = self.pool
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(pool, _run_conversion, kind, data, options, self.cache)
+        except BrokenProcessPool:
+            self._replace_pool(pool)
+            raise WorkerCrashed()
+        finally:
+            self.pending -= 1
+
+    def _replace_pool(self, broken):
+        # Wszystkie żądania z zepsutej puli trafiają tu – nową tworzy tylko pierwsze z nich
+        if self.pool is broken:
+            self.pool = ProcessPoolExecutor(max_workers=self.jobs)
+            broken.shutdown(wait=False)
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request = await asyncio.wait_for(_read_head(reader), HEADER_TIMEOUT)
+                if request is None:
+                    break
+                keep_alive = await self._respond(reader, writer, *request)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, reader, writer, method, target, version, headers):
+        """
+        Obsługuje jedno żądanie; zwraca True, jeśli połączenie może być użyte ponownie.
+        """
+        start = time.perf_counter()
+        url = urlsplit(target)
+        keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+        body_read = False
+        try:
+            if method == "GET" and url.path == "/health":
+                body = json.dumps({"workers": self.jobs, "pending": self.pending,
+                                   "max_pending": self.max_pending}).encode()
+                await _send(writer, HTTPStatus.OK, body, "application/json", keep_alive)
+                return keep_alive
+            if url.path not in CONVERSIONS:
+                raise RequestError(HTTPStatus.NOT_FOUND, f"nieznana ścieżka {url.path}")
+            if method != "POST":
+                raise RequestError(HTTPStatus.METHOD_NOT_ALLOWED, "dozwolona jest tylko metoda POST")
+            options = conversion_options(url.path, url.query)
+            length = headers.get("content-length")
+            if length is None or not length.isdigit():
+                raise RequestError(HTTPStatus.LENGTH_REQUIRED, "wymagany nagłówek Content-Length")
+            if int(length) > self.max_upload:
+                raise RequestError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                                   f"plik większy niż {self.max_upload} bajtów")
+            if self.pending >= self.max_pending:
+                raise QueueFull()
+            if headers.get("expect", "").lower() == "100-continue":
+                writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+            data = await reader.readexactly(int(length))
+            body_read = True
+            try:
+                output_file = await self.convert(url.path, data, options)
+            except (QueueFull, WorkerCrashed, RequestError):
+                raise
+            except Exception as e:
+                raise RequestError(HTTPStatus.UNPROCESSABLE_ENTITY, f"błąd konwersji: {e}")
+            try:
+                await _send_file(writer, output_file, CONVERSIONS[url.path][2], keep_alive)
+            finally:
+                shutil.rmtree(os.path.dirname(output_file), ignore_errors=True)
+            status = HTTPStatus.OK
+        except QueueFull:
+            # Treść żądania nie została odczytana, więc połączenia nie da się użyć ponownie
+            keep_alive = False
+            status = HTTPStatus.SERVICE_UNAVAILABLE
+            await _send(writer, status, b"kolejka konwersji jest pelna\n", "text/plain; charset=utf-8",
+                        keep_alive, extra_headers={"Retry-After": "1"})
+        except WorkerCrashed:
+            # Treść żądania została odczytana – połączenie pozostaje użyteczne
+            status = HTTPStatus.SERVICE_UNAVAILABLE
+            await _send(writer, status, b"proces roboczy zakonczyl sie nieoczekiwanie\n",
+                        "text/plain; charset=utf-8", keep_alive, extra_headers={"Retry-After": "1"})
+        except RequestError as e:
+            # Nieodczytana treść żądania uniemożliwia ponowne użycie połączenia
+            keep_alive = keep_alive and (body_read or "content-length" not in headers)
+            status = e.status
+            await _send(writer, status, (str(e) + "\n").encode(), "text/plain; charset=utf-8", keep_alive)
+        if self.verbose:
+            print(f"{int(status)} {(time.perf_counter() - start) * 1000:7.1f} ms  {method} {target}")
+        return keep_alive
+
+
+async def _read_head(reader):
+    """
+    Odczytuje linię żądania i nagłówki: (metoda, cel, wersja, nagłówki) albo None,
+    gdy klient zamknął połączenie.
+    """
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, target, version = line.decode("latin-1").split()
+    except ValueError:
+        raise ConnectionError("niepoprawna linia żądania")
+    headers = {}
+    for _ in range(MAX_HEADER_LINES):
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            return method, target, version, headers
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    raise ConnectionError("zbyt wiele nagłówków")
+
+
+def _head(status, content_type, length, keep_alive, extra_headers=None):
+    lines = [f"HTTP/1.1 {int(status)} {status.phrase}",
+             f"Content-Type: {content_type}",
+             f"Content-Length: {length}",
+             f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+    lines.extend(f"{name}: {value}" for name, value in (extra_headers or {}).items())
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+async def _send(writer, status, body, content_type, keep_alive, extra_headers=None):
+    writer.write(_head(status, content_type, len(body), keep_alive, extra_headers) + body)
+    await writer.drain()
+
+
+async def _send_file(writer, filename, content_type, keep_alive):
+    """
+    Wysyła plik blokami po STREAM_CHUNK; drain() wstrzymuje odczyt, gdy klient nie nadąża.
+    """
+    with open(filename, "rb") as f:
+        writer.write(_head(HTTPStatus.OK, content_type, os.fstat(f.fileno()).st_size, keep_alive))
+        for chunk in iter(lambda: f.read(STREAM_CHUNK), b""):
+            writer.write(chunk)
+            await writer.drain()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Usługa konwersji GEO/LST do DXF, SVG i PNG.")
+    parser.add_argument("--host", default="127.0.0.1", help="adres nasłuchiwania (domyślnie 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"port (domyślnie {DEFAULT_PORT})")
+    parser.add_argument("--unix", metavar="ŚCIEŻKA", help="nasłuchuj na gnieździe Unix zamiast TCP")
+    parser.add_argument("--jobs", type=int, default=None,
+                        help="liczba procesów roboczych (domyślnie liczba rdzeni)")
+    parser.add_argument("--queue", type=int, default=DEFAULT_QUEUE,
+                        help=f"ile zadań może czekać na wolny proces (domyślnie {DEFAULT_QUEUE})")
+    parser.add_argument("--max-upload", type=float, default=MAX_UPLOAD_BYTES / (1024 * 1024), metavar="MB",
+                        help="maksymalny rozmiar przesyłanego pliku w MB")
+    parser.add_argument("--cache", metavar="KATALOG",
+                        help=f"katalog cache wyników (domyślnie ${ENV_CACHE_DIR}, jeśli ustawiona)")
+    parser.add_argument("--quiet", action="store_true", help="nie wypisuj żądań")
+    args = parser.parse_args()
+
+    cache = cache_from_env(args.cache)
+    service = ConversionService(jobs=args.jobs, max_queue=args.queue, cache=cache,
+                                max_upload=int(args.max_upload * 1024 * 1024), verbose=not args.quiet)
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    server = loop.run_until_complete(service.start(args.host, args.port, args.unix))
+    where = args.unix or f"http://{args.host}:{args.port}"
+    print(f"Usługa konwersji nasłuchuje: {where} (procesy: {service.jobs}, "
+          f"kolejka: {service.max_pending - service.jobs})", file=sys.stderr)
+    try:
+        # Zatrzymanie przez SIGTERM (np. z menedżera usług) jak przez Ctrl+C
+        loop.add_signal_handler(signal.SIGTERM, loop.stop)
+    except (NotImplementedError, AttributeError):
+        pass
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        loop.run_until_complete(server.wait_closed())
+        service.close()
+        loop.close()
+
+
+if __name__ == "__main__":
+    main()
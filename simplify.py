@@ -0,0 +1,286 @@
+import math
+from array import array
+from geometry import Geometry
+
+# Upraszczanie geometrii: scalanie współliniowych odcinków i zastępowanie ciągów krótkich
+# odcinków (np. łuków przybliżonych łamaną przez eksport CAD albo programy LST z drobnymi
+# ruchami G01) łukami, z zachowaniem zadanej tolerancji.
+#
+# Ciągi budowane są z kolejnych linii modelu Geometry: następna linia musi mieć wspólny
+# punkt (ten sam wiersz) z końcem poprzedniej i ten sam kolor. Ciąg przerywa się w punktach,
+# w których spotyka się więcej niż dwie encje (rozgałęzienia zostają nietknięte). Punkty
+# o tych samych współrzędnych, ale różnych wierszach, warto najpierw scalić (weld.py).
+#
+# W każdym ciągu, od bieżącego punktu zaczepienia:
+#   - odcinek przedłużany jest metodą „klina”: kierunek od punktu zaczepienia do kandydata
+#     na koniec musi mieścić się w stożkach tolerancji wszystkich punktów pośrednich, więc
+#     każdy punkt sprawdzany jest raz (czas liniowy),
+#   - łuk dopasowywany jest do okręgu przez punkt zaczepienia, środkowy i końcowy; wierzchołki
+#     i środki cięciw muszą leżeć w tolerancji od okręgu, a cięciwy obiegać środek w jednym
+#     kierunku. Długość ciągu dobierana jest wykładniczo, a potem bisekcją,
+#   - wybierana jest encja obejmująca więcej odcinków (przy remisie – linia).
+# Ciąg zamknięty, który w całości leży na okręgu, zastępowany jest okręgiem.
+#
+# Wynikiem jest nowy model Geometry: punkty pozostają bez zmian (pominięte wierzchołki nie są
+# już używane przez encje), środki dopasowanych łuków i okręgów dopisywane są jako nowe punkty.
+# Łuki i okręgi z wejścia są kopiowane; nowe łuki i okręgi dopisywane są po nich.
+
+DEFAULT_SIMPLIFY_TOLERANCE = 0.01
+
+# Najmniejsza liczba odcinków zastępowanych łukiem i okręgiem
+MIN_ARC_SEGMENTS = 3
+MIN_CIRCLE_SEGMENTS = 8
+
+# Zakres rozpiętości dopasowanych łuków – prawie proste ciągi dałyby łuki o ogromnym promieniu
+MIN_ARC_SWEEP = math.radians(10)
+MAX_ARC_SWEEP = math.radians(350)
+
+
+def _runs(geometry):
+    """
+    Zwraca ciągi połączonych kolejnych linii jako (kolor, [wiersze wierzchołków]).
+    """
+    degree = [0] * len(geometry.xs)
+    for column in (geometry.line_start, geometry.line_end, geometry.arc_start, geometry.arc_end):
+        for row in column:
+            degree[row] += 1
+
+    run, color = None, None
+    for start, end, color_idx in zip(geometry.line_start, geometry.line_end, geometry.line_color):
+        if run is not None and color_idx == color:
+            if len(run) == 2 and start != run[-1] and end != run[-1] and run[0] in (start, end) \
+                    and degree[run[0]] == 2:
+                # Pierwsza linia ciągu zapisana w przeciwnym kierunku
+                run.reverse()
+            if degree[run[-1]] == 2:
+                if start == run[-1]:
+                    run.append(end)
+                    continue
+                if end == run[-1]:
+                    run.append(start)
+                    continue
+        if run is not None:
+            yield color, run
+        run, color = [start, end], color_idx
+    if run is not None:
+        yield color, run
+
+
+def _next_corners(X, Y, tolerance):
+    """
+    Dla każdego wierzchołka i – indeks najbliższego dalszego narożnika (albo ostatniego
+    wierzchołka). Narożnik to wierzchołek, w którym kierunek zmienia się bardziej, niż
+    pozwala tolerancja zarówno dla odcinka, jak i dla łuku (z dużym zapasem) – ani scalona
+    linia, ani dopasowany łuk nie mogą przez niego przechodzić, więc na nim się kończą.
+    """
+    n = len(X) - 1
+    hypot, atan2, asin = math.hypot, math.atan2, math.asin
+    limit = 8 * tolerance
+    # Dopuszczalna zmiana kierunku na końcu cięciwy długości L (dla łuku o strzałce do 2·tolerance)
+    bends = [asin(limit / length) if length > limit else math.pi / 2
+             for length in map(hypot, [X[k + 1] - X[k] for k in range(n)], [Y[k + 1] - Y[k] for k in range(n)])]
+    next_corner = [n] * (n + 1)
+    corner = n
+    for j in range(n - 1, -1, -1):
+        next_corner[j] = corner
+        if j:
+            ax, ay = X[j] - X[j - 1], Y[j] - Y[j - 1]
+            bx, by = X[j + 1] - X[j], Y[j + 1] - Y[j]
+            if abs(atan2(ax * by - ay * bx, ax * bx + ay * by)) > 2 * (bends[j - 1] + bends[j]):
+                corner = j
+    return next_corner
+
+
+def _line_end(X, Y, i, last, tolerance):
+    """
+    Najdalszy wierzchołek k (i < k <= last), dla którego odcinek i -> k przechodzi
+    w odległości nie większej niż tolerance od wszystkich wierzchołków pośrednich.
+    """
+    ax, ay = X[i], Y[i]
+    ux = uy = None
+    lo, hi = -math.pi, math.pi
+    reach = 0.0
+    end = i + 1
+    for k in range(i + 1, last + 1):
+        vx, vy = X[k] - ax, Y[k] - ay
+        d = math.hypot(vx, vy)
+        if d < reach - tolerance:
+            # Ciąg zawraca – wcześniejsze wierzchołki wychodziłyby poza koniec odcinka
+            break
+        if d <= tolerance:
+            end = k
+            continue
+        if ux is None:
+            ux, uy = vx / d, vy / d
+            theta = 0.0
+        else:
+            theta = math.atan2(ux * vy - uy * vx, ux * vx + uy * vy)
+        if not lo <= theta <= hi:
+            break
+        end = k
+        reach = max(reach, d)
+        half = math.asin(tolerance / d)
+        lo, hi = max(lo, theta - half), min(hi, theta + half)
+    return end
+
+
+def _circle_through(X, Y, i, m, k):
+    """
+    Okrąg przez wierzchołki i, m, k: (xc, yc, r, kierunek) – kierunek 1 dla obiegu CCW,
+    -1 dla CW; None dla punktów współliniowych.
+    """
+    ax, ay = X[i], Y[i]
+    bx, by = X[m] - ax, Y[m] - ay
+    cx, cy = X[k] - ax, Y[k] - ay
+    det = 2 * (bx * cy - by * cx)
+    if det == 0:
+        return None
+    b2, c2 = bx * bx + by * by, cx * cx + cy * cy
+    ox, oy = (cy * b2 - by * c2) / det, (bx * c2 - cx * b2) / det
+    return ax + ox, ay + oy, math.hypot(ox, oy), 1 if det > 0 else -1
+
+
+def _arc_sweep(X, Y, i, k, circle, tolerance):
+    """
+    Rozpiętość (ze znakiem, w radianach) łuku okręgu circle od wierzchołka i do k albo None,
+    gdy któryś wierzchołek lub środek cięciwy odbiega od okręgu o więcej niż tolerance
+    lub cięciwy nie obiegają środka w jednym kierunku.
+    """
+    xc, yc, r, sign = circle
+    hypot, atan2 = math.hypot, math.atan2
+    px, py = X[i] - xc, Y[i] - yc
+    sweep = 0.0
+    for t in range(i + 1, k + 1):
+        qx, qy = X[t] - xc, Y[t] - yc
+        if abs(hypot(qx, qy) - r) > tolerance or abs(hypot(px + qx, py + qy) / 2 - r) > tolerance:
+            return None
+        step = atan2(px * qy - py * qx, px * qx + py * qy)
+        if step * sign < 0:
+            return None
+        sweep += step
+        px, py = qx, qy
+    return sweep
+
+
+def _fit_arc(X, Y, i, k, tolerance):
+    circle = _circle_through(X, Y, i, (i + k) // 2, k)
+    if circle is None:
+        return None
+    sweep = _arc_sweep(X, Y, i, k, circle, tolerance)
+    if sweep is None or not MIN_ARC_SWEEP <= abs(sweep) <= MAX_ARC_SWEEP:
+        return None
+    return circle
+
+
+def _arc_end(X, Y, i, last, tolerance):
+    """
+    Najdalszy wierzchołek k (k <= last), do którego od i da się poprowadzić łuk:
+    (k, okrąg) albo (i, None).
+    """
+    n = last
+    k = i + MIN_ARC_SEGMENTS
+    if k > n:
+        return i, None
+    circle = _fit_arc(X, Y, i, k, tolerance)
+    if circle is None:
+        return i, None
+    # Podwajanie długości, dopóki łuk pasuje, potem bisekcja między ostatnim dobrym a złym końcem
+    good, bad = k, None
+    while good < n:
+        k = min(i + 2 * (good - i), n)
+        fitted = _fit_arc(X, Y, i, k, tolerance)
+        if fitted is None:
+            bad = k
+            break
+        good, circle = k, fitted
+    if bad is not None:
+        while bad - good > 1:
+            k = (good + bad) // 2
+            fitted = _fit_arc(X, Y, i, k, tolerance)
+            if fitted is None:
+                bad = k
+            else:
+                good, circle = k, fitted
+    return good, circle
+
+
+def _fit_circle(X, Y, tolerance):
+    """
+    Okrąg (xc, yc, r) dla ciągu zamkniętego leżącego w całości na okręgu albo None.
+    """
+    n = len(X) - 1
+    circle = _circle_through(X, Y, 0, n // 3, 2 * n // 3)
+    if circle is None:
+        return None
+    sweep = _arc_sweep(X, Y, 0, n, circle, tolerance)
+    if sweep is None or abs(abs(sweep) - 2 * math.pi) > 1e-6:
+        return None
+    return circle[:3]
+
+
+def simplify_geometry(geometry, tolerance=DEFAULT_SIMPLIFY_TOLERANCE, fit_arcs=True):
+    """
+    Zwraca nowy model Geometry z uproszczonymi liniami (patrz opis modułu).
+    Uproszczona geometria odbiega od wejściowej o nie więcej niż tolerance;
+    fit_arcs=False wyłącza dopasowanie łuków i okręgów (tylko scalanie współliniowych odcinków).
+    """
+    if tolerance <= 0:
+        raise ValueError("tolerance musi być dodatnia")
+    xs, ys, zs = geometry.xs, geometry.ys, geometry.zs
+    simplified = Geometry()
+    simplified.extend_points(geometry.point_ids, xs, ys, zs)
+    simplified.arc_center = array('q', geometry.arc_center)
+    simplified.arc_start = array('q', geometry.arc_start)
+    simplified.arc_end = array('q', geometry.arc_end)
+    simplified.arc_direction = array('b', geometry.arc_direction)
+    simplified.arc_color = array('h', geometry.arc_color)
+    simplified.circle_center = array('q', geometry.circle_center)
+    simplified.circle_radius = array('d', geometry.circle_radius)
+    simplified.circle_color = array('h', geometry.circle_color)
+
+    # Środki nowych łuków i okręgów – dopisywane jako punkty po istniejących wierszach
+    center_xs, center_ys, center_zs = array('d'), array('d'), array('d')
+
+    def add_center(xc, yc, z):
+        center_xs.append(xc)
+        center_ys.append(yc)
+        center_zs.append(z)
+        return len(xs) + len(center_xs) - 1
+
+    for color_idx, run in _runs(geometry):
+        X = [xs[row] for row in run]
+        Y = [ys[row] for row in run]
+        n = len(run) - 1
+        next_corner = _next_corners(X, Y, tolerance)
+        if fit_arcs and n >= MIN_CIRCLE_SEGMENTS and run[0] == run[-1] and next_corner[0] == n:
+            circle = _fit_circle(X, Y, tolerance)
+            if circle is not None:
+                xc, yc, r = circle
+                simplified.circle_center.append(add_center(xc, yc, zs[run[0]]))
+                simplified.circle_radius.append(r)
+                simplified.circle_color.append(color_idx)
+                continue
+        i = 0
+        while i < n:
+            last = next_corner[i]
+            end = _line_end(X, Y, i, last, tolerance) if last > i + 1 else last
+            if fit_arcs and end < last:
+                arc_end, circle = _arc_end(X, Y, i, last, tolerance)
+                if arc_end > end:
+                    xc, yc, _, sign = circle
+                    simplified.arc_center.append(add_center(xc, yc, zs[run[i]]))
+                    simplified.arc_start.append(run[i])
+                    simplified.arc_end.append(run[arc_end])
+                    simplified.arc_direction.append(1 if sign > 0 else 0)
+                    simplified.arc_color.append(color_idx)
+                    i = arc_end
+                    continue
+            simplified.line_start.append(run[i])
+            simplified.line_end.append(run[end])
+            simplified.line_color.append(color_idx)
+            i = end
+
+    if center_xs:
+        first_id = max(geometry.point_ids) + 1 if len(geometry.point_ids) else 1
+        simplified.extend_points(range(first_id, first_id + len(center_xs)), center_xs, center_ys, center_zs)
+    return simplified
@@ -0,0 +1,284 @@
+import math
+from array import array
+from arcs import arc_axis_points, geometry_arc_params
+from transform import transformed_columns
+
+# Indeks przestrzenny (siatka jednorodna) nad encjami modelu Geometry.
+#
+# Encje numerowane są globalnie: najpierw linie, potem łuki, potem okręgi;
+# zapytania zwracają pary (rodzaj, indeks w kolumnach danego rodzaju), np. (ARC, 12).
+# Prostokąty otaczające łuków uwzględniają ekstrema na osiach, przez które łuk przechodzi,
+# a nie tylko punkty końcowe.
+
+LINE = "line"
+ARC = "arc"
+CIRCLE = "circle"
+
+# Encje zajmujące więcej komórek trafiają na osobną listę sprawdzaną przy każdym zapytaniu
+MAX_CELLS_PER_ENTITY = 64
+
+# Docelowa średnia liczba encji na komórkę przy automatycznym doborze rozmiaru komórki
+TARGET_PER_CELL = 4
+
+
+def entity_bounds(geometry, transform=None):
+    """
+    Zwraca prostokąty otaczające wszystkich encji jako kolumny array('d'):
+    (min_x, min_y, max_x, max_y), w kolejności: linie, łuki, okręgi.
+    transform (transform.Affine) – prostokąty geometrii po przekształceniu.
+    """
+    xs, ys, directions, radii = transformed_columns(geometry, transform)
+    min_x, min_y, max_x, max_y = array('d'), array('d'), array('d'), array('d')
+
+    for p1, p2 in zip(geometry.line_start, geometry.line_end):
+        x1, y1, x2, y2 = xs[p1], ys[p1], xs[p2], ys[p2]
+        min_x.append(min(x1, x2))
+        min_y.append(min(y1, y2))
+        max_x.append(max(x1, x2))
+        max_y.append(max(y1, y2))
+
+    params = geometry_arc_params(geometry, xs, ys, directions)
+    for center_row, start_row, end_row, a_s, a_e, r in zip(
+            geometry.arc_center, geometry.arc_start, geometry.arc_end,
+            params.angle_start, params.angle_end, params.radius):
+        cx, cy = xs[center_row], ys[center_row]
+        bx = [xs[start_row], xs[end_row]]
+        by = [ys[start_row], ys[end_row]]
+        # Ekstrema osiowe leżące na łuku rysowanym CCW od a_s do a_e
+        for x, y in arc_axis_points(cx, cy, r, math.radians(a_s), math.radians(a_e - a_s)):
+            bx.append(x)
+            by.append(y)
+        min_x.append(min(bx))
+        min_y.append(min(by))
+        max_x.append(max(bx))
+        max_y.append(max(by))
+
+    for center_row, r in zip(geometry.circle_center, radii):
+        cx, cy = xs[center_row], ys[center_row]
+        min_x.append(cx - r)
+        min_y.append(cy - r)
+        max_x.append(cx + r)
+        max_y.append(cy + r)
+
+    return min_x, min_y, max_x, max_y
+
+
+class SpatialIndex:
+    """
+    Siatka jednorodna nad encjami modelu Geometry (wynik parse_geo / parse_lst).
+
+      index = SpatialIndex(geometry)
+      index.query(0, 0, 100, 50)   -> [(LINE, 3), (ARC, 0), ...]  encje, których
+                                       prostokąt otaczający przecina okno
+      index.nearest(12.5, 7.0)     -> (CIRCLE, 2, odległość)  najbliższa encja
+                                       (odległość do samej krzywej) albo None
+      index.bounds                 -> (min_x, min_y, max_x, max_y) całej geometrii
+
+    cell_size=None dobiera rozmiar komórki tak, by średnio przypadało
+    około TARGET_PER_CELL encji na komórkę. transform (transform.Affine) indeksuje
+    geometrię po przekształceniu (np. tak, jak zostanie zapisana do SVG).
+    """
+
+    def __init__(self, geometry, cell_size=None, transform=None):
+        self.geometry = geometry
+        self.n_lines = len(geometry.line_start)
+        self.n_arcs = len(geometry.arc_center)
+        self.count = self.n_lines + self.n_arcs + len(geometry.circle_center)
+        self.xs, self.ys, directions, self.radii = transformed_columns(geometry, transform)
+        self.min_x, self.min_y, self.max_x, self.max_y = entity_bounds(geometry, transform)
+        self._arc_params = geometry_arc_params(geometry, self.xs, self.ys, directions)
+
+        if self.count:
+            self.bounds = (min(self.min_x), min(self.min_y), max(self.max_x), max(self.max_y))
+        else:
+            self.bounds = None
+        if cell_size is None:
+            cell_size = self._default_cell_size()
+        self.cell_size = float(cell_size)
+        self._cells = {}
+        self._large = array('q')
+        self._build()
+
+    def _default_cell_size(self):
+        if not self.count:
+            return 1.0
+        x0, y0, x1, y1 = self.bounds
+        area = max(x1 - x0, 1e-9) * max(y1 - y0, 1e-9)
+        return max(math.sqrt(area * TARGET_PER_CELL / self.count), 1e-9)
+
+    def _cell(self, value):
+        return math.floor(value / self.cell_size)
+
+    def _build(self):
+        cells = self._cells
+        cell = self._cell
+        large = self._large
+        for entity, (x0, y0, x1, y1) in enumerate(zip(self.min_x, self.min_y, self.max_x, self.max_y)):
+            ix0, iy0, ix1, iy1 = cell(x0), cell(y0), cell(x1), cell(y1)
+            if (ix1 - ix0 + 1) * (iy1 - iy0 + 1) > MAX_CELLS_PER_ENTITY:
+                large.append(entity)
+                continue
+            for ix in range(ix0, ix1 + 1):
+                for iy in range(iy0, iy1 + 1):
+                    bucket = cells.get((ix, iy))
+                    if bucket is None:
+                        cells[(ix, iy)] = bucket = array('q')
+                    bucket.append(entity)
+        if cells:
+            ixs = [ix for ix, _ in cells]
+            iys = [iy for _, iy in cells]
+            self._extent = (min(ixs), min(iys), max(ixs), max(iys))
+        else:
+            self._extent = None
+
+    def entity(self, entity):
+        """
+        Zamienia globalny numer encji na parę (rodzaj, indeks).
+        """
+        if entity < self.n_lines:
+            return (LINE, entity)
+        if entity < self.n_lines + self.n_arcs:
+            return (ARC, entity - self.n_lines)
+        return (CIRCLE, entity - self.n_lines - self.n_arcs)
+
+    def bbox(self, kind, index):
+        """
+        Prostokąt otaczający encji (min_x, min_y, max_x, max_y).
+        """
+        entity = index + {LINE: 0, ARC: self.n_lines, CIRCLE: self.n_lines + self.n_arcs}[kind]
+        return (self.min_x[entity], self.min_y[entity], self.max_x[entity], self.max_y[entity])
+
+    def bounds_of(self, entities):
+        """
+        Wspólny prostokąt otaczający encji (rodzaj, indeks), np. jednego konturu,
+        albo None dla pustej listy.
+        """
+        boxes = [self.bbox(kind, index) for kind, index in entities]
+        if not boxes:
+            return None
+        return (min(b[0] for b in boxes), min(b[1] for b in boxes),
+                max(b[2] for b in boxes), max(b[3] for b in boxes))
+
+    def query_ids(self, min_x, min_y, max_x, max_y):
+        """
+        Globalne numery encji (rosnąco), których prostokąt otaczający przecina okno.
+        """
+        cell = self._cell
+        ix0, iy0, ix1, iy1 = cell(min_x), cell(min_y), cell(max_x), cell(max_y)
+        candidates = set(self._large)
+        if (ix1 - ix0 + 1) * (iy1 - iy0 + 1) > len(self._cells):
+            # Okno większe niż liczba zajętych komórek – przeglądamy komórki, a nie okno
+            for (ix, iy), bucket in self._cells.items():
+                if ix0 <= ix <= ix1 and iy0 <= iy <= iy1:
+                    candidates.update(bucket)
+        else:
+            cells = self._cells
+            for ix in range(ix0, ix1 + 1):
+                for iy in range(iy0, iy1 + 1):
+                    bucket = cells.get((ix, iy))
+                    if bucket is not None:
+                        candidates.update(bucket)
+        ex0, ey0, ex1, ey1 = self.min_x, self.min_y, self.max_x, self.max_y
+        return sorted(e for e in candidates
+                      if ex0[e] <= max_x and ex1[e] >= min_x and ey0[e] <= max_y and ey1[e] >= min_y)
+
+    def query(self, min_x, min_y, max_x, max_y):
+        """
+        Encje (rodzaj, indeks), których prostokąt otaczający przecina okno.
+        """
+        return [self.entity(e) for e in self.query_ids(min_x, min_y, max_x, max_y)]
+
+    def distance(self, entity, x, y):
+        """
+        Odległość punktu (x, y) od encji o globalnym numerze entity.
+        """
+        g = self.geometry
+        xs, ys = self.xs, self.ys
+        if entity < self.n_lines:
+            p1, p2 = g.line_start[entity], g.line_end[entity]
+            return _segment_distance(x, y, xs[p1], ys[p1], xs[p2], ys[p2])
+        if entity < self.n_lines + self.n_arcs:
+            i = entity - self.n_lines
+            c = g.arc_center[i]
+            params = self._arc_params
+            return _arc_distance(x, y, xs[c], ys[c], params.radius[i],
+                                 params.angle_start[i], params.angle_end[i])
+        i = entity - self.n_lines - self.n_arcs
+        c = g.circle_center[i]
+        return abs(math.hypot(x - xs[c], y - ys[c]) - self.radii[i])
+
+    def nearest(self, x, y, max_distance=None):
+        """
+        Najbliższa encja dla punktu (x, y): (rodzaj, indeks, odległość) albo None
+        (brak encji lub żadna nie leży bliżej niż max_distance).
+
+        Przeszukujemy kolejne pierścienie komórek wokół punktu; po pierścieniu k każda
+        nieodwiedzona encja leży dalej niż k * cell_size, więc można przerwać,
+        gdy najlepsza odległość jest nie większa.
+        """
+        best, best_entity = math.inf if max_distance is None else max_distance, None
+        for entity in self._large:
+            d = self.distance(entity, x, y)
+            if d < best or (d == best and best_entity is None):
+                best, best_entity = d, entity
+        if self._extent is not None:
+            cx, cy = self._cell(x), self._cell(y)
+            gx0, gy0, gx1, gy1 = self._extent
+            max_ring = max(cx - gx0, gx1 - cx, cy - gy0, gy1 - cy, 0)
+            cells = self._cells
+            seen = set()
+            for ring in range(max_ring + 1):
+                for key in _ring_cells(cx, cy, ring):
+                    bucket = cells.get(key)
+                    if bucket is None:
+                        continue
+                    for entity in bucket:
+                        if entity in seen:
+                            continue
+                        seen.add(entity)
+                        d = self.distance(entity, x, y)
+                        if d < best or (d == best and best_entity is None):
+                            best, best_entity = d, entity
+                if best <= ring * self.cell_size:
+                    break
+        if best_entity is None:
+            return None
+        return self.entity(best_entity) + (best,)
+
+
+def _ring_cells(cx, cy, ring):
+    """
+    Komórki w odległości (Czebyszewa) dokładnie ring od komórki (cx, cy).
+    """
+    if ring == 0:
+        yield (cx, cy)
+        return
+    for ix in range(cx - ring, cx + ring + 1):
+        yield (ix, cy - ring)
+        yield (ix, cy + ring)
+    for iy in range(cy - ring + 1, cy + ring):
+        yield (cx - ring, iy)
+        yield (cx + ring, iy)
+
+
+def _segment_distance(px, py, x1, y1, x2, y2):
+    dx, dy = x2 - x1, y2 - y1
+    length2 = dx * dx + dy * dy
+    if length2 == 0:
+        return math.hypot(px - x1, py - y1)
+    t = max(0.0, min(1.0, ((px - x1) * dx + (py - y1) * dy) / length2))
+    return math.hypot(px - (x1 + t * dx), py - (y1 + t * dy))
+
+
+def _arc_distance(px, py, cx, cy, r, angle_start, angle_end):
+    """
+    Odległość od łuku rysowanego CCW od angle_start do angle_end (stopnie, jak w ArcParams).
+    """
+    angle = math.degrees(math.atan2(py - cy, px - cx)) % 360
+    if angle < angle_start:
+        angle += 360
+    if angle <= angle_end:
+        return abs(math.hypot(px - cx, py - cy) - r)
+    a_s, a_e = math.radians(angle_start), math.radians(angle_end)
+    return min(math.hypot(px - cx - r * math.cos(a_s), py - cy - r * math.sin(a_s)),
+               math.hypot(px - cx - r * math.cos(a_e), py - cy - r * math.sin(a_e)))
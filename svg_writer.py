@@ -0,0 +1,64 @@
+from itertools import islice
+from write_dxf import CHUNK_SIZE, WRITE_BUFFER_SIZE, write_chunks
+
+# Strumieniowy zapis SVG: dokument składany jest z gotowych fragmentów tekstu
+# i zapisywany przez duży bufor, bez budowania drzewa elementów (svgwrite / ElementTree).
+# Wartości atrybutów to liczby i stałe nazwy, więc nie wymagają escapowania.
+
+XML_DECLARATION = "<?xml version='1.0' encoding='utf-8'?>\n"
+SVG_FOOTER = "</svg>\n"
+
+
+def svg_header(width, height, view_box=None, unit=""):
+    """
+    Otwierający znacznik <svg> (z deklaracją XML). unit dopisywany jest do width/height (np. "px").
+    """
+    attrs = f'xmlns="http://www.w3.org/2000/svg" version="1.1" width="{width}{unit}" height="{height}{unit}"'
+    if view_box is not None:
+        attrs += ' viewBox="%s %s %s %s"' % tuple(view_box)
+    return f"{XML_DECLARATION}<svg {attrs}>\n"
+
+
+def group_start(stroke, stroke_width=1):
+    return f'<g fill="none" stroke="{stroke}" stroke-width="{stroke_width}">\n'
+
+
+GROUP_END = "</g>\n"
+
+
+def path_chunks(commands, attrs="", chunk_size=CHUNK_SIZE):
+    """
+    Jeden element <path> z kolejnych poleceń ścieżki (np. "M 0,0 L 1,1"), sklejanych
+    w bloki po chunk_size. Bez poleceń nie generuje nic.
+    """
+    commands = iter(commands)
+    chunk = " ".join(islice(commands, chunk_size))
+    if not chunk:
+        return
+    yield f'<path{attrs} d="{chunk}'
+    while True:
+        chunk = " ".join(islice(commands, chunk_size))
+        if not chunk:
+            break
+        yield " " + chunk
+    yield '"/>\n'
+
+
+def element_chunks(elements, chunk_size=CHUNK_SIZE):
+    """
+    Skleja gotowe elementy (tekst) w bloki po chunk_size.
+    """
+    elements = iter(elements)
+    while True:
+        chunk = "".join(islice(elements, chunk_size))
+        if not chunk:
+            break
+        yield chunk
+
+
+def write_svg(svg_filename, chunks):
+    """
+    Zapisuje dokument SVG z bloków tekstu przez duży bufor. Zwraca liczbę zapisanych bajtów.
+    """
+    with open(svg_filename, 'wb', buffering=WRITE_BUFFER_SIZE) as f:
+        return write_chunks(f, chunks)
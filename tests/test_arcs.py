@@ -0,0 +1,55 @@
+import math
+import random
+import struct
+
+from arcs import compute_arc_params, compute_arc_params_batch
+
+
+def _bits(value):
+    return struct.pack('<d', value)
+
+
+def _random_arcs(count, seed=1234):
+    rnd = random.Random(seed)
+    arcs = []
+    for _ in range(count):
+        cx, cy = rnd.uniform(-1e3, 1e3), rnd.uniform(-1e3, 1e3)
+        r = rnd.uniform(1e-3, 500)
+        a0, a1 = rnd.uniform(-math.pi, math.pi), rnd.uniform(-math.pi, math.pi)
+        arcs.append((cx, cy, cx + r * math.cos(a0), cy + r * math.sin(a0),
+                     cx + r * math.cos(a1), cy + r * math.sin(a1), rnd.choice((-1, 1))))
+    # Przypadki brzegowe: kąty na osiach i pełny obrót (start == koniec)
+    arcs += [(0.0, 0.0, 1.0, 0.0, 0.0, 1.0, 1), (0.0, 0.0, 1.0, 0.0, 0.0, 1.0, -1),
+             (0.0, 0.0, -1.0, 0.0, -1.0, -0.0, 1), (5.0, 5.0, 6.0, 5.0, 6.0, 5.0, -1)]
+    return arcs
+
+
+def test_batch_matches_scalar_bit_for_bit():
+    arcs = _random_arcs(20000)
+    params = compute_arc_params_batch(*zip(*arcs))
+    assert len(params) == len(arcs)
+    for i, arc in enumerate(arcs):
+        _, _, r, a_s, a_e = compute_arc_params(*arc)
+        assert _bits(params.radius[i]) == _bits(r)
+        assert _bits(params.angle_start[i]) == _bits(a_s)
+        assert _bits(params.angle_end[i]) == _bits(a_e)
+        assert _bits(params.sweep[i]) == _bits(a_e - a_s)
+
+
+def test_clockwise_large_arc_flag():
+    # Łuk CW z (1, 0) do (0, 1) wokół (0, 0) ma 270° – dawny kod SVG dawał tu large-arc 0
+    params = compute_arc_params_batch([0.0], [0.0], [1.0], [0.0], [0.0], [1.0], [-1])
+    assert params.sweep[0] == 270.0
+    assert params.large_arc[0] == 1
+    assert params.sweep_flag[0] == 0
+    # Ten sam łuk CCW ma 90°
+    params = compute_arc_params_batch([0.0], [0.0], [1.0], [0.0], [0.0], [1.0], [1])
+    assert (params.sweep[0], params.large_arc[0], params.sweep_flag[0]) == (90.0, 0, 1)
+
+
+def test_legacy_import_locations():
+    import parse_lst
+    import write_dxf
+
+    assert write_dxf.compute_arc_params is compute_arc_params
+    assert parse_lst.compute_arc_params is compute_arc_params
@@ -0,0 +1,44 @@
+import os
+
+import cache as cache_module
+from cache import ENV_CACHE_DIR, ENV_CACHE_MAX_MB, ConversionCache, cache_from_env
+
+
+def _produce(cache, name, size):
+    path = os.path.join(cache.directory, ".tmp-" + name)
+    with open(path, "wb") as f:
+        f.write(b"x" * size)
+    return cache.store(name * 4, path, ".dxf")
+
+
+def test_store_tracks_size_without_rescanning(tmp_path, monkeypatch):
+    walks = []
+    real_walk = os.walk
+    monkeypatch.setattr(cache_module.os, "walk", lambda top: walks.append(top) or real_walk(top))
+    cache = ConversionCache(str(tmp_path), max_bytes=1000)
+    for name in "abcd":
+        _produce(cache, name, 100)
+    # Katalog przeglądany tylko przy pierwszym zapisie
+    assert len(walks) == 1
+    assert cache._total == 400
+
+
+def test_store_evicts_over_limit(tmp_path):
+    cache = ConversionCache(str(tmp_path), max_bytes=350)
+    entries = [_produce(cache, name, 100) for name in "abc"]
+    os.utime(entries[0], (1, 1))
+    os.utime(entries[1], (2, 2))
+    entry = _produce(cache, "d", 100)
+    assert os.path.exists(entry)
+    assert [os.path.exists(path) for path in entries] == [False, True, True]
+    assert cache._total == 300
+
+
+def test_cache_dir_option_keeps_env_limit(tmp_path, monkeypatch):
+    monkeypatch.delenv(ENV_CACHE_DIR, raising=False)
+    monkeypatch.setenv(ENV_CACHE_MAX_MB, "2")
+    cache = cache_from_env(str(tmp_path))
+    assert cache.directory == str(tmp_path)
+    assert cache.max_bytes == 2 * 1024 * 1024
+    monkeypatch.delenv(ENV_CACHE_MAX_MB)
+    assert cache_from_env() is None
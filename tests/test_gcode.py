@@ -0,0 +1,123 @@
+import re
+import pytest
+from gcode import interpret
+from new_lst_parse import approximate_arc, parse_gcode_block, parse_gcode_paths
+from parse_lst import parse_lst
+
+# Bloki mieszające zmianę trybu (G90/G91) z komendą ruchu w jednej linii
+PROGRAM = """\
+START_TEXT
+N1 G90
+N2 G01 X10 Y10
+N3 TC_LASER_ON(1,2)
+N4 G91 G01 X1.5 Y-2
+N5 G01 X1.5 Y-2
+N6 G01 G91 X1 Y1
+N7 X5 Y5
+N8 G90 G03 X20 Y20 I5 J0
+N9 G03 X20 Y30 I0 J5
+N10 G4 G01 X7 Y7
+N11 G91
+N12 G02 X2 Y0 I1 J0
+N13 TC_LASER_OFF
+N14 G00 X-3 Y4 G90
+N15 G01 X1 Y1
+N16 G91 TC_LASER_ON(1,1)
+N17 G01 X2 Y2
+N18 G90 TC_LASER_OFF
+N19 G01 X4 Y4
+STOP_TEXT
+"""
+
+
+def _legacy_parse_gcode_block(lst_filename):
+    """
+    Dawny new_lst_parse.parse_gcode_block (przed gcode.interpret) – punkt odniesienia.
+    """
+    with open(lst_filename, 'r', encoding='cp1250') as f:
+        lines = f.readlines()
+    in_text = False
+    gcode_lines = []
+    for line in lines:
+        line = line.strip()
+        if "START_TEXT" in line:
+            in_text = True
+            continue
+        if "STOP_TEXT" in line:
+            break
+        if in_text:
+            gcode_lines.append(line)
+
+    mode_incremental = True
+    contours = []
+    current_contour = []
+    current_pos = (0.0, 0.0)
+    regex_cmd = re.compile(r'G(\d+\.?\d*)')
+    regex_coord = re.compile(r'([XYIJ])([-+]?[0-9]*\.?[0-9]+)')
+    regex_mode = re.compile(r'G(90|91)')
+    for line in gcode_lines:
+        m = regex_mode.search(line)
+        if m:
+            mode_incremental = m.group(1) == "91"
+        if "TC_LASER_ON" in line or "TC_LASER_OFF" in line:
+            if current_contour:
+                contours.append(current_contour)
+                current_contour = []
+            continue
+        cmd_match = regex_cmd.search(line)
+        if not cmd_match:
+            continue
+        cmd = float(cmd_match.group(1))
+        params = {match.group(1): float(match.group(2)) for match in regex_coord.finditer(line)}
+        if cmd not in (0.0, 1.0, 2.0, 3.0):
+            continue
+        if cmd in (2.0, 3.0) and 'X' not in params and 'Y' not in params:
+            continue
+        new_x, new_y = current_pos
+        if 'X' in params:
+            new_x = params['X'] + (current_pos[0] if mode_incremental else 0)
+        if 'Y' in params:
+            new_y = params['Y'] + (current_pos[1] if mode_incremental else 0)
+        if cmd in (0.0, 1.0):
+            current_contour.append((new_x, new_y))
+        else:
+            arc_points = approximate_arc(current_pos, (new_x, new_y), params.get('I', 0.0), params.get('J', 0.0),
+                                         is_clockwise=(cmd == 2.0), steps=10)
+            current_contour.extend(arc_points[1:])
+        current_pos = (new_x, new_y)
+    if current_contour:
+        contours.append(current_contour)
+    return contours
+
+
+@pytest.fixture
+def program_file(tmp_path):
+    path = tmp_path / "mixed.lst"
+    path.write_text(PROGRAM, encoding="cp1250")
+    return str(path)
+
+
+def test_parse_gcode_block_matches_legacy_parser(program_file):
+    assert parse_gcode_block(program_file) == _legacy_parse_gcode_block(program_file)
+
+
+def test_first_g_code_decides_in_legacy_mode(program_file):
+    # "N4 G91 G01 ..." tylko zmienia tryb; pierwszy ruch konturu wykonuje dopiero N5
+    contour = parse_gcode_block(program_file)[1]
+    assert contour[:2] == [(11.5, 8.0), (12.5, 9.0)]
+
+
+def test_modal_interpreter_executes_last_g_code(program_file):
+    # parse_lst (modal=True) wykonuje blok jak maszyna: ostatni kod G wygrywa
+    with open(program_file, "rb") as f:
+        lines = f.read().splitlines()[1:-1]
+    moves = [record[3:5] for record in interpret(lines) if len(record) > 2]
+    assert moves[:3] == [(10.0, 10.0), (11.5, 8.0), (13.0, 6.0)]
+    points = parse_lst(program_file).points
+    assert points[3][:2] == (11.5, 8.0)
+
+
+def test_paths_share_legacy_semantics(program_file):
+    paths = parse_gcode_paths(program_file)
+    contours = parse_gcode_block(program_file)
+    assert [path[0][:2] for path in paths][1:] == [contour[0] for contour in contours][1:]
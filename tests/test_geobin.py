@@ -0,0 +1,54 @@
+import os
+
+import pytest
+
+from geobin import HEADER, dump_geometry, load_geometry
+from geometry import Geometry
+
+
+def _mapped(path):
+    # Ścieżki zmapowane przez bieżący proces (Linux)
+    with open("/proc/self/maps") as f:
+        return str(path) in f.read()
+
+
+def _geometry():
+    geometry = Geometry()
+    geometry.extend_points([1, 2, 3], [0.0, 10.0, 10.0], [0.0, 0.0, 5.0], [0.0, 0.0, 0.0])
+    geometry.add_line(1, 2, 7)
+    geometry.add_arc(1, 2, 3, 1, 2)
+    geometry.add_circle(3, 2.5, 7)
+    return geometry
+
+
+pytestmark = pytest.mark.skipif(not os.path.exists("/proc/self/maps"), reason="wymaga /proc")
+
+
+def test_close_releases_mapping(tmp_path):
+    path = tmp_path / "part.geob"
+    dump_geometry(_geometry(), str(path))
+
+    with load_geometry(str(path)) as geometry:
+        assert _mapped(path)
+        assert list(geometry.lines) == list(_geometry().lines)
+        assert list(geometry.arcs) == list(_geometry().arcs)
+    assert not _mapped(path)
+    geometry.close()  # ponowne zamknięcie nic nie robi
+
+
+@pytest.mark.parametrize("damage", ["magic", "version", "truncated"])
+def test_invalid_file_is_not_left_mapped(tmp_path, damage):
+    path = tmp_path / "part.geob"
+    dump_geometry(_geometry(), str(path))
+    data = bytearray(path.read_bytes())
+    if damage == "magic":
+        data[:8] = b"NOTGEOB\x00"
+    elif damage == "version":
+        data[8:12] = (99).to_bytes(4, "little")
+    else:
+        data = data[:HEADER.size + 8]
+    path.write_bytes(bytes(data))
+
+    with pytest.raises(ValueError):
+        load_geometry(str(path))
+    assert not _mapped(path)
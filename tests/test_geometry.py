@@ -0,0 +1,55 @@
+from geometry import Geometry, as_geometry
+from parse_geo import parse_geo
+
+
+def test_from_tuples_skips_dangling_references():
+    points = {1: (0.0, 0.0, 0.0), 2: (10.0, 0.0, 0.0)}
+    lines = [(1, 2, 1), (1, 99, 1)]
+    arcs = [(1, 2, 98, 1, 1)]
+    circles = [(97, 5.0, 1), (1, 5.0, 2)]
+    geometry = as_geometry(points, lines, arcs, circles)
+    points_view, lines_view, arcs_view, circles_view = geometry
+    # Pominięta encja nie zostawia niepełnych wierszy w kolumnach
+    assert (len(geometry.arc_center), len(geometry.arc_start), len(geometry.arc_end)) == (0, 0, 0)
+    assert len(geometry.line_start) == len(geometry.line_end) == 1
+    assert list(lines_view) == [(1, 2, 1)]
+    assert list(arcs_view) == []
+    assert list(circles_view) == [(1, 5.0, 2)]
+
+
+def test_duplicate_point_id_last_definition_wins():
+    geometry = Geometry()
+    geometry.add_point(1, 0.0, 0.0)
+    geometry.add_point(2, 1.0, 1.0)
+    geometry.add_line(1, 2, 1)
+    geometry.add_point(2, 5.0, 5.0)
+    geometry.add_point(7, 2.0, 2.0)
+    geometry.add_point(7, 3.0, 3.0)
+    assert len(geometry.point_ids) == 3
+    assert geometry.points[2] == (5.0, 5.0, 0.0)
+    assert geometry.points[7] == (3.0, 3.0, 0.0)
+    # Wcześniej dodana encja widzi nową definicję punktu
+    end = geometry.line_end[0]
+    assert (geometry.xs[end], geometry.ys[end]) == (5.0, 5.0)
+    assert max(geometry.xs) == 5.0
+
+
+def test_extend_points_with_duplicates():
+    geometry = Geometry()
+    geometry.extend_points([1, 2, 1], [0.0, 1.0, 9.0], [0.0, 1.0, 9.0], [0.0, 0.0, 0.0])
+    assert sorted(geometry.points.items()) == [(1, (9.0, 9.0, 0.0)), (2, (1.0, 1.0, 0.0))]
+    assert len(geometry.xs) == 2
+
+
+def test_parse_geo_duplicate_point(tmp_path):
+    geo = tmp_path / "dup.geo"
+    geo.write_text(
+        "#~3\n"
+        "#~31\nP\n1\n0.0 0.0 0.0\n|~\nP\n2\n100.0 0.0 0.0\n|~\nP\n2\n10.0 0.0 0.0\n|~\n##~~\n"
+        "#~331\nLIN\n1 0\n1 2\n|~\n##~~\n"
+        "#~KT\n"
+    )
+    for backend in ("stream", "mmap"):
+        points, lines, arcs, circles = parse_geo(str(geo), backend=backend)
+        assert points[2] == (10.0, 0.0, 0.0)
+        assert max(x for x, _, _ in points.values()) == 10.0
@@ -0,0 +1,43 @@
+from instrumentation import Metrics
+from main import geo_to_dxf
+from transform import Affine
+
+GEO = ("#~3\n#~31\n"
+       + "".join(f"P\n{k + 1}\n{x} {y} 0.0\n|~\n" for k, (x, y) in enumerate(
+           [(0, 0), (5, 0), (10, 0), (10, 10), (0, 10), (5, 5)]))
+       + "##~~\n#~331\n"
+       + "".join(f"LIN\n1 0\n{a} {b}\n|~\n" for a, b in [(1, 2), (2, 3), (3, 4), (4, 5), (5, 1)])
+       + "CIR\n1 0\n6\n2.0\n|~\n##~~\n#~KT\n")
+
+
+def test_geo_to_dxf_times_every_stage(tmp_path):
+    geo = tmp_path / "part.geo"
+    geo.write_text(GEO)
+    metrics = Metrics()
+    geo_to_dxf(str(geo), str(tmp_path / "a.dxf"), verbose=False, metrics=metrics, weld=1e-6,
+               simplify=0.01, transform=Affine.rotate(90))
+    assert list(metrics.stages) == ["parse", "weld", "simplify", "transform", "write"]
+    assert metrics.counters["bytes_read"] == geo.stat().st_size
+    # Wynik nie zależy od tego, czy metryki są zbierane
+    geo_to_dxf(str(geo), str(tmp_path / "b.dxf"), verbose=False, weld=1e-6, simplify=0.01,
+               transform=Affine.rotate(90))
+    assert (tmp_path / "a.dxf").read_bytes() == (tmp_path / "b.dxf").read_bytes()
+
+
+def test_cache_key_includes_transform(tmp_path):
+    from cache import ConversionCache
+
+    geo = tmp_path / "part.geo"
+    geo.write_text(GEO)
+    cache = ConversionCache(str(tmp_path / "cache"))
+    plain, moved = tmp_path / "plain.dxf", tmp_path / "moved.dxf"
+    geo_to_dxf(str(geo), str(plain), verbose=False, cache=cache)
+    geo_to_dxf(str(geo), str(moved), verbose=False, cache=cache, transform=Affine.translate(100, 0))
+    assert plain.read_bytes() != moved.read_bytes()
+    # Ponowna konwersja z tym samym przekształceniem pochodzi z cache i daje ten sam wynik
+    again = tmp_path / "again.dxf"
+    metrics = Metrics()
+    geo_to_dxf(str(geo), str(again), verbose=False, cache=cache, metrics=metrics,
+               transform=Affine.translate(100, 0))
+    assert metrics.counters["cache_hits"] == 1
+    assert again.read_bytes() == moved.read_bytes()
@@ -0,0 +1,68 @@
+import random
+
+import pytest
+
+from parse_geo import parse_geo
+
+
+def _geo_text(seed=7, points=300, ids_step=1):
+    rnd = random.Random(seed)
+    ids = [1 + k * ids_step for k in range(points)]
+    out = ["#~1", "1.03", "1", "test", "##~~", "#~3", "", "#~31"]
+    for pid in ids:
+        out += ["P", f"   {pid}", " ".join(f"{rnd.uniform(-1e4, 1e4):.9f}" for _ in range(2)) + " 0.000000000", "|~"]
+    out += ["##~~", "#~331"]
+    for _ in range(points):
+        kind = rnd.random()
+        params = rnd.choice(["1 0", "3 0", "2 1", "1 1"])
+        if kind < 0.6:
+            out += ["LIN", params, f"{rnd.choice(ids)} {rnd.choice(ids)}", "|~"]
+        elif kind < 0.9:
+            out += ["ARC", params, " ".join(str(rnd.choice(ids)) for _ in range(3)),
+                    str(rnd.choice((1, -1))), "|~"]
+        else:
+            out += ["CIR", params, str(rnd.choice(ids)), f"{rnd.uniform(0.1, 100):.6f}", "|~"]
+    out += ["##~~", "#~KT", "##~~", "#~END", ""]
+    return out
+
+
+def _parsed(path, backend):
+    points, lines, arcs, circles = parse_geo(str(path), backend=backend)
+    return dict(points.items()), list(lines), list(arcs), list(circles)
+
+
+@pytest.mark.parametrize("variant", ["lf", "crlf", "whitespace", "sparse_ids"])
+def test_mmap_backend_matches_stream(tmp_path, variant):
+    lines = _geo_text(ids_step=3 if variant == "sparse_ids" else 1)
+    if variant == "whitespace":
+        lines = [f"  {line}\t " if line and not line.startswith("#") else line for line in lines]
+    newline = "\r\n" if variant == "crlf" else "\n"
+    path = tmp_path / "part.geo"
+    path.write_bytes(newline.join(lines).encode("ascii"))
+    stream = _parsed(path, "stream")
+    assert stream[0] and stream[1] and stream[2] and stream[3]
+    assert _parsed(path, "mmap") == stream
+
+
+def test_empty_file(tmp_path):
+    path = tmp_path / "empty.geo"
+    path.write_bytes(b"")
+    assert _parsed(path, "mmap") == _parsed(path, "stream") == ({}, [], [], [])
+
+
+
+@pytest.mark.parametrize("backend", ["stream", "mmap"])
+def test_dangling_references_are_skipped(tmp_path, backend):
+    path = tmp_path / "dangling.geo"
+    path.write_text(
+        "#~3\n#~31\nP\n1\n0.0 0.0 0.0\n|~\nP\n2\n10.0 0.0 0.0\n|~\n##~~\n"
+        "#~331\n"
+        "LIN\n1 0\n1 2\n|~\nLIN\n1 0\n1 9\n|~\n"
+        "ARC\n1 0\n1 2 9\n1\n|~\nARC\n1 0\n9 1 2\n-1\n|~\n"
+        "CIR\n1 0\n9\n5.0\n|~\nCIR\n1 0\n2\n5.0\n|~\n"
+        "##~~\n#~KT\n"
+    )
+    points, lines, arcs, circles = _parsed(path, backend)
+    assert lines == [(1, 2, 7)]
+    assert arcs == []
+    assert circles == [(2, 5.0, 7)]
@@ -0,0 +1,41 @@
+import asyncio
+import os
+import shutil
+import signal
+import time
+
+import pytest
+
+from service import ConversionService, WorkerCrashed
+
+GEO = (b"#~3\n#~31\nP\n1\n0.0 0.0 0.0\n|~\nP\n2\n10.0 0.0 0.0\n|~\n##~~\n"
+       b"#~331\nLIN\n1 0\n1 2\n|~\n##~~\n#~KT\n")
+
+
+def test_broken_pool_is_replaced():
+    async def scenario(service):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(service.pool, os.getpid)
+        broken = service.pool
+        for pid in list(broken._processes):
+            os.kill(pid, signal.SIGKILL)
+        # Pula zauważa zakończenie procesów w osobnym wątku
+        deadline = time.monotonic() + 10
+        while not broken._broken and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        with pytest.raises(WorkerCrashed):
+            await service.convert("/dxf", GEO, {"mode": "entities"})
+        assert service.pool is not broken
+        output_file = await service.convert("/dxf", GEO, {"mode": "entities"})
+        try:
+            with open(output_file, "rb") as f:
+                assert b"LINE" in f.read()
+        finally:
+            shutil.rmtree(os.path.dirname(output_file), ignore_errors=True)
+        assert service.pending == 0
+
+    service = ConversionService(jobs=1, verbose=False)
+    try:
+        asyncio.run(scenario(service))
+    finally:
+        service.close()
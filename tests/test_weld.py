@@ -0,0 +1,34 @@
+import math
+
+from geometry import Geometry
+from weld import weld_points
+
+
+def _arc_geometry(sweep_degrees, direction=1):
+    geometry = Geometry()
+    geometry.add_point(1, 0.0, 0.0)
+    geometry.add_point(2, 10.0, 0.0)
+    angle = math.radians(sweep_degrees * direction)
+    geometry.add_point(3, 10.0 * math.cos(angle), 10.0 * math.sin(angle))
+    geometry.add_arc(1, 2, 3, direction, 1)
+    return geometry
+
+
+def test_almost_full_arc_becomes_circle():
+    for direction in (1, -1):
+        welded = weld_points(_arc_geometry(360 - 1e-6, direction), 1e-3)
+        assert len(welded.arc_center) == 0
+        assert list(welded.circle_radius) == [10.0]
+        assert list(welded.circle_color) == [1]
+
+
+def test_almost_empty_arc_is_dropped():
+    welded = weld_points(_arc_geometry(1e-6), 1e-3)
+    assert len(welded.arc_center) == 0
+    assert len(welded.circle_center) == 0
+
+
+def test_regular_arc_is_kept():
+    welded = weld_points(_arc_geometry(90), 1e-3)
+    assert list(welded.arcs) == [(1, 2, 3, 1, 1)]
+    assert len(welded.circle_center) == 0
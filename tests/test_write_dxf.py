@@ -0,0 +1,68 @@
+import pytest
+
+from geometry import Geometry
+from write_dxf import write_dxf
+
+
+def _geometry():
+    geometry = Geometry()
+    for pid, (x, y) in enumerate([(0, 0), (10, 0), (10, 10), (0, 10), (20, 0), (25, 5), (30, 0)], 1):
+        geometry.add_point(pid, float(x), float(y))
+    # Zamknięty kontur, pojedyncza linia i łuk oraz okrąg
+    for start, end in [(1, 2), (2, 3), (3, 4), (4, 1), (5, 7)]:
+        geometry.add_line(start, end, 7)
+    geometry.add_arc(6, 5, 7, 1, 2)
+    geometry.add_circle(6, 2.0, 7)
+    return geometry
+
+
+def _pairs(path):
+    lines = path.read_text().splitlines()
+    return [(int(code), value) for code, value in zip(lines[::2], lines[1::2])]
+
+
+def test_lwpolyline_file_is_complete_r2000(tmp_path):
+    path = tmp_path / "out.dxf"
+    write_dxf(str(path), *_geometry(), mode="lwpolyline")
+    pairs = _pairs(path)
+    sections = [value for (code, value), previous in zip(pairs[1:], pairs) if previous == (0, "SECTION")]
+    assert sections == ["HEADER", "CLASSES", "TABLES", "BLOCKS", "ENTITIES", "OBJECTS"]
+    assert pairs[-1] == (0, "EOF")
+    handseed = int(dict(zip(pairs, pairs[1:]))[(9, "$HANDSEED")][1], 16)
+    body = pairs[pairs.index((2, "CLASSES")):]
+    handles = [int(value, 16) for code, value in body if code in (5, 105)]
+    assert len(handles) == len(set(handles))
+    assert max(handles) < handseed
+    entities = pairs[pairs.index((2, "ENTITIES")) + 1:pairs.index((2, "OBJECTS")) - 2]
+    kinds = [value for code, value in entities if code == 0]
+    assert sorted(kinds) == ["ARC", "CIRCLE", "LINE", "LWPOLYLINE"]
+    assert sum(1 for pair in entities if pair == (330, "1F")) == len(kinds)
+
+
+def test_lwpolyline_file_passes_ezdxf_audit(tmp_path):
+    ezdxf = pytest.importorskip("ezdxf")
+    path = tmp_path / "out.dxf"
+    write_dxf(str(path), *_geometry(), mode="lwpolyline")
+    doc = ezdxf.readfile(str(path))
+    auditor = doc.audit()
+    assert doc.dxfversion == "AC1015"
+    assert not auditor.has_errors and not auditor.fixes
+    assert sorted(e.dxftype() for e in doc.modelspace()) == ["ARC", "CIRCLE", "LINE", "LWPOLYLINE"]
+
+
+def test_sheet_file_has_header_and_tables(tmp_path):
+    from parse_lst import write_dxf_sheet
+
+    sheet = [(0.0, 0.0), (100.0, 0.0), (100.0, 50.0), (0.0, 50.0), (0.0, 0.0)]
+    for mode in ("entities", "polyline"):
+        path = tmp_path / f"{mode}.dxf"
+        write_dxf_sheet(str(path), {"part": _geometry()}, [("part", 10.0, 5.0), ("part", 40.0, 5.0, 90.0)],
+                        sheet, mode=mode)
+        pairs = _pairs(path)
+        sections = [value for (code, value), previous in zip(pairs[1:], pairs) if previous == (0, "SECTION")]
+        assert sections == ["HEADER", "TABLES", "BLOCKS", "ENTITIES"]
+        assert (1, "AC1009") in pairs
+        assert pairs.count((0, "INSERT")) == 2
+        assert ((0, "POLYLINE") in pairs[:pairs.index((2, "ENTITIES"))]) == (mode == "polyline")
+    with pytest.raises(ValueError):
+        write_dxf_sheet(str(tmp_path / "lw.dxf"), {"part": _geometry()}, [], sheet, mode="lwpolyline")
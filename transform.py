@@ -0,0 +1,181 @@
+import copy
+import math
+from array import array
+
+# Przekształcenia afiniczne 2D stosowane do kolumn współrzędnych modelu Geometry.
+#
+# Punkt (x, y) przechodzi w:
+#   x' = a*x + b*y + c
+#   y' = d*x + e*y + f
+# Przekształcenie stosowane jest hurtowo do kolumn xs/ys (transformed_columns) tuż przed
+# zapisem – sam model Geometry nie jest zmieniany, a brak przekształcenia (None lub
+# tożsamość) oznacza użycie oryginalnych kolumn bez kopiowania.
+
+
+class Affine:
+    """
+    Przekształcenie afiniczne 2D (a, b, c, d, e, f) – patrz opis modułu.
+
+    Złożenie: (t2 @ t1) to najpierw t1, potem t2; t1.then(t2) to samo, czytane
+    w kolejności wykonywania, np.:
+        Affine.rotate(90).then(Affine.translate(100, 50))
+    """
+
+    __slots__ = ("a", "b", "c", "d", "e", "f")
+
+    def __init__(self, a=1.0, b=0.0, c=0.0, d=0.0, e=1.0, f=0.0):
+        self.a, self.b, self.c = float(a), float(b), float(c)
+        self.d, self.e, self.f = float(d), float(e), float(f)
+
+    @classmethod
+    def identity(cls):
+        return cls()
+
+    @classmethod
+    def translate(cls, dx, dy):
+        return cls(1.0, 0.0, dx, 0.0, 1.0, dy)
+
+    @classmethod
+    def rotate(cls, angle, cx=0.0, cy=0.0):
+        """
+        Obrót o angle stopni (CCW) wokół punktu (cx, cy).
+        Wielokrotności 90° dają dokładne zera i jedynki w macierzy.
+        """
+        quarter = angle / 90.0
+        if quarter == int(quarter):
+            cos_a, sin_a = ((1.0, 0.0), (0.0, 1.0), (-1.0, 0.0), (0.0, -1.0))[int(quarter) % 4]
+        else:
+            rad = math.radians(angle)
+            cos_a, sin_a = math.cos(rad), math.sin(rad)
+        return cls(cos_a, -sin_a, cx - cos_a * cx + sin_a * cy,
+                   sin_a, cos_a, cy - sin_a * cx - cos_a * cy)
+
+    @classmethod
+    def scale(cls, sx, sy=None, cx=0.0, cy=0.0):
+        """
+        Skalowanie względem punktu (cx, cy); sy=None oznacza skalę jednorodną.
+        """
+        if sy is None:
+            sy = sx
+        return cls(sx, 0.0, cx - sx * cx, 0.0, sy, cy - sy * cy)
+
+    @classmethod
+    def mirror(cls, axis="x", origin=0.0):
+        """
+        Odbicie względem prostej równoległej do osi: axis="x" – prostej y = origin
+        (zmienia znak y), axis="y" – prostej x = origin (zmienia znak x).
+        """
+        if axis == "x":
+            return cls(1.0, 0.0, 0.0, 0.0, -1.0, 2.0 * origin)
+        if axis == "y":
+            return cls(-1.0, 0.0, 2.0 * origin, 0.0, 1.0, 0.0)
+        raise ValueError(f"Nieznana oś odbicia: {axis!r} (dozwolone 'x' lub 'y')")
+
+    def __matmul__(self, other):
+        a, b, c, d, e, f = self.a, self.b, self.c, self.d, self.e, self.f
+        return Affine(a * other.a + b * other.d, a * other.b + b * other.e, a * other.c + b * other.f + c,
+                      d * other.a + e * other.d, d * other.b + e * other.e, d * other.c + e * other.f + f)
+
+    def then(self, other):
+        return other @ self
+
+    def __eq__(self, other):
+        return isinstance(other, Affine) and self.coefficients == other.coefficients
+
+    def __hash__(self):
+        return hash(self.coefficients)
+
+    def __repr__(self):
+        return "Affine(%r, %r, %r, %r, %r, %r)" % self.coefficients
+
+    @property
+    def coefficients(self):
+        return (self.a, self.b, self.c, self.d, self.e, self.f)
+
+    @property
+    def is_identity(self):
+        return self.coefficients == (1.0, 0.0, 0.0, 0.0, 1.0, 0.0)
+
+    @property
+    def is_translation(self):
+        return (self.a, self.b, self.d, self.e) == (1.0, 0.0, 0.0, 1.0)
+
+    @property
+    def determinant(self):
+        return self.a * self.e - self.b * self.d
+
+    @property
+    def reverses_orientation(self):
+        """
+        Odbicie lustrzane – łuki zmieniają kierunek (CCW <-> CW).
+        """
+        return self.determinant < 0
+
+    @property
+    def is_conformal(self):
+        """
+        Czy okrąg przechodzi w okrąg (obrót, odbicie, przesunięcie, skala jednorodna).
+        """
+        return (math.isclose(self.a * self.a + self.d * self.d, self.b * self.b + self.e * self.e)
+                and math.isclose(self.a * self.b + self.d * self.e, 0.0, abs_tol=1e-12))
+
+    @property
+    def scale_factor(self):
+        """
+        Współczynnik skali promieni dla przekształcenia konforemnego.
+        """
+        return math.sqrt(abs(self.determinant))
+
+    def apply(self, x, y):
+        return (self.a * x + self.b * y + self.c, self.d * x + self.e * y + self.f)
+
+    def apply_columns(self, xs, ys):
+        """
+        Przekształca kolumny współrzędnych hurtowo i zwraca nowe (xs, ys) jako array('d').
+        Dla tożsamości zwraca kolumny wejściowe bez kopiowania.
+        """
+        if self.is_identity:
+            return xs, ys
+        a, b, c, d, e, f = self.coefficients
+        if self.is_translation:
+            return array('d', [x + c for x in xs]), array('d', [y + f for y in ys])
+        return (array('d', [a * x + b * y + c for x, y in zip(xs, ys)]),
+                array('d', [d * x + e * y + f for x, y in zip(xs, ys)]))
+
+
+def transformed_geometry(geometry, transform=None):
+    """
+    Model Geometry z kolumnami po przekształceniu (transformed_columns) – kolumny encji
+    są współdzielone z oryginałem. Pozwala wykonać (i zmierzyć) przekształcenie jako
+    osobny etap przed zapisem; bez przekształcenia zwraca sam model.
+    """
+    if transform is None or transform.is_identity:
+        return geometry
+    xs, ys, directions, radii = transformed_columns(geometry, transform)
+    result = copy.copy(geometry)
+    result.xs, result.ys, result.arc_direction, result.circle_radius = xs, ys, directions, radii
+    return result
+
+
+def transformed_columns(geometry, transform=None):
+    """
+    Zwraca (xs, ys, arc_direction, circle_radius) modelu Geometry po przekształceniu.
+    Bez przekształcenia (None lub tożsamość) są to kolumny modelu, bez kopiowania.
+
+    Odbicie odwraca kierunek łuków, a skala zmienia promienie okręgów.
+    Przekształcenie, które nie zachowuje okręgów (np. skala niejednorodna), jest
+    dozwolone tylko dla geometrii bez łuków i okręgów – inaczej ValueError.
+    """
+    if transform is None or transform.is_identity:
+        return geometry.xs, geometry.ys, geometry.arc_direction, geometry.circle_radius
+    if not transform.is_conformal and (len(geometry.arc_center) or len(geometry.circle_center)):
+        raise ValueError("Przekształcenie nie zachowuje okręgów – łuków i okręgów nie da się zapisać")
+    xs, ys = transform.apply_columns(geometry.xs, geometry.ys)
+    directions = geometry.arc_direction
+    if transform.reverses_orientation:
+        directions = array('b', [0 if direction == 1 else 1 for direction in directions])
+    radii = geometry.circle_radius
+    scale = transform.scale_factor
+    if scale != 1.0:
+        radii = array('d', [radius * scale for radius in radii])
+    return xs, ys, directions, radii
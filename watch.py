@@ -0,0 +1,310 @@
+import ctypes
+import ctypes.util
+import hashlib
+import json
+import os
+import select
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from main import conversion_options, geo_to_dxf
+from parse_lst import parse_lst
+from simplify import simplify_geometry
+from write_dxf import write_dxf
+
+# Obserwowanie katalogu (np. folderu eksportu TruTops) i konwersja nowych lub zmienionych
+# plików GEO i LST do DXF.
+#
+# Zmiany wykrywane są przez inotify (Linux, przez ctypes – bez dodatkowych pakietów),
+# a gdzie go nie ma (inne systemy, udziały sieciowe zapisywane z innego komputera) –
+# przez okresowe skanowanie katalogu. Zdarzenia inotify jedynie budzą pętlę wcześniej;
+# o gotowości pliku zawsze decyduje skan: plik konwertujemy dopiero wtedy, gdy jego rozmiar
+# i czas modyfikacji nie zmieniły się przez `settle` sekund (zapis się zakończył).
+#
+# Manifest (MANIFEST_NAME w katalogu wyjściowym) zapamiętuje dla każdego wejścia skrót
+# SHA-256 zawartości, rozmiar, czas modyfikacji, opcje i plik wynikowy, więc po restarcie
+# pliki już skonwertowane nie są konwertowane ponownie.
+
+MANIFEST_NAME = ".geo2dxf-manifest.json"
+
+DEFAULT_SETTLE = 1.0
+POLL_INTERVAL = 1.0
+# Przy inotify katalog i tak jest co jakiś czas skanowany (zdarzenia mogą nie dotrzeć)
+RESCAN_INTERVAL = 30.0
+
+WATCHED_SUFFIXES = (".geo", ".lst")
+
+# Maski zdarzeń inotify (linux/inotify.h)
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+
+# Znacznik w Watcher._changing: plik sprawdzony (skonwertowany, aktualny lub z błędem) –
+# czekamy na jego kolejną zmianę
+_CHECKED = float("-inf")
+
+
+def file_digest(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def output_name(input_file):
+    """
+    Nazwa pliku DXF dla wejścia: detal.geo -> detal.dxf, arkusz.lst -> arkusz.lst.dxf
+    (rozszerzenie .lst zostaje, żeby GEO i LST o tej samej nazwie się nie nadpisywały).
+    """
+    name = os.path.basename(input_file)
+    stem, suffix = os.path.splitext(name)
+    return (stem if suffix.lower() == ".geo" else name) + ".dxf"
+
+
+class Manifest:
+    """
+    Skrót wejścia -> wynik konwersji, zapisywany jako JSON (zapis atomowy przez os.replace).
+    Kluczem jest nazwa pliku wejściowego w obserwowanym katalogu.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        try:
+            with open(path, encoding="utf-8") as f:
+                self.entries = json.load(f)
+        except (FileNotFoundError, ValueError):
+            pass
+
+    def is_current(self, name, stat, options, input_file):
+        """
+        Czy wynik dla pliku jest aktualny. Gdy rozmiar i czas modyfikacji się zgadzają,
+        nie liczymy skrótu; inaczej porównujemy skrót (np. plik podmieniony tą samą treścią).
+        """
+        entry = self.entries.get(name)
+        if entry is None or entry["options"] != options or not os.path.exists(entry["output"]):
+            return False
+        if (entry["size"], entry["mtime_ns"]) == (stat.st_size, stat.st_mtime_ns):
+            return True
+        if entry["sha256"] != file_digest(input_file):
+            return False
+        entry["size"], entry["mtime_ns"] = stat.st_size, stat.st_mtime_ns
+        return True
+
+    def record(self, name, stat, options, digest, output_file):
+        self.entries[name] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest,
+                              "options": options, "output": output_file}
+
+    def save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.path)
+
+
+def convert_file(input_file, dxf_file, cache=None, backend="stream", mode="entities", weld=None,
+                 simplify=None):
+    """
+    Konwertuje jeden plik z obserwowanego katalogu (GEO przez geo_to_dxf, LST przez
+    parse_lst + write_dxf) i zwraca skrót SHA-256 wejścia. Wykonywane także w procesach roboczych.
+    """
+    digest = file_digest(input_file)
+    if input_file.lower().endswith(".lst"):
+        with parse_lst(input_file, weld=weld) as geometry:
+            if simplify is not None:
+                geometry = simplify_geometry(geometry, simplify)
+            write_dxf(dxf_file, *geometry, mode=mode)
+    else:
+        geo_to_dxf(input_file, dxf_file, verbose=False, cache=cache, backend=backend, mode=mode,
+                   weld=weld, simplify=simplify)
+    return digest
+
+
+class _Inotify:
+    """
+    Minimalny dostęp do inotify przez ctypes; zdarzenia służą tylko do budzenia pętli.
+    """
+
+    def __init__(self, directory):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1")
+        mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), mask) < 0:
+            error = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(error, "inotify_add_watch")
+
+    def wait(self, timeout):
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if readable:
+            try:
+                while os.read(self.fd, 65536):
+                    pass
+            except BlockingIOError:
+                pass
+        return bool(readable)
+
+    def close(self):
+        os.close(self.fd)
+
+
+class Watcher:
+    """
+    Obserwuje katalog directory i konwertuje gotowe pliki GEO/LST do out_dir.
+
+      watcher = Watcher("export/", "dxf/")
+      watcher.run()            # pętla (do Ctrl+C)
+      watcher.run(once=True)   # jednorazowo: poczekaj, aż bieżące pliki będą gotowe, i skonwertuj
+
+    settle – ile sekund plik musi pozostać niezmieniony, zanim zostanie skonwertowany;
+    polling=True wymusza skanowanie co POLL_INTERVAL zamiast inotify; jobs>1 konwertuje
+    gotowe pliki równolegle w puli procesów; force=True ignoruje manifest przy starcie.
+    mode, weld i simplify działają jak w main.geo_to_dxf (także dla plików LST) i należą do opcji
+    zapisywanych w manifeście – ich zmiana powoduje ponowną konwersję.
+    """
+
+    def __init__(self, directory, out_dir, settle=DEFAULT_SETTLE, polling=False, jobs=1, force=False,
+                 cache=None, backend="stream", mode="entities", weld=None, simplify=None,
+                 verbose=True):
+        self.directory = directory
+        self.out_dir = out_dir
+        self.settle = settle
+        self.jobs = jobs
+        self.cache = cache
+        self.backend = backend
+        self.mode = mode
+        self.weld = weld
+        self.simplify = simplify
+        self.verbose = verbose
+        os.makedirs(out_dir, exist_ok=True)
+        self.manifest = Manifest(os.path.join(out_dir, MANIFEST_NAME))
+        if force:
+            self.manifest.entries = {}
+        # Pliki w trakcie zapisu: nazwa -> ((rozmiar, mtime_ns), czas ostatniej zmiany)
+        self._changing = {}
+        self._notifier = None
+        if not polling:
+            try:
+                self._notifier = _Inotify(directory)
+            except (OSError, AttributeError):
+                # Brak inotify (inny system lub system plików) – zostaje skanowanie
+                self._notifier = None
+
+    @property
+    def options(self):
+        # Parser (backend) nie wpływa na wynik, więc nie należy do opcji w manifeście.
+        # "mode" zapisywany jest zawsze (jak w manifestach sprzed pozostałych opcji).
+        return dict(conversion_options(self.mode, self.weld, self.simplify), mode=self.mode)
+
+    def scan(self, now=None):
+        """
+        Skanuje katalog i zwraca listę (nazwa, stat) plików gotowych do konwersji:
+        niezmienionych od settle sekund i bez aktualnego wpisu w manifeście.
+        """
+        now = time.monotonic() if now is None else now
+        ready = []
+        seen = set()
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if not entry.name.lower().endswith(WATCHED_SUFFIXES) or not entry.is_file():
+                    continue
+                seen.add(entry.name)
+                stat = entry.stat()
+                signature = (stat.st_size, stat.st_mtime_ns)
+                previous = self._changing.get(entry.name)
+                if previous is None or previous[0] != signature:
+                    self._changing[entry.name] = (signature, now)
+                    continue
+                if now - previous[1] < self.settle:
+                    continue
+                del self._changing[entry.name]
+                if not self.manifest.is_current(entry.name, stat, self.options, entry.path):
+                    ready.append((entry.name, stat))
+                else:
+                    # Zapamiętujemy, że plik jest sprawdzony – do następnej zmiany
+                    self._changing[entry.name] = (signature, _CHECKED)
+        for name in set(self._changing) - seen:
+            del self._changing[name]
+        return ready
+
+    def convert(self, ready):
+        """
+        Konwertuje pliki zwrócone przez scan() i aktualizuje manifest.
+        Zwraca liczbę błędów.
+        """
+        failed = 0
+
+        def done(name, stat, dxf_file, start, digest=None, error=None):
+            nonlocal failed
+            input_file = os.path.join(self.directory, name)
+            # Także po błędzie: ponowna próba dopiero po kolejnej zmianie pliku
+            self._changing[name] = ((stat.st_size, stat.st_mtime_ns), _CHECKED)
+            if error is None:
+                self.manifest.record(name, stat, self.options, digest, dxf_file)
+                if self.verbose:
+                    print(f"OK    {time.perf_counter() - start:7.3f} s  {input_file} -> {dxf_file}", flush=True)
+            else:
+                failed += 1
+                print(f"BŁĄD             {input_file}: {error}", file=sys.stderr)
+
+        tasks = [(name, stat, os.path.join(self.out_dir, output_name(name))) for name, stat in ready]
+        start = time.perf_counter()
+        if self.jobs == 1 or len(tasks) <= 1:
+            for name, stat, dxf_file in tasks:
+                try:
+                    digest = convert_file(os.path.join(self.directory, name), dxf_file, self.cache,
+                                          self.backend, self.mode, self.weld, self.simplify)
+                    done(name, stat, dxf_file, start, digest=digest)
+                except Exception as e:
+                    done(name, stat, dxf_file, start, error=e)
+        else:
+            with ProcessPoolExecutor(max_workers=self.jobs) as pool:
+                futures = {pool.submit(convert_file, os.path.join(self.directory, name), dxf_file,
+                                       self.cache, self.backend, self.mode, self.weld,
+                                       self.simplify):
+                           (name, stat, dxf_file)
+                           for name, stat, dxf_file in tasks}
+                for future in as_completed(futures):
+                    name, stat, dxf_file = futures[future]
+                    try:
+                        done(name, stat, dxf_file, start, digest=future.result())
+                    except Exception as e:
+                        done(name, stat, dxf_file, start, error=e)
+        if tasks:
+            self.manifest.save()
+        return failed
+
+    def _wait(self):
+        if self._changing and any(changed != _CHECKED for _, changed in self._changing.values()):
+            # Czekamy, aż zapisywane pliki się ustabilizują
+            timeout = min(self.settle, POLL_INTERVAL)
+        else:
+            timeout = RESCAN_INTERVAL if self._notifier is not None else POLL_INTERVAL
+        if self._notifier is not None:
+            self._notifier.wait(timeout)
+        else:
+            time.sleep(timeout)
+
+    def run(self, once=False):
+        """
+        Pętla obserwowania. once=True kończy pracę, gdy wszystkie pliki obecne w katalogu
+        zostały sprawdzone (i w razie potrzeby skonwertowane). Zwraca liczbę błędów.
+        """
+        if self.verbose:
+            how = "inotify" if self._notifier is not None else f"skanowanie co {POLL_INTERVAL:g} s"
+            print(f"Obserwowanie katalogu '{self.directory}' ({how}), wyniki w '{self.out_dir}'.")
+        failed = 0
+        try:
+            while True:
+                failed += self.convert(self.scan())
+                if once and all(changed == _CHECKED for _, changed in self._changing.values()):
+                    return failed
+                self._wait()
+        finally:
+            if self._notifier is not None:
+                self._notifier.close()
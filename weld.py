@@ -0,0 +1,119 @@
+import math
+from array import array
+from arcs import compute_arc_params
+from geometry import Geometry
+
+# Spawanie punktów: łączenie punktów leżących w odległości <= tolerance w jeden.
+#
+# Punkty wstawiane są do słownika po komórkach siatki o boku CELL_FACTOR * tolerance
+# (podobnie jak końce odcinków w contours.py). Punkt w odległości <= tolerance może leżeć
+# w sąsiedniej komórce tylko wtedy, gdy sam leży blisko jej brzegu, więc w typowym przypadku
+# wystarcza jedno wyszukanie w słowniku, a całość działa w czasie liniowym. Każdy punkt
+# porównywany jest z reprezentantami (pierwszymi punktami grup), nie z innymi scalonymi
+# punktami – grupy nie rozrastają się łańcuchowo.
+#
+# Wynikiem jest nowy model Geometry: punkty numerowane kolejno od 1 w kolejności pierwszego
+# wystąpienia, odwołania linii/łuków/okręgów przepisane na nowe wiersze, a linie, których
+# oba końce trafiły do tego samego punktu, pominięte. Łuk, którego różne punkty początkowy
+# i końcowy zostały scalone, miał rozpiętość bliską 0° albo 360°: prawie pełny łuk zamieniany
+# jest na okrąg (dopisany na końcu listy okręgów), a łuk zerowy pominięty – bez tego
+# rysowałby się jako punkt. Kolejność pozostałych encji się nie zmienia.
+#
+# Spawanie to osobny przebieg po sparsowaniu całego pliku (parse_geo/parse_lst z weld=...):
+# przez chwilę w pamięci są oba modele – wejściowy i scalony – więc szczytowe zużycie pamięci
+# jest mniej więcej dwukrotnie większe niż przy samym parsowaniu.
+
+DEFAULT_WELD_TOLERANCE = 1e-6
+
+# Bok komórki siatki w jednostkach tolerancji
+CELL_FACTOR = 16
+
+
+def weld_rows(xs, ys, tolerance=DEFAULT_WELD_TOLERANCE):
+    """
+    Grupuje punkty (kolumny xs/ys) odległe o nie więcej niż tolerance.
+    Zwraca (remap, representatives): remap[wiersz] = numer grupy, representatives –
+    wiersz pierwszego punktu każdej grupy (array('q')).
+    """
+    if tolerance <= 0:
+        raise ValueError("tolerance musi być dodatnia")
+    inv_cell = 1.0 / (tolerance * CELL_FACTOR)
+    # Odległość od brzegu komórki (w jej jednostkach), poniżej której sprawdzamy sąsiada
+    edge = 1.0 / CELL_FACTOR
+    floor = math.floor
+    buckets = {}
+    remap = array('q')
+    representatives = array('q')
+
+    def find(key, x, y):
+        for group in buckets.get(key, ()):
+            rep = representatives[group]
+            if math.hypot(xs[rep] - x, ys[rep] - y) <= tolerance:
+                return group
+        return -1
+
+    for row, (x, y) in enumerate(zip(xs, ys)):
+        sx, sy = x * inv_cell, y * inv_cell
+        kx, ky = floor(sx), floor(sy)
+        group = find((kx, ky), x, y)
+        if group < 0:
+            fx, fy = sx - kx, sy - ky
+            nx = -1 if fx < edge else (1 if fx > 1.0 - edge else 0)
+            ny = -1 if fy < edge else (1 if fy > 1.0 - edge else 0)
+            if nx:
+                group = find((kx + nx, ky), x, y)
+            if group < 0 and ny:
+                group = find((kx, ky + ny), x, y)
+                if group < 0 and nx:
+                    group = find((kx + nx, ky + ny), x, y)
+            if group < 0:
+                group = len(representatives)
+                representatives.append(row)
+                buckets.setdefault((kx, ky), []).append(group)
+        remap.append(group)
+    return remap, representatives
+
+
+def weld_points(geometry, tolerance=DEFAULT_WELD_TOLERANCE):
+    """
+    Zwraca nowy model Geometry ze scalonymi punktami (patrz opis modułu).
+    Współrzędne scalonego punktu to współrzędne pierwszego punktu grupy.
+    """
+    remap, representatives = weld_rows(geometry.xs, geometry.ys, tolerance)
+    welded = Geometry()
+    xs, ys, zs = geometry.xs, geometry.ys, geometry.zs
+    welded.extend_points(range(1, len(representatives) + 1), array('d', [xs[r] for r in representatives]),
+                         array('d', [ys[r] for r in representatives]),
+                         array('d', [zs[r] for r in representatives]))
+
+    for start_row, end_row, color_idx in zip(geometry.line_start, geometry.line_end, geometry.line_color):
+        start, end = remap[start_row], remap[end_row]
+        if start != end:
+            welded.line_start.append(start)
+            welded.line_end.append(end)
+            welded.line_color.append(color_idx)
+
+    welded.circle_center = array('q', [remap[row] for row in geometry.circle_center])
+    welded.circle_radius = array('d', geometry.circle_radius)
+    welded.circle_color = array('h', geometry.circle_color)
+
+    for center_row, start_row, end_row, direction, color_idx in zip(
+            geometry.arc_center, geometry.arc_start, geometry.arc_end,
+            geometry.arc_direction, geometry.arc_color):
+        center, start, end = remap[center_row], remap[start_row], remap[end_row]
+        if start == end and start_row != end_row:
+            # Końce łuku scalone – rozstrzyga rozpiętość przed spawaniem
+            _, _, _, a_s, a_e = compute_arc_params(xs[center_row], ys[center_row], xs[start_row],
+                                                   ys[start_row], xs[end_row], ys[end_row], direction)
+            if a_e - a_s > 180:
+                rc, rs = representatives[center], representatives[start]
+                welded.circle_center.append(center)
+                welded.circle_radius.append(math.hypot(xs[rs] - xs[rc], ys[rs] - ys[rc]))
+                welded.circle_color.append(color_idx)
+            continue
+        welded.arc_center.append(center)
+        welded.arc_start.append(start)
+        welded.arc_end.append(end)
+        welded.arc_direction.append(direction)
+        welded.arc_color.append(color_idx)
+    return welded
@@ -1,34 +1,336 @@
-import math
+from itertools import count, islice
+from arcs import compute_arc_params, geometry_arc_params  # noqa: F401 – compute_arc_params: zgodność wsteczna
+from contours import ARC, CIRCLE, DEFAULT_TOLERANCE, LINE, chain_contours
+from geometry import as_geometry
+from transform import transformed_columns
 
+# Liczba encji sklejanych w jeden blok tekstu przed zapisem do pliku
+CHUNK_SIZE = 4096
 
-def compute_arc_params(cx, cy, sx, sy, ex, ey, direction):
+# Rozmiar bufora zapisu (bajty)
+WRITE_BUFFER_SIZE = 1 << 20
+
+# Szablony encji (R12, warstwa "0"). Pola liczbowe wstawiane są operatorem %,
+# a znacznik {f} zastępowany jest formatem liczb zmiennoprzecinkowych.
+LINE_TEMPLATE = "  0\nLINE\n  8\n0\n 62\n%d\n 10\n{f}\n 20\n{f}\n 11\n{f}\n 21\n{f}\n"
+ARC_TEMPLATE = "  0\nARC\n  8\n0\n 62\n%d\n 10\n{f}\n 20\n{f}\n 40\n{f}\n 50\n{f}\n 51\n{f}\n"
+CIRCLE_TEMPLATE = "  0\nCIRCLE\n  8\n0\n 62\n%d\n 10\n{f}\n 20\n{f}\n 40\n{f}\n"
+
+DXF_HEADER = "0\nSECTION\n  2\nENTITIES\n"
+DXF_FOOTER = "  0\nENDSEC\n  0\nEOF\n"
+
+# Tryby zapisu geometrii: osobne encje LINE/ARC, kontury jako POLYLINE (R12)
+# albo jako LWPOLYLINE (plik R2000, patrz r2000_header)
+DXF_MODES = ("entities", "polyline", "lwpolyline")
+
+# Kontury (R12): POLYLINE z wierzchołkami VERTEX; bulge (42) tylko dla łuków, 70 = 1 – zamknięta
+POLYLINE_TEMPLATE = "  0\nPOLYLINE\n  8\n0\n 62\n%d\n 66\n1\n 10\n0.0\n 20\n0.0\n 30\n0.0\n 70\n%d\n"
+VERTEX_TEMPLATE = "  0\nVERTEX\n  8\n0\n 10\n{f}\n 20\n{f}\n"
+BULGE_TEMPLATE = " 42\n{f}\n"
+SEQEND = "  0\nSEQEND\n  8\n0\n"
+# Kontury (R2000): LWPOLYLINE – współrzędne wierzchołków bez osobnych encji
+LWPOLYLINE_TEMPLATE = ("  0\nLWPOLYLINE\n  5\n%X\n330\n1F\n100\nAcDbEntity\n  8\n0\n 62\n%d\n"
+                       "100\nAcDbPolyline\n 90\n%d\n 70\n%d\n")
+LWVERTEX_TEMPLATE = " 10\n{f}\n 20\n{f}\n"
+
+# Sekcja BLOCKS: definicja bloku (punkt bazowy 0,0) i jego wstawienie (INSERT)
+BLOCKS_HEADER = "0\nSECTION\n  2\nBLOCKS\n"
+BLOCKS_FOOTER = "  0\nENDSEC\n  0\nSECTION\n  2\nENTITIES\n"
+BLOCK_TEMPLATE = "  0\nBLOCK\n  8\n0\n  2\n%s\n 70\n0\n 10\n0.0\n 20\n0.0\n 30\n0.0\n  3\n%s\n"
+ENDBLK = "  0\nENDBLK\n  8\n0\n"
+INSERT_TEMPLATE = "  0\nINSERT\n  8\n0\n  2\n%s\n 10\n{f}\n 20\n{f}\n 30\n0.0\n"
+INSERT_ROTATED_TEMPLATE = INSERT_TEMPLATE + " 50\n{f}\n"
+
+# Znaki dozwolone w nazwach bloków
+BLOCK_NAME_CHARS = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_-$")
+
+# Plik R2000 (tryb "lwpolyline"). W odróżnieniu od R12 wymaga on uchwytów (kod 5) wszystkich
+# obiektów, znaczników podklas (100) oraz sekcji TABLES, BLOCKS i OBJECTS z minimalnym
+# zestawem wpisów: tabele z warstwą 0, typami linii, stylem Standard i rekordami bloków
+# *Model_Space / *Paper_Space, ich bloki oraz słownik główny z ACAD_GROUP. Stałe obiekty
+# mają stałe uchwyty (jak w plikach AutoCAD); encje numerowane są od R2000_FIRST_HANDLE,
+# a $HANDSEED w nagłówku jest większy od każdego użytego uchwytu.
+R2000_FIRST_HANDLE = 0x100
+# Uchwyt rekordu *Model_Space – właściciel (330) encji
+R2000_MODEL_SPACE = "1F"
+LINE_TEMPLATE_R2000 = ("  0\nLINE\n  5\n%X\n330\n1F\n100\nAcDbEntity\n  8\n0\n 62\n%d\n100\nAcDbLine\n"
+                       " 10\n{f}\n 20\n{f}\n 30\n0.0\n 11\n{f}\n 21\n{f}\n 31\n0.0\n")
+ARC_TEMPLATE_R2000 = ("  0\nARC\n  5\n%X\n330\n1F\n100\nAcDbEntity\n  8\n0\n 62\n%d\n100\nAcDbCircle\n"
+                      " 10\n{f}\n 20\n{f}\n 30\n0.0\n 40\n{f}\n100\nAcDbArc\n 50\n{f}\n 51\n{f}\n")
+CIRCLE_TEMPLATE_R2000 = ("  0\nCIRCLE\n  5\n%X\n330\n1F\n100\nAcDbEntity\n  8\n0\n 62\n%d\n100\nAcDbCircle\n"
+                         " 10\n{f}\n 20\n{f}\n 30\n0.0\n 40\n{f}\n")
+
+
+def _tags(*pairs):
+    # Pary (kod grupy, wartość) jako tekst DXF
+    return "".join("%3d\n%s\n" % pair for pair in pairs)
+
+
+def _table(name, handle, entries, *extra):
+    return (_tags((0, "TABLE"), (2, name), (5, handle), (330, 0), (100, "AcDbSymbolTable"),
+                  (70, len(entries)), *extra) + "".join(entries) + _tags((0, "ENDTAB")))
+
+
+def _table_record(kind, handle, table, subclass, *fields, handle_code=5):
+    return _tags((0, kind), (handle_code, handle), (330, table), (100, "AcDbSymbolTableRecord"),
+                 (100, subclass), *fields)
+
+
+def _linetype(handle, name):
+    return _table_record("LTYPE", handle, 5, "AcDbLinetypeTableRecord", (2, name), (70, 0), (3, ""),
+                         (72, 65), (73, 0), (40, 0.0))
+
+
+def _block_r2000(handle, end_handle, owner, name, *space):
+    return (_tags((0, "BLOCK"), (5, handle), (330, owner), (100, "AcDbEntity"), *space, (8, "0"),
+                  (100, "AcDbBlockBegin"), (2, name), (70, 0), (10, 0.0), (20, 0.0), (30, 0.0),
+                  (3, name), (1, ""))
+            + _tags((0, "ENDBLK"), (5, end_handle), (330, owner), (100, "AcDbEntity"), *space,
+                    (8, "0"), (100, "AcDbBlockEnd")))
+
+
+R2000_TABLES = (
+    _tags((0, "SECTION"), (2, "CLASSES"), (0, "ENDSEC"), (0, "SECTION"), (2, "TABLES"))
+    + _table("VPORT", 8, [])
+    + _table("LTYPE", 5, [_linetype(14, "ByBlock"), _linetype(15, "ByLayer"),
+                          _linetype(16, "Continuous")])
+    + _table("LAYER", 2, [_table_record("LAYER", 10, 2, "AcDbLayerTableRecord", (2, "0"), (70, 0),
+                                        (62, 7), (6, "Continuous"))])
+    + _table("STYLE", 3, [_table_record("STYLE", 11, 3, "AcDbTextStyleTableRecord", (2, "Standard"),
+                                        (70, 0), (40, 0.0), (41, 1.0), (50, 0.0), (71, 0),
+                                        (42, 2.5), (3, "txt"), (4, ""))])
+    + _table("VIEW", 6, [])
+    + _table("UCS", 7, [])
+    + _table("APPID", 9, [_table_record("APPID", 12, 9, "AcDbRegAppTableRecord", (2, "ACAD"), (70, 0))])
+    + _table("DIMSTYLE", "A", [_table_record("DIMSTYLE", 27, "A", "AcDbDimStyleTableRecord",
+                                             (2, "Standard"), (70, 0), handle_code=105)],
+             (100, "AcDbDimStyleTable"))
+    + _table("BLOCK_RECORD", 1, [
+        _table_record("BLOCK_RECORD", R2000_MODEL_SPACE, 1, "AcDbBlockTableRecord", (2, "*Model_Space")),
+        _table_record("BLOCK_RECORD", "1B", 1, "AcDbBlockTableRecord", (2, "*Paper_Space"))])
+    + _tags((0, "ENDSEC"), (0, "SECTION"), (2, "BLOCKS"))
+    + _block_r2000(20, 21, R2000_MODEL_SPACE, "*Model_Space")
+    + _block_r2000("1C", "1D", "1B", "*Paper_Space", (67, 1))
+    + _tags((0, "ENDSEC"), (0, "SECTION"), (2, "ENTITIES")))
+
+DXF_FOOTER_R2000 = _tags(
+    (0, "ENDSEC"), (0, "SECTION"), (2, "OBJECTS"),
+    (0, "DICTIONARY"), (5, "C"), (330, 0), (100, "AcDbDictionary"), (281, 1),
+    (3, "ACAD_GROUP"), (350, "D"),
+    (0, "DICTIONARY"), (5, "D"), (330, "C"), (100, "AcDbDictionary"), (281, 1),
+    (0, "ENDSEC"), (0, "EOF"))
+
+
+# Plik R12 z blokami (arkusz, write_dxf_sheet): nagłówek z $ACADVER i sekcja TABLES
+# z obiektami, do których odwołują się bloki i encje – warstwa 0, typ linii CONTINUOUS
+# i styl STANDARD. Po nim następuje sekcja BLOCKS (iter_block_chunks).
+DXF_HEADER_R12_TABLES = _tags(
+    (0, "SECTION"), (2, "HEADER"), (9, "$ACADVER"), (1, "AC1009"), (0, "ENDSEC"),
+    (0, "SECTION"), (2, "TABLES"),
+    (0, "TABLE"), (2, "LTYPE"), (70, 1),
+    (0, "LTYPE"), (2, "CONTINUOUS"), (70, 0), (3, "Solid line"), (72, 65), (73, 0), (40, 0.0),
+    (0, "ENDTAB"),
+    (0, "TABLE"), (2, "LAYER"), (70, 1),
+    (0, "LAYER"), (2, "0"), (70, 0), (62, 7), (6, "CONTINUOUS"),
+    (0, "ENDTAB"),
+    (0, "TABLE"), (2, "STYLE"), (70, 1),
+    (0, "STYLE"), (2, "STANDARD"), (70, 0), (40, 0.0), (41, 1.0), (50, 0.0), (71, 0), (42, 2.5),
+    (3, "txt"), (4, ""),
+    (0, "ENDTAB"),
+    (0, "ENDSEC"))
+
+
+def r2000_header(entity_count):
     """
-    Oblicza (xc, yc, r, angle_start, angle_end) w stopniach,
-    tak by łuk w DXF R12 narysować CCW od angle_start do angle_end.
+    Początek pliku R2000 aż do otwarcia sekcji ENTITIES (nagłówek, TABLES, BLOCKS) dla
+    co najwyżej entity_count encji o uchwytach od R2000_FIRST_HANDLE. Plik kończy DXF_FOOTER_R2000.
     """
-    vx_s = sx - cx
-    vy_s = sy - cy
-    vx_e = ex - cx
-    vy_e = ey - cy
+    return (_tags((0, "SECTION"), (2, "HEADER"), (9, "$ACADVER"), (1, "AC1015"),
+                  (9, "$HANDSEED"), (5, "%X" % (R2000_FIRST_HANDLE + entity_count)), (0, "ENDSEC"))
+            + R2000_TABLES)
 
-    r = math.hypot(vx_s, vy_s)
-    a_s = math.degrees(math.atan2(vy_s, vx_s)) % 360
-    a_e = math.degrees(math.atan2(vy_e, vx_e)) % 360
 
-    if direction == 1:
-        # CCW – gdy kąt końcowy jest mniejszy, dodajemy pełen obrót
-        if a_e < a_s:
-            a_e += 360
+def entity_templates(float_format=None, r2000=False):
+    """
+    Zwraca szablony (LINE, ARC, CIRCLE) dla podanego formatu liczb.
+    float_format=None oznacza zapis jak dotychczas (repr liczby, np. 12.5),
+    a np. "%.6f" daje stałe 6 miejsc po przecinku (mniejszy plik).
+    r2000=True daje szablony R2000 – pierwszym polem jest wtedy uchwyt encji.
+    """
+    if float_format is None:
+        float_format = "%s"
     else:
-        # CW – zamieniamy kąty
-        a_s, a_e = a_e, a_s
-        if a_e < a_s:
-            a_e += 360
+        # Sprawdzamy format od razu, a nie w połowie zapisu pliku
+        float_format % 1.0
+    templates = ((LINE_TEMPLATE_R2000, ARC_TEMPLATE_R2000, CIRCLE_TEMPLATE_R2000) if r2000
+                 else (LINE_TEMPLATE, ARC_TEMPLATE, CIRCLE_TEMPLATE))
+    return tuple(t.replace("{f}", float_format) for t in templates)
+
+
+def iter_entity_chunks(geometry, xs=None, ys=None, float_format=None, chunk_size=CHUNK_SIZE,
+                       transform=None):
+    """
+    Generuje sekcję ENTITIES (bez nagłówka i zakończenia) w blokach tekstu
+    po chunk_size encji. Opcjonalne kolumny xs/ys zastępują współrzędne punktów.
+    transform (transform.Affine) przekształca geometrię hurtowo przed zapisem
+    (np. przesunięcie i obrót detalu na arkuszu); nie łączy się z xs/ys.
+    """
+    tx, ty, directions, radii = transformed_columns(geometry, transform)
+    if xs is None:
+        xs = tx
+    if ys is None:
+        ys = ty
+    line_t, arc_t, circle_t = entity_templates(float_format)
+
+    # Linie
+    lines = (line_t % (color_idx, xs[p1], ys[p1], xs[p2], ys[p2])
+             for (p1, p2, color_idx) in zip(geometry.line_start, geometry.line_end,
+                                            geometry.line_color))
+
+    # Łuki – parametry liczone wsadowo dla wszystkich łuków
+    arc_params = geometry_arc_params(geometry, xs, ys, directions)
+    arcs = (arc_t % (color_idx, xs[center_row], ys[center_row], r, ang_s, ang_e)
+            for (center_row, r, ang_s, ang_e, color_idx) in zip(
+                geometry.arc_center, arc_params.radius, arc_params.angle_start,
+                arc_params.angle_end, geometry.arc_color))
+
+    # Okręgi
+    circles = (circle_t % (color_idx, xs[center_row], ys[center_row], radius)
+               for (center_row, radius, color_idx) in zip(
+                   geometry.circle_center, radii, geometry.circle_color))
+
+    for entities in (lines, arcs, circles):
+        while True:
+            chunk = "".join(islice(entities, chunk_size))
+            if not chunk:
+                break
+            yield chunk
+
+
+def iter_polyline_chunks(geometry, float_format=None, chunk_size=CHUNK_SIZE, transform=None,
+                         lwpolyline=False, tolerance=DEFAULT_TOLERANCE):
+    """
+    Generuje encje konturów: linie i łuki łączone są w kontury (contours.chain_contours)
+    i zapisywane jako POLYLINE z bulge (R12) lub LWPOLYLINE (lwpolyline=True) –
+    wspólne wierzchołki zapisywane są raz. Kontury z jednego odcinka zostają encją
+    LINE/ARC (są wtedy mniejsze), a okręgi – encją CIRCLE. Przy lwpolyline=True encje
+    mają postać R2000 z uchwytami od R2000_FIRST_HANDLE (do pliku z r2000_header).
+    tolerance: tolerancja łączenia końców (jak w chain_contours).
+    """
+    contours = chain_contours(geometry, tolerance=tolerance)
+    xs, ys, directions, radii = transformed_columns(geometry, transform)
+    line_t, arc_t, circle_t = entity_templates(float_format, r2000=lwpolyline)
+    # Encje R2000 dostają kolejne uchwyty (pierwsze pole szablonu), R12 – żadnych
+    handles = count(R2000_FIRST_HANDLE) if lwpolyline else None
+    number_format = "%s" if float_format is None else float_format
+    vertex_t = (LWVERTEX_TEMPLATE if lwpolyline else VERTEX_TEMPLATE).replace("{f}", number_format)
+    bulge_t = BULGE_TEMPLATE.replace("{f}", number_format)
+    arc_params = geometry_arc_params(geometry, xs, ys, directions)
+    flip = transform is not None and transform.reverses_orientation
+    apply = None if transform is None or transform.is_identity else transform.apply
+
+    def render(contour):
+        handle = () if handles is None else (next(handles),)
+        kind, index, _ = contour.segments[0]
+        if kind == CIRCLE:
+            row = geometry.circle_center[index]
+            return circle_t % (handle + (geometry.circle_color[index], xs[row], ys[row], radii[index]))
+        if len(contour.segments) == 1 and kind == LINE:
+            p1, p2 = geometry.line_start[index], geometry.line_end[index]
+            return line_t % (handle + (geometry.line_color[index], xs[p1], ys[p1], xs[p2], ys[p2]))
+        if len(contour.segments) == 1 and kind == ARC:
+            row = geometry.arc_center[index]
+            return arc_t % (handle + (geometry.arc_color[index], xs[row], ys[row],
+                                      arc_params.radius[index], arc_params.angle_start[index],
+                                      arc_params.angle_end[index]))
+        vertices = contour.vertices()
+        flags = 1 if contour.closed else 0
+        if lwpolyline:
+            out = [LWPOLYLINE_TEMPLATE % (handle + (contour.color, len(vertices), flags))]
+        else:
+            out = [POLYLINE_TEMPLATE % (contour.color, flags)]
+        for x, y, bulge in vertices:
+            if apply is not None:
+                x, y = apply(x, y)
+            out.append(vertex_t % (x, y))
+            if bulge:
+                out.append(bulge_t % (-bulge if flip else bulge))
+        if not lwpolyline:
+            out.append(SEQEND)
+        return "".join(out)
+
+    entities = map(render, contours)
+    while True:
+        chunk = "".join(islice(entities, chunk_size))
+        if not chunk:
+            break
+        yield chunk
+
+
+def iter_block_chunks(blocks, inserts, float_format=None, chunk_size=CHUNK_SIZE, mode="entities"):
+    """
+    Generuje sekcję BLOCKS i początek sekcji ENTITIES z encjami INSERT
+    (bez DXF_FOOTER – po nich można dopisać kolejne encje). Przed sekcją BLOCKS
+    należy zapisać DXF_HEADER_R12_TABLES.
+
+    blocks: {nazwa_bloku: Geometry} – geometria każdego bloku zapisywana jest raz,
+    inserts: [(nazwa_bloku, x, y), ...] – wstawienia bloków w punktach (x, y);
+    (nazwa_bloku, x, y, kąt) wstawia blok obrócony o kąt w stopniach (CCW).
+    Nazwy bloków muszą być poprawnymi nazwami DXF (patrz block_name).
+    mode: "entities" albo "polyline" (kontury jako POLYLINE, jak w write_dxf); plik z blokami
+    jest zawsze R12, więc tryb "lwpolyline" nie jest obsługiwany (ValueError).
+    """
+    if mode not in ("entities", "polyline"):
+        raise ValueError(f"Tryb zapisu {mode!r} nie jest obsługiwany w pliku z blokami (R12)")
+    yield BLOCKS_HEADER
+    for name, geometry in blocks.items():
+        yield BLOCK_TEMPLATE % (name, name)
+        if mode == "polyline":
+            yield from iter_polyline_chunks(geometry, float_format=float_format, chunk_size=chunk_size)
+        else:
+            yield from iter_entity_chunks(geometry, float_format=float_format, chunk_size=chunk_size)
+        yield ENDBLK
+    yield BLOCKS_FOOTER
+    number_format = "%s" if float_format is None else float_format
+    insert_t = INSERT_TEMPLATE.replace("{f}", number_format)
+    rotated_t = INSERT_ROTATED_TEMPLATE.replace("{f}", number_format)
+    entities = (rotated_t % tuple(insert) if len(insert) > 3 and insert[3] else insert_t % tuple(insert[:3])
+                for insert in inserts)
+    while True:
+        chunk = "".join(islice(entities, chunk_size))
+        if not chunk:
+            break
+        yield chunk
+
+
+def block_name(name, used=()):
+    """
+    Zamienia dowolną nazwę (np. nazwę detalu) na nazwę bloku DXF: litery ASCII, cyfry,
+    '_', '-' i '$'; pozostałe znaki zastępowane są '_'. Jeśli wynik jest już w used,
+    dodawany jest sufiks liczbowy.
+    """
+    result = "".join(c if c in BLOCK_NAME_CHARS else "_" for c in name) or "_"
+    candidate, k = result, 1
+    while candidate in used:
+        k += 1
+        candidate = f"{result}_{k}"
+    return candidate
 
-    return (cx, cy, r, a_s, a_e)
 
+def write_chunks(f, chunks, encoding='utf-8'):
+    """
+    Zapisuje bloki tekstu do pliku otwartego binarnie. Zwraca liczbę zapisanych bajtów.
+    """
+    written = 0
+    for chunk in chunks:
+        data = chunk.encode(encoding)
+        f.write(data)
+        written += len(data)
+    return written
 
-def write_dxf(dxf_filename, points, lines, arcs, circles):
+
+def write_dxf(dxf_filename, points, lines, arcs, circles, float_format=None, transform=None,
+              mode="entities"):
     """
     Zapisuje plik DXF (R12), ustawiając kolor (group code 62)
     zgodnie z color_idx (2 = żółty, 7 = domyślny).
@@ -36,47 +338,34 @@ def write_dxf(dxf_filename, points, lines, arcs, circles):
     lines: [(start_p, end_p, color_idx), ...]
     arcs:  [(center_p, start_p, end_p, direction, color_idx), ...]
     circles: [(center_p, radius, color_idx), ...]   # nowa obsługa okręgów (CIR)
+    float_format: format liczb, np. "%.6f"; domyślnie (None) pełna precyzja jak repr()
+    transform: opcjonalne przekształcenie geometrii (transform.Affine), np. obrót lub odbicie
+    mode: "entities" – każda linia i łuk osobno (domyślnie), "polyline" – kontury jako
+          POLYLINE z bulge (R12), "lwpolyline" – kontury jako LWPOLYLINE (plik R2000)
+
+    Dane mogą być zwykłymi strukturami lub widokami modelu Geometry (wynik parse_geo) –
+    współrzędne czytamy wtedy bezpośrednio z kolumn, bez kopiowania.
+    Encje renderowane są z gotowych szablonów w blokach po CHUNK_SIZE
+    i zapisywane jako bajty przez duży bufor, zamiast kilku f.write na encję.
+
+    Zwraca liczbę zapisanych bajtów.
     """
-    if circles is None:
-        circles = []
-
-    with open(dxf_filename, 'w', encoding='utf-8') as f:
-        f.write("0\nSECTION\n  2\nENTITIES\n")
-
-        # Zapis linii
-        for (p1, p2, color_idx) in lines:
-            x1, y1, _ = points[p1]
-            x2, y2, _ = points[p2]
-
-            f.write("  0\nLINE\n")
-            f.write("  8\n0\n")  # warstwa "0"
-            f.write(f" 62\n{color_idx}\n")  # ustawienie koloru
-            f.write(f" 10\n{x1}\n 20\n{y1}\n")
-            f.write(f" 11\n{x2}\n 21\n{y2}\n")
-
-        # Zapis łuków
-        for (center_id, start_id, end_id, direction, color_idx) in arcs:
-            cx, cy, _ = points[center_id]
-            sx, sy, _ = points[start_id]
-            ex, ey, _ = points[end_id]
-
-            (xc, yc, r, ang_s, ang_e) = compute_arc_params(cx, cy, sx, sy, ex, ey, direction)
-
-            f.write("  0\nARC\n")
-            f.write("  8\n0\n")  # warstwa "0"
-            f.write(f" 62\n{color_idx}\n")
-            f.write(f" 10\n{xc}\n 20\n{yc}\n")
-            f.write(f" 40\n{r}\n")
-            f.write(f" 50\n{ang_s}\n")
-            f.write(f" 51\n{ang_e}\n")
-
-        # Zapis okręgów
-        for (center_id, radius, color_idx) in circles:
-            cx, cy, _ = points[center_id]
-            f.write("  0\nCIRCLE\n")
-            f.write("  8\n0\n")  # warstwa "0"
-            f.write(f" 62\n{color_idx}\n")
-            f.write(f" 10\n{cx}\n 20\n{cy}\n")
-            f.write(f" 40\n{radius}\n")
-
-        f.write("  0\nENDSEC\n  0\nEOF\n")
+    if mode not in DXF_MODES:
+        raise ValueError(f"Nieznany tryb zapisu DXF: {mode!r} (dozwolone: {', '.join(DXF_MODES)})")
+    geometry = as_geometry(points, lines, arcs, circles)
+    header, footer = DXF_HEADER, DXF_FOOTER
+    if mode == "entities":
+        chunks = iter_entity_chunks(geometry, float_format=float_format, transform=transform)
+    else:
+        if mode == "lwpolyline":
+            # Każdy kontur ma co najmniej jeden odcinek – encji nie jest więcej niż odcinków
+            entity_count = len(geometry.line_start) + len(geometry.arc_center) + len(geometry.circle_center)
+            header, footer = r2000_header(entity_count), DXF_FOOTER_R2000
+        chunks = iter_polyline_chunks(geometry, float_format=float_format, transform=transform,
+                                      lwpolyline=mode == "lwpolyline")
+
+    with open(dxf_filename, 'wb', buffering=WRITE_BUFFER_SIZE) as f:
+        written = write_chunks(f, [header])
+        written += write_chunks(f, chunks)
+        written += write_chunks(f, [footer])
+    return written